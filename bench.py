@@ -0,0 +1,296 @@
+"""Micro-benchmarks for the indicator and rendering hot path.
+
+    python bench.py                       # print timings
+    python bench.py --json out.json       # also write machine-readable results
+    python bench.py --save-baseline       # store results as the baseline
+    python bench.py --compare             # fail (exit 1) on regressions vs baseline
+"""
+import sys
+import os
+import io
+import json
+import time
+import random
+import argparse
+import itertools
+import platform
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+import codec
+import config
+import feeds
+import indicators as ind
+import indicators_np as npi
+import markets
+import snapshot
+import volprofile
+from book  import OrderBook
+from store import FlowBars, TradeStore
+
+try:
+    from rich.console import Console
+    import dashboard
+except ImportError:          # rendering cases need rich
+    dashboard = None
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+
+
+# ── synthetic state ─────────────────────────────────────────────
+def make_state(trades: int, levels: int, klines: int, seed: int = 7) -> feeds.State:
+    rnd = random.Random(seed)
+    st  = feeds.State()
+
+    p, ks = 100.0, []
+    for i in range(klines):
+        o = p
+        p += rnd.gauss(0, 1)
+        ks.append({
+            "t": i * 60.0, "o": o, "c": p,
+            "h": max(o, p) + rnd.random(), "l": min(o, p) - rnd.random(),
+            "v": rnd.random() * 10,
+        })
+    feeds.load_klines(st, ks, "1m")
+
+    tick = p * 0.0001
+    st.bids = [(p - tick * i, rnd.random() * (30 if i % 17 == 0 else 2)) for i in range(1, levels + 1)]
+    st.asks = [(p + tick * i, rnd.random() * (30 if i % 23 == 0 else 2)) for i in range(1, levels + 1)]
+    st.mid  = (st.bids[0][0] + st.asks[0][0]) / 2
+    st.book = OrderBook()
+    st.book.load(st.bids, st.asks)
+
+    st.trades = TradeStore()       # ticks whatever TRADE_STORE says: the other forms derive from it
+    now  = time.time()
+    span = config.TRADE_TTL * 0.9
+    for i in range(trades):
+        t, q = now - span + i * span / max(trades, 1), rnd.random()
+        px   = p + rnd.gauss(0, 0.1)
+        st.trades.add(t, px, q, rnd.random() < 0.5)
+        if st.profile is not None:
+            st.profile.add(t, px, q)
+    st.pm_up, st.pm_dn = 0.55, 0.46
+    return st
+
+
+def trade_dicts(st) -> list[dict]:
+    return [{"t": t, "price": p, "qty": q, "is_buy": b} for t, p, q, b in st.trades]
+
+
+# ── feed decoding ───────────────────────────────────────────────
+TRADE_FRAME = (b'{"stream":"btcusdt@trade","data":{"e":"trade","E":1700000000123,'
+               b'"s":"BTCUSDT","t":%d,"p":"67123.45000000","q":"0.01250000",'
+               b'"T":1700000000121,"m":true,"M":true}}')     # % trade id: repeats are dropped
+PM_FRAME = (b'{"market":"0xabc","event_type":"price_change","timestamp":"1700000000123",'
+            b'"price_changes":[{"asset_id":"111","price":"0.55","size":"120","side":"BUY",'
+            b'"best_bid":"0.54","best_ask":"0.56"},{"asset_id":"222","price":"0.45",'
+            b'"size":"80","side":"SELL","best_bid":"0.44","best_ask":"0.46"}]}')
+
+
+def _legacy_trade(raw, trades: list):
+    """The original per-trade path (stdlib json, substring dispatch, dict
+    per trade), kept as the 'before' side of the decode comparison."""
+    data   = json.loads(raw.decode())
+    stream = data.get("stream", "")
+    pay    = data["data"]
+    if "@trade" in stream:
+        trades.append({
+            "t":      pay["T"] / 1000.0,
+            "price":  float(pay["p"]),
+            "qty":    float(pay["q"]),
+            "is_buy": not pay["m"],
+        })
+        if len(trades) > 5000:
+            trades.clear()
+
+
+def decode_cases():
+    st = feeds.State()
+    st.pm_up_id, st.pm_dn_id = "111", "222"
+    bn = feeds.binance_router({"btcusdt@trade": feeds.trade_route(st.trades, [st])})
+    # every BTC timeframe on one symbol: shared store and per-interval profiles
+    mk  = markets.build(("BTC", tf) for tf in config.COIN_TIMEFRAMES["BTC"])
+    bn5 = feeds.binance_router({"btcusdt@trade": markets.routes(mk)[0]["btcusdt@trade"]})
+    pm = feeds.pm_router({"111": st, "222": st})
+    legacy: list = []
+    ids = itertools.count(3400000001)
+    return {
+        "decode_trade_legacy": lambda: _legacy_trade(TRADE_FRAME % next(ids), legacy),
+        "decode_trade":        lambda: bn(TRADE_FRAME % next(ids)),
+        "decode_trade_all_tf": lambda: bn5(TRADE_FRAME % next(ids)),
+        "decode_pm":           lambda: pm(PM_FRAME),
+    }
+
+
+# ── cases ───────────────────────────────────────────────────────
+def cases(st):
+    b, a, m, k = st.bids, st.asks, st.mid, st.klines
+    bk = st.book
+    tl = trade_dicts(st)
+    bars = FlowBars()
+    vp   = volprofile.VolumeProfile()
+    for t, p, q, buy in st.trades:
+        bars.add(t, p, q, buy)
+        vp.add(t, p, q)
+    now = time.time()
+
+    def render_cold():
+        st.snap_cache.clear()
+        return dashboard.render(st, "BTC", "5m")
+
+    con = Console(file=io.StringIO(), width=140, force_terminal=True) if dashboard else None
+
+    def render_console():
+        st.snap_cache.clear()
+        con.file = io.StringIO()
+        con.print(dashboard.render(st, "BTC", "5m"))
+
+    def render_console_warm():
+        # unchanged state: every panel comes from the dirty-panel cache
+        con.file = io.StringIO()
+        con.print(dashboard.render(st, "BTC", "5m"))
+
+    out = {
+        "obi":              lambda: ind.obi(b, a, m),
+        "walls":            lambda: ind.walls(b, a),
+        "depth_usd":        lambda: ind.depth_usd(b, a, m),
+        "obi_book":         lambda: ind.obi(bk.bids, bk.asks, m),
+        "walls_book":       lambda: ind.walls(bk.bids, bk.asks, m),
+        "depth_usd_book":   lambda: ind.depth_usd(bk.bids, bk.asks, m),
+        "book_update":      lambda: (bk.bids.set(b[2][0], random.random()), ind.depth_usd(bk.bids, bk.asks, m)),
+        "cvd_store":        lambda: ind.cvd(st.trades, 300),
+        "cvd_list":         lambda: ind.cvd(tl, 300),
+        "cvd_bars":         lambda: ind.cvd(bars, 300),
+        "vol_profile":      lambda: ind.vol_profile(k),
+        "vp_trade_add":     lambda: vp.add(now, m, 0.01),
+        "vp_trade_query":   lambda: (vp.poc(), vp.rows(), vp.value_area(), volprofile.nodes(vp.rows())),
+        "rsi":              lambda: ind.rsi(k),
+        "macd":             lambda: ind.macd(k),
+        "vwap":             lambda: ind.vwap(k),
+        "emas":             lambda: ind.emas(k),
+        "heikin_ashi":      lambda: ind.heikin_ashi(k),
+        "bias_score":       lambda: ind.bias_score(b, a, m, st.trades, k),
+        "snapshot_cold":    lambda: (st.snap_cache.clear(), snapshot.take(st)),
+        "snapshot_warm":    lambda: snapshot.take(st),
+    }
+    if npi.ENABLED:
+        cs = st.candles
+        out.update({
+            "vol_profile_np":   lambda: npi.vol_profile(cs),
+            "rsi_np":           lambda: npi.rsi(cs),
+            "macd_np":          lambda: npi.macd(cs),
+            "vwap_np":          lambda: npi.vwap(cs),
+            "emas_np":          lambda: npi.emas(cs),
+            "heikin_ashi_np":   lambda: npi.heikin_ashi(cs),
+        })
+    if dashboard:
+        out["render"]         = render_cold
+        out["render_console"] = render_console
+        out["render_warm"]    = render_console_warm
+    return out
+
+
+def measure(fn, min_time: float = 0.2, repeat: int = 5) -> tuple[float, int]:
+    """Best per-call seconds over `repeat` runs of an auto-sized loop."""
+    fn()
+    loops = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        dt = time.perf_counter() - t0
+        if dt >= min_time / repeat or loops >= 1 << 20:
+            break
+        loops *= 2
+    best = dt
+    for _ in range(repeat - 1):
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        best = min(best, time.perf_counter() - t0)
+    return best / loops, loops
+
+
+def run(args) -> dict:
+    st = make_state(args.trades, args.levels, args.klines)
+    selected = {**cases(st), **decode_cases()}
+    if args.only:
+        selected = {n: f for n, f in selected.items() if any(s in n for s in args.only)}
+
+    results = {}
+    for name, fn in selected.items():
+        per, loops = measure(fn, args.min_time)
+        results[name] = {"us": per * 1e6, "loops": loops}
+        rate = f"   {1 / per:>12,.0f} msg/s" if name.startswith("decode") else ""
+        print(f"  {name:<20} {per * 1e6:>12.2f} µs{rate}")
+    return {
+        "meta": {
+            "python":   platform.python_version(),
+            "json":     codec.BACKEND,
+            "indicators": npi.BACKEND,
+            "machine":  platform.machine(),
+            "trades":   args.trades,
+            "levels":   args.levels,
+            "klines":   args.klines,
+            "time":     time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def compare(cur: dict, base: dict, threshold: float) -> bool:
+    ok = True
+    print(f"\n  {'case':<20} {'now µs':>12} {'base µs':>12} {'Δ':>8}")
+    for name, r in cur["results"].items():
+        b = base["results"].get(name)
+        if b is None:
+            print(f"  {name:<20} {r['us']:>12.2f} {'—':>12}")
+            continue
+        delta = (r["us"] - b["us"]) / b["us"] * 100 if b["us"] else 0.0
+        flag = ""
+        if delta > threshold:
+            flag, ok = "  REGRESSION", False
+        print(f"  {name:<20} {r['us']:>12.2f} {b['us']:>12.2f} {delta:>+7.1f}%{flag}")
+    if base["meta"].get("trades") != cur["meta"]["trades"] or \
+       base["meta"].get("klines") != cur["meta"]["klines"] or \
+       base["meta"].get("levels") != cur["meta"]["levels"]:
+        print("  (baseline was taken with different --trades/--levels/--klines)")
+    return ok
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Indicator / render micro-benchmarks")
+    ap.add_argument("--trades", type=int, default=20_000)
+    ap.add_argument("--levels", type=int, default=config.OB_LEVELS)
+    ap.add_argument("--klines", type=int, default=config.KLINE_MAX)
+    ap.add_argument("--min-time", type=float, default=0.2, help="seconds spent per case")
+    ap.add_argument("--only", nargs="*", help="run cases whose name contains any of these")
+    ap.add_argument("--json", metavar="PATH", help="write results as JSON")
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--save-baseline", action="store_true")
+    ap.add_argument("--compare", action="store_true", help="compare against the baseline")
+    ap.add_argument("--threshold", type=float, default=15.0,
+                    help="percent slowdown that counts as a regression")
+    args = ap.parse_args()
+
+    print(f"bench: {args.trades} trades, {args.levels} levels/side, {args.klines} klines")
+    cur = run(args)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(cur, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(cur, f, indent=2)
+        print(f"\n  baseline saved → {args.baseline}")
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            sys.exit(f"no baseline at {args.baseline} – run with --save-baseline first")
+        with open(args.baseline) as f:
+            base = json.load(f)
+        if not compare(cur, base, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 import sys
 import os
 import asyncio
+import argparse
+import contextlib
 
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
 
@@ -11,9 +13,16 @@ if sys.platform == "win32":
 from rich.console import Console
 from rich.live   import Live
 
+import alerts
 import config
 import feeds
+import markets
+import metrics
 import dashboard
+import shmstate
+from server   import SignalServer
+from recorder import Recorder
+from replay   import Replay
 
 console = Console(force_terminal=True)
 
@@ -33,45 +42,220 @@ def pick(title: str, options: list[str]) -> str:
         console.print("  [red]invalid – try again[/red]")
 
 
-async def display_loop(state: feeds.State, coin: str, tf: str):
-    await asyncio.sleep(2)
-    refresh_interval = config.REFRESH_5M if tf == "5m" else config.REFRESH
-    with Live(console=console, refresh_per_second=1, transient=False) as live:
+async def wait_frame(changed: asyncio.Event, idle: float, last: float) -> float:
+    """Wait for new data (or `idle` seconds), no sooner than one MAX_FPS
+    frame after `last`. Returns the frame time."""
+    loop  = asyncio.get_running_loop()
+    frame = 1 / config.MAX_FPS
+    await asyncio.sleep(max(0.0, last + frame - loop.time()))
+    try:
+        await asyncio.wait_for(changed.wait(), idle)
+    except asyncio.TimeoutError:
+        pass
+    changed.clear()
+    return loop.time()
+
+
+async def display_loop(state: feeds.State, coin: str, tf: str, diag: bool = False):
+    idle = config.REFRESH_5M if tf == "5m" else config.REFRESH
+    last = 0.0
+    changed = state.changed.listen()
+    with Live(console=console, auto_refresh=False, transient=False) as live:
         while True:
+            last = await wait_frame(changed, idle, last)
             if state.mid > 0 and state.klines:
-                live.update(dashboard.render(state, coin, tf))
-            await asyncio.sleep(refresh_interval)
+                with metrics.timed(metrics.draw_time):
+                    live.update(dashboard.render(state, coin, tf, diag), refresh=True)
+
+
+async def publish_loop(state: feeds.State, pub: shmstate.Publisher, coin: str, tf: str):
+    """--worker: publish `state` to shared memory on every update (at most
+    MAX_FPS a second) while a worker process computes and draws."""
+    idle = config.REFRESH_5M if tf == "5m" else config.REFRESH
+    last = 0.0
+    changed = state.changed.listen()
+    proc = shmstate.start_worker(pub, coin, tf)
+    try:
+        # the worker owns the terminal now; keep feed messages off it
+        with open(os.devnull, "w") as null, contextlib.redirect_stdout(null):
+            while proc.is_alive():
+                last = await wait_frame(changed, idle, last)
+                pub.publish(state)
+    finally:
+        proc.terminate()
+        pub.close()
+
+
+def instrumentation(args) -> list:
+    """Background tasks every mode runs: loop-lag probe and /metrics."""
+    tasks = [metrics.loop_lag_probe()]
+    if args.metrics_port:
+        tasks.append(metrics.serve(config.METRICS_HOST, args.metrics_port))
+    return tasks
+
+
+def alert_tasks(args, mkts: list[markets.Market]) -> list:
+    """The alert engine over `mkts`, if any alert sink is configured."""
+    sinks = alerts.sinks_from(args.alerts_file, args.alerts_socket, args.alerts_webhook)
+    if not sinks:
+        return []
+    return [alerts.AlertEngine(mkts, alerts.rules_from(config.ALERT_RULES), sinks).run()]
+
+
+async def overview_loop(mkts: list[markets.Market]):
+    last = 0.0
+    changed = mkts[0].state.changed.listen()
+    with Live(console=console, auto_refresh=False, transient=False) as live:
+        while True:
+            last = await wait_frame(changed, config.REFRESH_5M, last)
+            live.update(dashboard.render_overview(mkts), refresh=True)
+
+
+async def run_all(args):
+    console.print("\n[bold green]Starting all markets …[/bold green]\n")
+    mkts = markets.all_markets()
+    await markets.setup(mkts)
+    await asyncio.gather(
+        markets.run(mkts),
+        overview_loop(mkts),
+        *instrumentation(args),
+        *alert_tasks(args, mkts),
+    )
+
+
+async def run_headless(args):
+    if args.coin:
+        tfs  = [args.tf] if args.tf else config.COIN_TIMEFRAMES[args.coin]
+        mkts = markets.build((args.coin, tf) for tf in tfs)
+    else:
+        mkts = markets.all_markets()
+    print(f"  [serve] {len(mkts)} market(s): {', '.join(m.name for m in mkts)}")
+    await markets.setup(mkts)
+    await asyncio.gather(
+        markets.run(mkts),
+        SignalServer(mkts).run(args.host, args.port),
+        *instrumentation(args),
+        *alert_tasks(args, mkts),
+    )
+
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Polymarket Crypto Assistant")
+    ap.add_argument("--serve", action="store_true",
+                    help="headless mode: publish snapshots over a local WebSocket API")
+    ap.add_argument("--coin", choices=config.COINS, help="with --serve: only this coin")
+    ap.add_argument("--tf",   help="with --serve --coin: only this timeframe")
+    ap.add_argument("--host", default=config.SERVE_HOST)
+    ap.add_argument("--port", type=int, default=config.SERVE_PORT)
+    ap.add_argument("--diag", action="store_true", default=config.DIAGNOSTICS,
+                    help="show the latency / loop-lag diagnostics panel")
+    ap.add_argument("--metrics-port", type=int, default=config.METRICS_PORT,
+                    help="serve Prometheus /metrics on this port (default off)")
+    ap.add_argument("--worker", action="store_true",
+                    help="compute indicators and draw in a separate process from shared memory")
+    ap.add_argument("--alerts-file", metavar="PATH", default=config.ALERT_FILE,
+                    help="append alert matches to this file as JSON lines")
+    ap.add_argument("--alerts-socket", metavar="PATH", default=config.ALERT_SOCKET,
+                    help="stream alert matches to clients of this UNIX socket")
+    ap.add_argument("--alerts-webhook", metavar="URL", default=config.ALERT_WEBHOOK,
+                    help="POST each alert match to this URL")
+    ap.add_argument("--record", metavar="PATH",
+                    help="append every raw feed message to a compressed recording")
+    ap.add_argument("--replay", metavar="PATH",
+                    help="replay a recording at full speed and report bias scores")
+    ap.add_argument("--every", type=float, default=1.0,
+                    help="with --replay: seconds of recording time between evaluations")
+    ap.add_argument("--out", metavar="CSV", help="with --replay: write every evaluation here")
+    return ap.parse_args()
+
+
+def run_replay(args):
+    out = open(args.out, "w") if args.out else None
+    last = {}
+
+    def on_eval(ts, m, sn):
+        last[m.name] = sn
+        if out:
+            out.write(f"{ts:.3f},{m.name},{sn.mid},{sn.bias:.2f},{sn.trend},"
+                      f"{sn.pm_up if sn.pm_up is not None else ''},"
+                      f"{sn.pm_dn if sn.pm_dn is not None else ''}\n")
+
+    if out:
+        out.write("ts,market,mid,bias,trend,pm_up,pm_dn\n")
+    stats = Replay(args.replay).run(every=args.every, on_eval=on_eval)
+    if out:
+        out.close()
+
+    console.print(f"[bold]Replayed[/bold] {stats.events:,} events covering "
+                  f"{stats.span:,.0f}s in {stats.wall:.2f}s  "
+                  f"→ {stats.eps:,.0f} events/s, {stats.speedup:,.0f}× real time, "
+                  f"{stats.evals:,} evaluations")
+    for name, sn in last.items():
+        console.print(f"  {name:<10} mid {sn.mid:>12,.2f}  bias {sn.bias:+6.1f}  trend {sn.trend:+d}")
 
 
-async def main():
+ALL = "ALL (overview)"
+
+
+async def main(args):
+    if args.serve:
+        await run_headless(args)
+        return
+
     console.print("\n[bold magenta]═══ CRYPTO PREDICTION DASHBOARD ═══[/bold magenta]\n")
 
-    coin = pick("Select coin:", config.COINS)
+    coin = pick("Select coin:", config.COINS + [ALL])
+    if coin == ALL:
+        await run_all(args)
+        return
     tf   = pick("Select timeframe:", config.COIN_TIMEFRAMES[coin])
 
     console.print(f"\n[bold green]Starting {coin} {tf} …[/bold green]\n")
 
     state = feeds.State()
+    binance_sym = config.COIN_BINANCE[coin]
+    kline_iv    = config.TF_KLINE[tf]
 
-    state.pm_up_id, state.pm_dn_id = feeds.fetch_pm_tokens(coin, tf)
+    # market lookup and candle history are independent: fetch both at once
+    console.print("  [PM] looking up market · [Binance] bootstrapping candles …")
+    (state.pm_up_id, state.pm_dn_id), _ = await asyncio.gather(
+        asyncio.to_thread(feeds.fetch_pm_tokens, coin, tf),
+        feeds.bootstrap(binance_sym, kline_iv, state),
+    )
+    feeds.record_market(coin, tf, state)
     if state.pm_up_id:
         console.print(f"  [PM] Up   → {state.pm_up_id[:24]}…")
         console.print(f"  [PM] Down → {state.pm_dn_id[:24]}…")
     else:
-        console.print("  [yellow][PM] no market for this coin/timeframe – prices will not show[/yellow]")
+        console.print("  [yellow][PM] no market for this window yet – prices show from the next one[/yellow]")
 
-    binance_sym = config.COIN_BINANCE[coin]
-    kline_iv    = config.TF_KLINE[tf]
-    console.print("  [Binance] bootstrapping candles …")
-    await feeds.bootstrap(binance_sym, kline_iv, state)
+    ob_task = (feeds.depth_feed(binance_sym, state) if config.OB_SOURCE == "stream"
+               else feeds.ob_poller(binance_sym, state))
+    if args.worker:
+        # before the feeds start: this moves state.trades into shared memory
+        display = publish_loop(state, shmstate.Publisher(state), coin, tf)
+    else:
+        display = display_loop(state, coin, tf, args.diag)
 
     await asyncio.gather(
-        feeds.ob_poller(binance_sym, state),
+        ob_task,
         feeds.binance_feed(binance_sym, kline_iv, state),
-        feeds.pm_feed(state),
-        display_loop(state, coin, tf),
+        feeds.pm_feed(coin, tf, state),
+        display,
+        *instrumentation(args),
+        *alert_tasks(args, [markets.Market(coin, tf, state)]),
     )
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    args = parse_args()
+    if args.replay:
+        run_replay(args)
+        sys.exit()
+    if args.record:
+        feeds.recorder = Recorder(args.record)
+    try:
+        asyncio.run(main(args))
+    finally:
+        if feeds.recorder:
+            feeds.recorder.close()
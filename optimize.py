@@ -0,0 +1,362 @@
+"""Offline parameter sweep for BIAS_WEIGHTS and the indicator periods.
+
+    python optimize.py --coin BTC --tf 5m --days 30          # fetch 1m history, sweep
+    python optimize.py --tf 15m --grid 0,5,10 --rsi 9,14     # custom grids
+    python optimize.py --store .candles/BTCUSDT_1m.bin       # use the local candle store
+    python optimize.py --json sweep.json --top 20
+
+Each configuration is scored on every past window of the market: the bias
+at the window start (or `--at` seconds in) against whether the window
+closed Up (close ≥ open). Scores are the Brier score and log-loss of
+indicators.bias_prob, and the hit rate of the bias sign.
+"""
+import sys
+import os
+import json
+import time
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+import candles
+import candlestore
+import config
+import feeds
+import klinecache
+
+try:
+    import numpy as np
+    import indicators_np as npi
+except ImportError:
+    np = None
+
+# Components of indicators.bias_from that can be rebuilt from candle
+# history. OBI and walls need the live book: they contribute 0 here but
+# keep their configured weights in the normalisation, as in bias_from.
+COMPONENTS = ("ema", "macd", "cvd", "ha", "vwap", "rsi", "poc")
+OFFLINE    = ("obi", "walls")
+
+# 1m history columns
+T, O, H, L, C, V, QV, TBQ = range(8)
+
+
+# ── history ─────────────────────────────────────────────────────
+def _hist_path(symbol: str) -> str | None:
+    return os.path.join(klinecache.ROOT, f"{symbol}_1m_hist.npy") if klinecache.ROOT else None
+
+
+def _fetch(symbol: str, start: float, end: float) -> list[list[float]]:
+    rows = []
+    while start < end:
+        resp = requests.get(f"{config.BINANCE_REST}/klines", timeout=10, params={
+            "symbol": symbol, "interval": "1m", "limit": 1000, "startTime": int(start * 1000),
+        }).json()
+        # closed bars only; t, o, h, l, c, v, quote volume, taker-buy quote volume
+        rows += [[r[0] / 1e3, *map(float, r[1:6]), float(r[7]), float(r[10])]
+                 for r in resp if r[6] / 1e3 < end]
+        if len(resp) < 1000:
+            break
+        start = resp[-1][0] / 1e3 + 60
+        print(f"\r  fetched {len(rows):,} bars", end="", flush=True)
+    print()
+    return rows
+
+
+def load_rest(symbol: str, days: float) -> "np.ndarray":
+    """`days` of closed 1m bars with taker-buy volume (aggregated trade
+    flow), cached next to the kline cache; only the missing tail is fetched."""
+    path = _hist_path(symbol)
+    now  = time.time() // 60 * 60
+    want = now - days * 86400
+    old  = np.empty((0, 8))
+    if path and os.path.exists(path):
+        old = np.load(path)
+        if len(old) and old[0, T] > want:
+            old = np.empty((0, 8))          # cache starts too late: refetch all
+    start = old[-1, T] + 60 if len(old) else want
+    new   = np.array(_fetch(symbol, start, now)).reshape(-1, 8)
+    rows  = np.concatenate((old, new))
+    if path:
+        os.makedirs(klinecache.ROOT, exist_ok=True)
+        np.save(path, rows)
+    return rows[rows[:, T] >= want]
+
+
+def load_store(path: str) -> "np.ndarray":
+    """1m bars from a candlestore file. It has no trade flow, so each bar's
+    quote volume counts as bought on an up candle and sold on a down one."""
+    st = candlestore.CandleStore(path, 60, readonly=True)
+    r  = np.frombuffer(st.buffer(len(st)), dtype="<f8").reshape(-1, 6)
+    qv = r[:, V] * r[:, C]
+    tb = np.where(r[:, C] >= r[:, O], qv, 0.0)
+    return np.column_stack((r, qv, tb))
+
+
+def aggregate(rows: "np.ndarray", secs: int) -> "np.ndarray":
+    """Roll 1m bars up to `secs` bars; incomplete buckets are dropped."""
+    if secs == 60:
+        return rows[:, :6].copy()
+    b      = rows[:, T] // secs
+    starts = np.flatnonzero(np.r_[True, b[1:] != b[:-1]])
+    count  = np.diff(np.r_[starts, len(rows)])
+    out = np.column_stack((
+        b[starts] * secs,
+        rows[starts, O],
+        np.maximum.reduceat(rows[:, H], starts),
+        np.minimum.reduceat(rows[:, L], starts),
+        rows[np.r_[starts[1:], len(rows)] - 1, C],
+        np.add.reduceat(rows[:, V], starts),
+    ))
+    return out[count == secs // 60]
+
+
+# ── samples ─────────────────────────────────────────────────────
+def _col(i: int):
+    return property(lambda self: self.rows[:, i])
+
+
+class _Cols:
+    """indicators_np.Candles-compatible columns over (t, o, h, l, c, v) rows."""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    t, o, h, l, c, v = (_col(i) for i in range(6))
+
+
+class Samples:
+    """Every past window of one market with the period-independent bias
+    inputs at its decision time and the realized outcome."""
+
+    def __init__(self, rows, tf: str, at: int = 0, lookback: int = config.KLINE_MAX,
+                 warmup: int = 200):
+        secs = candles.INTERVAL_SECS[config.TF_KLINE[tf]]
+        bars = aggregate(rows, secs)
+        t1   = rows[:, T]
+        tb   = bars[:, T]
+        self.closes = bars[:, C]
+
+        # window boundaries as the live markets roll them
+        idx, mid, y = [], [], []
+        s = feeds.window_end(tf, tb[0] + secs * max(warmup, lookback))
+        while True:
+            e = feeds.window_end(tf, s)
+            if e > t1[-1] + 60:
+                break
+            i_s, i_e = np.searchsorted(t1, (s, e - 60))
+            d  = s + at
+            j  = int(np.searchsorted(tb + secs, d, side="right"))   # bars closed by d
+            i_d = int(np.searchsorted(t1 + 60, d, side="right"))    # 1m bars closed by d
+            if (i_s < len(t1) and i_e < len(t1) and t1[i_s] == s and t1[i_e] == e - 60
+                    and i_d > 5 and j >= lookback):
+                idx.append((j, i_d))
+                mid.append(rows[i_d - 1, C])
+                y.append(rows[i_e, C] >= rows[i_s, O])
+            s = e
+        if not idx:
+            raise SystemExit("  not enough history for a single window")
+
+        j, i_d = np.array(idx).T
+        self.idx = j - 1                          # last closed bar per sample
+        self.mid = np.array(mid)
+        self.y   = np.array(y, dtype=float)
+
+        # CVD over the last 5 minutes: signed taker flow of the 1m bars
+        flow = np.r_[0.0, np.cumsum(2 * rows[:, TBQ] - rows[:, QV])]
+        self.cvd = np.sign(flow[i_d] - flow[i_d - 5])
+
+        # Heikin-Ashi streak of the last 3 bars, as in bias_from
+        ho, _, _, hc = npi.heikin_ashi_arrays(_Cols(bars))
+        g = hc >= ho
+        g1, g2, g3 = g[self.idx], g[self.idx - 1], g[self.idx - 2]
+        up   = g1 * (1 + g2 * (1 + g3))
+        down = ~g1 * (1 + ~g2 * (1 + ~g3))
+        self.ha = np.where(g1, up, -down) / 3
+
+        # VWAP and POC over the newest `lookback` bars
+        tpv = np.r_[0.0, np.cumsum((bars[:, H] + bars[:, L] + bars[:, C]) / 3 * bars[:, V])]
+        vol = np.r_[0.0, np.cumsum(bars[:, V])]
+        lo, hi = self.idx + 1 - lookback, self.idx + 1
+        with np.errstate(invalid="ignore", divide="ignore"):
+            vwap = (tpv[hi] - tpv[lo]) / (vol[hi] - vol[lo])
+        self.vwap = np.where(np.isnan(vwap), 0.0, np.where(self.mid > vwap, 1.0, -1.0))
+        poc = np.array([
+            npi.vol_profile(_Cols(bars[a:b]))[0]
+            for a, b in zip(lo, hi)
+        ])
+        self.poc = np.where(poc > 0, np.where(self.mid > poc, 1.0, -1.0), 0.0)
+
+    def __len__(self):
+        return len(self.y)
+
+
+def components(sm: Samples, rsi_n: int, macd_p: tuple, ema_p: tuple) -> "np.ndarray":
+    """(samples × COMPONENTS) matrix of per-unit-weight contributions."""
+    i = sm.idx
+    es, el = npi.ema_series(sm.closes, ema_p[0])[i], npi.ema_series(sm.closes, ema_p[1])[i]
+    ema  = np.where(np.isnan(es) | np.isnan(el), 0.0, np.where(es > el, 1.0, -1.0))
+    hist = npi.macd_series(sm.closes, *macd_p)[2][i]
+    macd = np.where(np.isnan(hist), 0.0, np.where(hist > 0, 1.0, -1.0))
+    r    = npi.rsi_series(sm.closes, rsi_n)[i]
+    rsi  = np.where(np.isnan(r), 0.0, np.clip((50 - r) / 20, -1.0, 1.0))
+    return np.column_stack((ema, macd, sm.cvd, sm.ha, sm.vwap, rsi, sm.poc))
+
+
+def score(comp, y, weights, fixed: float) -> dict[str, "np.ndarray"]:
+    """Brier, log-loss and sign hit rate of every row of `weights`
+    (configs × COMPONENTS) over the samples, as bias_prob(bias_from(...))."""
+    # flip each sample towards its outcome: s > 0 is a correct call and
+    # 0.5 + s / 2 the probability given to what happened
+    s = (comp * (2 * y - 1)[:, None]).astype(np.float32) @ weights.T.astype(np.float32)
+    called = s != 0
+    hit    = (s > 0).sum(axis=0)
+    s /= np.maximum(weights.sum(axis=1) + fixed, 1e-9).astype(np.float32)
+    q = np.clip(s, -1.0, 1.0, out=s)                 # bias / 100, clamped ±100
+    q *= 0.5
+    q += 0.5
+    brier = np.square(1 - q).mean(axis=0, dtype=np.float64)
+    np.maximum(q, 1e-6, out=q)
+    return {
+        "brier":   brier,
+        "logloss": -np.log(q).mean(axis=0, dtype=np.float64),
+        "hit":     hit / np.maximum(called.sum(axis=0), 1),
+        "cover":   called.mean(axis=0),
+    }
+
+
+# ── sweep ───────────────────────────────────────────────────────
+_W: dict = {}
+
+
+def _init(samples: Samples, grid: "np.ndarray", fixed: float, by: str, top: int, chunk: int):
+    _W.update(samples=samples, grid=grid, fixed=fixed, by=by, top=top, chunk=chunk)
+
+
+def _best(sc: dict, by: str, top: int):
+    key = -sc[by] if by == "hit" else sc[by]
+    k   = min(top, len(key))
+    return np.argpartition(key, k - 1)[:k]
+
+
+def sweep_periods(periods: tuple) -> list[dict]:
+    """Worker task: every weight row of the grid for one period setting."""
+    sm, grid, by, top = _W["samples"], _W["grid"], _W["by"], _W["top"]
+    comp = components(sm, *periods)
+    out  = []
+    for a in range(0, len(grid), _W["chunk"]):
+        w  = grid[a:a + _W["chunk"]]
+        sc = score(comp, sm.y, w, _W["fixed"])
+        for k in _best(sc, by, top):
+            out.append(_result(periods, w[k], {n: float(v[k]) for n, v in sc.items()}))
+    out.sort(key=lambda r: -r[by] if by == "hit" else r[by])
+    return out[:top]
+
+
+def _result(periods, w, sc) -> dict:
+    rsi_n, macd_p, ema_p = periods
+    return {**sc, "rsi": rsi_n, "macd": list(macd_p), "ema": list(ema_p),
+            "weights": {n: float(x) for n, x in zip(COMPONENTS, w)}}
+
+
+def _pairs(spec: str, n: int) -> list[tuple]:
+    out = [tuple(int(x) for x in s.split("/")) for s in spec.split(",")]
+    if any(len(p) != n for p in out):
+        raise SystemExit(f"  expected {n} '/'-separated periods per entry: {spec!r}")
+    return out
+
+
+def weight_grid(spec: str) -> "np.ndarray":
+    vals = [float(x) for x in spec.split(",")]
+    grid = np.array(list(itertools.product(vals, repeat=len(COMPONENTS))))
+    return grid[grid.sum(axis=1) > 0]
+
+
+def _row(rank, r) -> str:
+    w = "".join(f"{r['weights'][n]:>6g}" for n in COMPONENTS)
+    return (f"  {rank:>4} {r['brier']:>8.5f} {r['logloss']:>8.5f} {r['hit'] * 100:>6.2f} "
+            f"{r['cover'] * 100:>6.1f}  {r['rsi']:>3} {'/'.join(map(str, r['macd'])):>8} "
+            f"{'/'.join(map(str, r['ema'])):>6} {w}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Bias weight / indicator period sweep")
+    ap.add_argument("--coin", default="BTC", choices=list(config.COIN_BINANCE))
+    ap.add_argument("--tf", default="5m", choices=list(config.TF_KLINE))
+    ap.add_argument("--days", type=float, default=30)
+    ap.add_argument("--store", metavar="PATH", help="read 1m bars from a candle store file instead")
+    ap.add_argument("--at", type=int, default=0, help="decision time, seconds into each window")
+    ap.add_argument("--lookback", type=int,
+                    default=config.KLINE_LOOKBACK if config.CANDLE_STORE else config.KLINE_MAX,
+                    help="bars behind VWAP / POC")
+    ap.add_argument("--grid", default="0,4,8,12", help="weight values tried for every component")
+    ap.add_argument("--rsi", default="7,14,21")
+    ap.add_argument("--macd", default="12/26/9,8/21/5,5/35/5", help="fast/slow/signal,...")
+    ap.add_argument("--ema", default="5/20,9/21,3/10", help="short/long,...")
+    ap.add_argument("--by", default="brier", choices=("brier", "logloss", "hit"))
+    ap.add_argument("--top", type=int, default=10)
+    ap.add_argument("--workers", type=int, default=os.cpu_count())
+    ap.add_argument("--chunk", type=int, default=1024, help="weight rows per matrix product")
+    ap.add_argument("--json", metavar="PATH", help="write the ranking as JSON")
+    args = ap.parse_args()
+
+    if np is None:
+        raise SystemExit("optimize.py needs numpy (pip install numpy)")
+
+    t0   = time.perf_counter()
+    rows = load_store(args.store) if args.store else load_rest(config.COIN_BINANCE[args.coin], args.days)
+    sm   = Samples(rows, args.tf, args.at, args.lookback)
+    print(f"  {len(rows):,} 1m bars → {len(sm):,} {args.tf} windows, "
+          f"{sm.y.mean() * 100:.1f} % Up   ({time.perf_counter() - t0:.1f} s)")
+
+    fixed   = float(sum(config.BIAS_WEIGHTS[n] for n in OFFLINE))
+    grid    = weight_grid(args.grid)
+    periods = list(itertools.product(
+        [int(x) for x in args.rsi.split(",")], _pairs(args.macd, 3), _pairs(args.ema, 2)))
+    print(f"  {len(periods)} period settings × {len(grid):,} weight sets = "
+          f"{len(periods) * len(grid):,} configs on {args.workers} workers")
+
+    cur = (config.RSI_PERIOD, (config.MACD_FAST, config.MACD_SLOW, config.MACD_SIG),
+           (config.EMA_S, config.EMA_L))
+    w0  = np.array([[config.BIAS_WEIGHTS[n] for n in COMPONENTS]], dtype=float)
+    base = _result(cur, w0[0], {n: float(v[0]) for n, v in
+                                score(components(sm, *cur), sm.y, w0, fixed).items()})
+
+    t1 = time.perf_counter()
+    with ProcessPoolExecutor(args.workers, initializer=_init,
+                             initargs=(sm, grid, fixed, args.by, args.top, args.chunk)) as pool:
+        ranked = [r for part in pool.map(sweep_periods, periods) for r in part]
+    ranked.sort(key=lambda r: -r[args.by] if args.by == "hit" else r[args.by])
+    ranked = ranked[:args.top]
+    dt = time.perf_counter() - t1
+
+    head = "".join(f"{n:>6}" for n in COMPONENTS)
+    print(f"\n  {'rank':>4} {'brier':>8} {'logloss':>8} {'hit%':>6} {'cover%':>6}  "
+          f"{'rsi':>3} {'macd':>8} {'ema':>6} {head}")
+    print(_row("cfg", base))
+    for i, r in enumerate(ranked, 1):
+        print(_row(i, r))
+    n = len(periods) * len(grid)
+    print(f"\n  {n:,} configs in {dt:.1f} s ({n / dt:,.0f}/s); "
+          f"constant 0.5 scores brier 0.25000, logloss {np.log(2):.5f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "meta": {"coin": args.coin, "tf": args.tf, "windows": len(sm), "at": args.at,
+                         "lookback": args.lookback, "by": args.by, "configs": n,
+                         "fixed": {k: config.BIAS_WEIGHTS[k] for k in OFFLINE},
+                         "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+                "current": base,
+                "ranked":  ranked,
+            }, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
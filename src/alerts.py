@@ -0,0 +1,221 @@
+import asyncio
+import json
+import operator
+import os
+import stat
+import time
+
+import requests
+
+import clock
+import config
+import metrics
+import snapshot
+
+_CMP = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le,
+        "==": operator.eq, "!=": operator.ne}
+
+fired     = metrics.counter("pm_assistant_alerts_total", "Alerts dispatched")
+eval_time = metrics.histogram("pm_assistant_alert_eval_seconds", "Alert pass over every changed market")
+sink_errs = metrics.counter("pm_assistant_alert_sink_errors_total", "Alert deliveries that failed")
+
+
+class Rule:
+    """One condition on a field of snapshot.as_dict().
+
+    Comparison ops (> >= < <= == !=) fire when the condition turns true;
+    "sign" fires when the value changes sign (e.g. a MACD histogram flip),
+    "rise" when it increases (a new wall), "change" on any change (a new
+    trend label). A rule then stays quiet on that market for `debounce`
+    seconds.
+    """
+
+    def __init__(self, name: str, field: str, op: str, value=None,
+                 debounce: float = config.ALERT_DEBOUNCE, markets=None):
+        if op not in _CMP and op not in ("sign", "rise", "change"):
+            raise ValueError(f"alert rule {name!r}: unknown op {op!r}")
+        self.name     = name
+        self.field    = field
+        self.op       = op
+        self.value    = value
+        self.debounce = debounce
+        self.markets  = set(markets) if markets else None
+
+    def hit(self, prev, cur) -> bool:
+        if cur is None:
+            return False
+        if self.op in _CMP:
+            cmp = _CMP[self.op]
+            return cmp(cur, self.value) and not (prev is not None and cmp(prev, self.value))
+        if prev is None:
+            return False
+        if self.op == "sign":
+            return (cur > 0) != (prev > 0) and cur != 0 and prev != 0
+        if self.op == "rise":
+            return cur > prev
+        return cur != prev
+
+
+def rules_from(specs) -> list[Rule]:
+    return [Rule(**s) for s in specs]
+
+
+# ── sinks ───────────────────────────────────────────────────────
+class FileSink:
+    """Append one JSON line per alert."""
+
+    def __init__(self, path: str):
+        self.f = open(path, "a", buffering=1)
+
+    async def start(self):
+        pass
+
+    def send(self, line: str):
+        self.f.write(line + "\n")
+
+
+class SocketSink:
+    """UNIX socket server; every connected client receives each alert as
+    a JSON line."""
+
+    def __init__(self, path: str):
+        self.path    = path
+        self.clients: set = set()
+        self.server  = None
+
+    async def start(self):
+        async def handle(reader, writer):
+            self.clients.add(writer)
+            try:
+                await reader.read()          # until the client hangs up
+            finally:
+                self.clients.discard(writer)
+                writer.close()
+
+        if os.path.exists(self.path) and stat.S_ISSOCK(os.stat(self.path).st_mode):
+            os.unlink(self.path)             # left over from a previous run
+        self.server = await asyncio.start_unix_server(handle, self.path)
+        print(f"  [alerts] unix socket {self.path}")
+
+    def send(self, line: str):
+        data = (line + "\n").encode()
+        for w in list(self.clients):
+            if w.is_closing() or w.transport.get_write_buffer_size() > 1 << 20:
+                self.clients.discard(w)      # gone or not reading: drop it
+                sink_errs.inc()
+                continue
+            w.write(data)
+
+
+class WebhookSink:
+    """POST each alert as JSON to `url` on a worker thread, so a slow
+    endpoint never delays evaluation."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.http = requests.Session()
+        self._tasks: set = set()
+
+    async def start(self):
+        pass
+
+    def _post(self, line: str):
+        try:
+            self.http.post(self.url, data=line, timeout=2,
+                           headers={"Content-Type": "application/json"})
+        except requests.RequestException:
+            sink_errs.inc()
+
+    def send(self, line: str):
+        t = asyncio.ensure_future(asyncio.to_thread(self._post, line))
+        self._tasks.add(t)
+        t.add_done_callback(self._tasks.discard)
+
+
+def sinks_from(file: str = "", sock: str = "", webhook: str = "") -> list:
+    out = []
+    if file:
+        out.append(FileSink(file))
+    if sock:
+        out.append(SocketSink(sock))
+    if webhook:
+        out.append(WebhookSink(webhook))
+    return out
+
+
+# ── engine ──────────────────────────────────────────────────────
+class AlertEngine:
+    """Evaluates rules against every market whenever its state changes.
+
+    The engine listens on each market's `changed` signal, not the render
+    tick, so a match is dispatched within one event-loop turn of the feed
+    update that caused it. Markets whose snapshot is unchanged since the
+    last pass are skipped (snapshot.take returns the cached object).
+    """
+
+    def __init__(self, markets, rules: list[Rule], sinks: list):
+        self.markets = markets
+        self.rules   = rules
+        self.sinks   = sinks
+        self._snap: dict[str, snapshot.Snapshot] = {}
+        self._prev: dict[str, dict] = {}
+        self._last: dict[tuple[str, str], float] = {}    # (market, rule) → last fire
+
+    def evaluate(self, now: float | None = None) -> list[dict]:
+        now = clock.now() if now is None else now
+        out = []
+        for m in self.markets:
+            st = m.state
+            if not (st.mid and st.klines):
+                continue
+            sn = snapshot.take(st)
+            if sn is self._snap.get(m.name):
+                continue
+            self._snap[m.name] = sn
+            cur  = snapshot.as_dict(sn)
+            prev = self._prev.get(m.name, {})
+            self._prev[m.name] = cur
+            for r in self.rules:
+                if r.markets and m.name not in r.markets:
+                    continue
+                was, val = prev.get(r.field), cur.get(r.field)
+                if not r.hit(was, val):
+                    continue
+                key = (m.name, r.name)
+                if now - self._last.get(key, -1e18) < r.debounce:
+                    continue
+                self._last[key] = now
+                out.append({
+                    "ts": now, "market": m.name, "rule": r.name,
+                    "field": r.field, "op": r.op, "threshold": r.value,
+                    "value": val, "prev": was, "mid": cur["mid"], "bias": cur["bias"],
+                })
+        return out
+
+    def dispatch(self, alerts: list[dict]):
+        for a in alerts:
+            line = json.dumps(a)
+            for s in self.sinks:
+                try:
+                    s.send(line)
+                except OSError:
+                    sink_errs.inc()
+            fired.inc()
+
+    async def run(self):
+        for s in self.sinks:
+            await s.start()
+        # every market in one view shares a signal; listen once per signal
+        signals = {id(m.state.changed): m.state.changed for m in self.markets}
+        events  = [sig.listen() for sig in signals.values()]
+        waits   = {asyncio.ensure_future(ev.wait()): ev for ev in events}
+        while True:
+            # CVD windows slide with the clock, so re-check at least once a second
+            done, _ = await asyncio.wait(waits, timeout=1.0, return_when=asyncio.FIRST_COMPLETED)
+            for fut in done:
+                ev = waits.pop(fut)
+                ev.clear()
+                waits[asyncio.ensure_future(ev.wait())] = ev
+            t0 = time.perf_counter()
+            self.dispatch(self.evaluate())
+            eval_time.observe(time.perf_counter() - t0)
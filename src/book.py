@@ -0,0 +1,302 @@
+import math
+from bisect import bisect_left, bisect_right, insort
+
+
+class _Side:
+    """One side of a book: price → qty map plus a sorted key list.
+
+    Keys are stored as price × sign so that index 0 is always the best
+    level (sign −1 for bids, +1 for asks).
+
+    For deep books the side also keeps the levels ordered by qty and a
+    running qty total (walls), and cumulative qty / notional summed from
+    the *worst* level. A band from the best level is the total minus one
+    cumulative entry, found with one bisect. A change at depth j only
+    makes the entries of the j levels above it stale, and they are
+    recomputed on the next query. Activity concentrates at the touch, so
+    an update costs O(log n) plus a few levels, not a rescan of the book.
+    """
+
+    def __init__(self, sign: int):
+        self.sign  = sign
+        self.keys: list[float] = []
+        self.qty:  dict[float, float] = {}
+        self.byq:  list[tuple[float, float]] = []    # (qty, price), ascending
+        self.total = 0.0
+        self._cq: list[float] = []     # cumulative qty from the worst level, worst first
+        self._cn: list[float] = []     # same for notional
+        self._ok = 0                   # _cq / _cn are valid below this index
+        self._bq = self._bn = 0.0      # sums of trimmed levels still inside _cq / _cn
+
+    def clear(self):
+        self.keys.clear()
+        self.qty.clear()
+        self.byq.clear()
+        self.total = 0.0
+        self._cq.clear()
+        self._cn.clear()
+        self._ok = 0
+        self._bq = self._bn = 0.0
+
+    def set(self, p: float, q: float):
+        old = self.qty.get(p)
+        if old is None and q == 0:
+            return
+        keys = self.keys
+        k    = p * self.sign
+        i    = bisect_left(keys, k)
+        if old is not None:
+            del self.byq[bisect_left(self.byq, (old, p))]
+            self.total -= old
+        if q == 0:
+            del keys[i]
+            del self.qty[p]
+            w = len(keys) - i                     # worst-first index it had
+            del self._cq[w]
+            del self._cn[w]
+            if not keys:
+                self.total = 0.0                  # no float dust on an empty side
+        else:
+            if old is None:
+                keys.insert(i, k)
+                w = len(keys) - 1 - i
+                self._cq.insert(w, 0.0)
+                self._cn.insert(w, 0.0)
+            else:
+                w = len(keys) - 1 - i
+            self.qty[p] = q
+            insort(self.byq, (q, p))
+            self.total += q
+        if w < self._ok:
+            self._ok = w
+
+    def trim(self, n: int):
+        """Drop the levels beyond the best `n`. Cumulative entries above the
+        cut stay valid: the dropped sums are carried as an offset."""
+        k = len(self.keys) - n
+        if k <= 0:
+            return
+        s, qty, byq = self.sign, self.qty, self.byq
+        for key in self.keys[n:]:
+            p = key * s
+            q = qty.pop(p)
+            del byq[bisect_left(byq, (q, p))]
+            self.total -= q
+        del self.keys[n:]
+        if self._ok >= k:
+            self._bq = self._cq[k - 1]
+            self._bn = self._cn[k - 1]
+            self._ok -= k
+        else:
+            self._ok = 0
+        del self._cq[:k]
+        del self._cn[:k]
+
+    def best(self) -> float | None:
+        return self.keys[0] * self.sign if self.keys else None
+
+    def _refresh(self):
+        """Recompute the stale cumulative entries (the levels nearest the
+        best, which is where changes land)."""
+        keys, n = self.keys, len(self.keys)
+        w = self._ok
+        if w >= n:
+            return
+        s, qty, cq, cn = self.sign, self.qty, self._cq, self._cn
+        if w:
+            aq, an = cq[w - 1], cn[w - 1]
+        else:
+            aq = an = self._bq = self._bn = 0.0
+        for j in range(n - 1 - w, -1, -1):        # best-first index of worst-first w..n-1
+            p  = keys[j] * s
+            q  = qty[p]
+            aq += q
+            an += p * q
+            cq[w], cn[w] = aq, an
+            w += 1
+        self._ok = n
+
+    def depth_to(self, p: float) -> tuple[float, float]:
+        """(qty, notional) of the levels from the best up to and including `p`."""
+        keys = self.keys
+        end  = bisect_right(keys, p * self.sign + 1e-9)
+        if not end:
+            return 0.0, 0.0
+        self._refresh()
+        n  = len(keys)
+        cq, cn = self._cq, self._cn
+        if end == n:
+            return cq[-1] - self._bq, cn[-1] - self._bn
+        return cq[-1] - cq[n - 1 - end], cn[-1] - cn[n - 1 - end]
+
+    def size_to(self, p: float) -> float:
+        """Total qty of the levels from the best up to and including `p`."""
+        return self.depth_to(p)[0]
+
+    def above(self, thr: float, to: float | None = None) -> list[tuple[float, float]]:
+        """Levels with qty >= thr, best first; with `to`, only those from
+        the best through that price."""
+        s   = self.sign
+        out = self.byq[bisect_left(self.byq, (thr, -math.inf)):]
+        lim = math.inf if to is None else to * s + 1e-9
+        return sorted(((p, q) for q, p in out if p * s <= lim), key=lambda l: l[0] * s)
+
+    def top(self, n: int) -> list[tuple[float, float]]:
+        s, qty = self.sign, self.qty
+        return [(k * s, qty[k * s]) for k in self.keys[:n]]
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class OrderBook:
+    """Local Binance order book kept from a REST snapshot plus the
+    `@depth` diff stream, following Binance's sync procedure:
+
+    1. buffer diff events until a snapshot is loaded
+    2. drop events with u <= lastUpdateId
+    3. the first applied event must have U <= lastUpdateId + 1
+    4. every later event must start at the previous u + 1
+
+    Any violation flags a gap; the caller fetches a new snapshot.
+
+    With `depth`, each side is pruned to its best `depth` levels after
+    every diff: a level beyond the snapshot depth that a diff never
+    touches is not in the book, so the tail past it is incomplete.
+    """
+
+    def __init__(self, depth: int | None = None):
+        self.bids = _Side(-1)
+        self.asks = _Side(+1)
+        self.depth = depth
+        self.last_id = 0
+        self.synced  = False
+        self._fresh  = False      # next event is the first after a snapshot
+        self.buffer: list[dict] = []
+        self.resyncs = 0
+
+    def reset(self):
+        self.bids.clear()
+        self.asks.clear()
+        self.last_id = 0
+        self.synced  = False
+        self.buffer.clear()
+
+    def load(self, bids, asks):
+        """Replace both sides with [price, qty] rows (snapshot or poll)."""
+        self.bids.clear()
+        self.asks.clear()
+        for p, q in bids:
+            self.bids.set(float(p), float(q))
+        for p, q in asks:
+            self.asks.set(float(p), float(q))
+
+    def _apply(self, ev):
+        for p, q in ev["b"]:
+            self.bids.set(float(p), float(q))
+        for p, q in ev["a"]:
+            self.asks.set(float(p), float(q))
+        if self.depth:
+            self.bids.trim(self.depth)
+            self.asks.trim(self.depth)
+        self.last_id = ev["u"]
+
+    def on_event(self, ev: dict) -> bool:
+        """Feed one diff event. Returns True if the book changed."""
+        if not self.synced:
+            self.buffer.append(ev)
+            return False
+        if ev["u"] <= self.last_id:
+            return False
+        nxt = self.last_id + 1
+        if (ev["U"] > nxt) if self._fresh else (ev["U"] != nxt):
+            self._gap()
+            self.buffer.append(ev)
+            return False
+        self._fresh = False
+        self._apply(ev)
+        return True
+
+    def on_snapshot(self, snap: dict) -> bool:
+        """Load a REST depth snapshot and replay buffered events.
+        Returns False if the snapshot is unusable and must be refetched."""
+        lid = snap["lastUpdateId"]
+        if self.buffer and lid < self.buffer[0]["U"] - 1:
+            return False          # snapshot older than our first buffered diff
+
+        self.load(snap["bids"], snap["asks"])
+        self.last_id = lid
+        self.synced  = True
+        self._fresh  = True
+
+        pending, self.buffer = self.buffer, []
+        for i, ev in enumerate(pending):
+            self.on_event(ev)
+            if not self.synced:
+                self.buffer.extend(pending[i + 1:])
+                return False
+        return True
+
+    def _gap(self):
+        self.synced = False
+        self.buffer.clear()
+        self.resyncs += 1
+
+    def publish(self, states, levels: int):
+        """Copy the top `levels` of each side and the mid into every state;
+        book metrics read the whole book through `state.book`."""
+        bids = self.bids.top(levels)
+        asks = self.asks.top(levels)
+        mid  = (bids[0][0] + asks[0][0]) / 2 if bids and asks else None
+        for st in states:
+            st.bids, st.asks = bids, asks
+            if mid is not None:
+                st.mid = mid
+            st.book_ver += 1
+            st.changed.set()
+
+
+class PmBook:
+    """Polymarket book of one outcome token, kept from `book` snapshots
+    and `price_change` level updates (each carries the level's new size)."""
+
+    def __init__(self):
+        self.bids = _Side(-1)
+        self.asks = _Side(+1)
+
+    def on_book(self, bids: list[dict], asks: list[dict]):
+        self.bids.clear()
+        self.asks.clear()
+        for lv in bids:
+            self.bids.set(float(lv["price"]), float(lv["size"]))
+        for lv in asks:
+            self.asks.set(float(lv["price"]), float(lv["size"]))
+
+    def on_change(self, price: float, size: float, side: str):
+        (self.bids if side == "BUY" else self.asks).set(price, size)
+
+    @property
+    def best_bid(self) -> float | None:
+        return self.bids.best()
+
+    @property
+    def best_ask(self) -> float | None:
+        return self.asks.best()
+
+    def quote(self, cents: float) -> dict:
+        """Top of book, implied probability and the size resting within
+        `cents` of each touch."""
+        bid, ask = self.best_bid, self.best_ask
+        if bid is not None and ask is not None:
+            mid, spread = (bid + ask) / 2, ask - bid
+        else:
+            mid, spread = (bid if ask is None else ask), None
+        return {
+            "bid":      bid,
+            "ask":      ask,
+            "mid":      mid,
+            "spread":   spread,
+            "prob":     mid,
+            "bid_size": self.bids.size_to(bid - cents / 100) if bid is not None else 0.0,
+            "ask_size": self.asks.size_to(ask + cents / 100) if ask is not None else 0.0,
+        }
@@ -0,0 +1,77 @@
+import config
+
+INTERVAL_SECS = {
+    "1m": 60, "3m": 180, "5m": 300, "15m": 900, "30m": 1800,
+    "1h": 3600, "2h": 7200, "4h": 14400, "6h": 21600, "12h": 43200, "1d": 86400,
+}
+
+
+def aggregate(rows: list[dict], interval: str) -> list[dict]:
+    """Roll 1m klines up to `interval`. A leading bucket that the rows do
+    not cover from its start is dropped; the last bucket may be partial
+    (it is the forming candle)."""
+    secs = INTERVAL_SECS[interval]
+    out: list[dict] = []
+    for r in rows:
+        b = r["t"] - r["t"] % secs
+        if out and out[-1]["t"] == b:
+            k = out[-1]
+            k["h"] = max(k["h"], r["h"])
+            k["l"] = min(k["l"], r["l"])
+            k["c"] = r["c"]
+            k["v"] += r["v"]
+        elif out or r["t"] == b:
+            out.append({"t": b, "o": r["o"], "h": r["h"], "l": r["l"], "c": r["c"], "v": r["v"]})
+    return out
+
+
+class CandleBuilder:
+    """OHLCV bars for any number of intervals of one symbol, built from its
+    trade stream.
+
+    The forming bar of each interval is the `cur_kline` of the states
+    watching it and is updated in place on every trade. When a trade
+    falls into a later bucket the bar is handed to `close(state, candle)`
+    for each state; buckets without trades are closed as flat bars at the
+    previous close, as Binance does.
+    """
+
+    def __init__(self, close):
+        self.close  = close
+        self.series: list[tuple[int, list]] = []     # (interval secs, states)
+
+    def watch(self, interval: str, states: list):
+        for st in states[1:]:              # one forming bar object per interval
+            st.cur_kline = states[0].cur_kline
+        self.series.append((INTERVAL_SECS[interval], states))
+
+    def add(self, t: float, price: float, qty: float):
+        for secs, states in self.series:
+            cur = states[0].cur_kline
+            if cur is not None and t < cur["t"] + secs:
+                if price > cur["h"]:
+                    cur["h"] = price
+                elif price < cur["l"]:
+                    cur["l"] = price
+                cur["c"]  = price
+                cur["v"] += qty
+                continue
+            self._roll(secs, states, cur, t - t % secs, price, qty)
+
+    def _roll(self, secs, states, cur, b, price, qty):
+        if cur is not None:
+            if b < cur["t"]:              # late trade from before the forming bar
+                return
+            self._emit(states, cur)
+            gap = int((b - cur["t"]) // secs) - 1
+            c   = cur["c"]
+            for i in range(max(0, gap - config.KLINE_MAX), gap):
+                t = cur["t"] + (i + 1) * secs
+                self._emit(states, {"t": t, "o": c, "h": c, "l": c, "c": c, "v": 0.0})
+        nxt = {"t": b, "o": price, "h": price, "l": price, "c": price, "v": qty}
+        for st in states:
+            st.cur_kline = nxt
+
+    def _emit(self, states, candle):
+        for st in states:
+            self.close(st, candle)
@@ -0,0 +1,153 @@
+import contextlib
+import mmap
+import os
+import struct
+
+try:
+    import fcntl
+except ImportError:        # no advisory locks (Windows): single writer assumed
+    fcntl = None
+
+import config
+
+# File layout
+#   header := MAGIC 8s, interval secs u64, count u64, padded to 64 bytes
+#   row*   := t, o, h, l, c, v as f64
+#
+# Rows are fixed-size, so row i of the closed-candle history is a slice of
+# the mapping and any window is a zero-copy view. `count` is written after
+# the row it covers, so a reader in another process never sees a torn row.
+
+MAGIC  = b"CNDLS01\n"
+_HEAD  = struct.Struct("<8sQQ")
+_ROW   = struct.Struct("<6d")
+HEADER = 64
+ROW    = _ROW.size
+_GROW  = 4096             # rows added per file extension
+
+ROOT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                    config.CANDLE_STORE) if config.CANDLE_STORE else None
+
+
+class CandleStore:
+    """Persistent, memory-mapped closed-candle history of one symbol and
+    interval.
+
+    `append` is O(1) (the file grows in _GROW-row steps) and idempotent:
+    a candle with the open time of the last row replaces it, an older one
+    is ignored, so several states, restarts or processes may write the same
+    bars. Only the pages of the rows actually read stay resident.
+    """
+
+    def __init__(self, path: str, secs: int, readonly: bool = False):
+        self.path     = path
+        self.secs     = secs
+        self.readonly = readonly
+        self.f  = (open(path, "rb") if readonly else
+                   os.fdopen(os.open(path, os.O_RDWR | os.O_CREAT, 0o644), "r+b"))
+        if not readonly and os.fstat(self.f.fileno()).st_size < HEADER:
+            with self._lock():
+                if os.fstat(self.f.fileno()).st_size < HEADER:
+                    self.f.truncate(HEADER + _GROW * ROW)
+                    os.pwrite(self.f.fileno(), _HEAD.pack(MAGIC, secs, 0), 0)
+        self.mm = None
+        self._map()
+        magic, fsecs, _ = _HEAD.unpack_from(self.mm)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not a candle store")
+        if fsecs != secs:
+            raise ValueError(f"{path}: holds {fsecs}s candles, not {secs}s")
+
+    def _map(self):
+        # a fresh mapping rather than mmap.resize: numpy views of the old
+        # one may still be alive and keep it open until they are dropped
+        access  = mmap.ACCESS_READ if self.readonly else mmap.ACCESS_WRITE
+        self.mm = mmap.mmap(self.f.fileno(), 0, access=access)
+
+    def _lock(self):
+        return _Flock(self.f) if fcntl and not self.readonly else contextlib.nullcontext()
+
+    def __len__(self):
+        n = _HEAD.unpack_from(self.mm)[2]
+        if HEADER + n * ROW > len(self.mm):      # grown by another process
+            self._map()
+        return n
+
+    def _set_len(self, n: int):
+        struct.pack_into("<Q", self.mm, 16, n)
+
+    # ── writing ──
+    def _put(self, n: int, k: dict) -> int:
+        """Write `k` after the first `n` rows; return the new row count."""
+        if n:
+            last = _ROW.unpack_from(self.mm, HEADER + (n - 1) * ROW)[0]
+            if k["t"] < last:
+                return n
+            if k["t"] == last:
+                n -= 1
+        if HEADER + (n + 1) * ROW > len(self.mm):
+            self.f.truncate(HEADER + (n + _GROW) * ROW)
+            self._map()
+        _ROW.pack_into(self.mm, HEADER + n * ROW,
+                       k["t"], k["o"], k["h"], k["l"], k["c"], k["v"])
+        return n + 1
+
+    def append(self, k: dict):
+        with self._lock():
+            self._set_len(self._put(len(self), k))
+
+    def extend(self, rows):
+        """Append `rows` (oldest first). If they start after a hole in the
+        stored history, the history before it is dropped, so indicators
+        never run across missing bars."""
+        rows = list(rows)
+        if not rows:
+            return
+        with self._lock():
+            n = len(self)
+            if n:
+                last = _ROW.unpack_from(self.mm, HEADER + (n - 1) * ROW)[0]
+                if rows[0]["t"] > last + self.secs:
+                    n = 0
+            for k in rows:
+                n = self._put(n, k)
+            self._set_len(n)
+
+    # ── reading ──
+    def buffer(self, n: int) -> memoryview:
+        """Zero-copy bytes of the newest `n` rows."""
+        tot = len(self)
+        n   = min(n, tot)
+        return memoryview(self.mm)[HEADER + (tot - n) * ROW:HEADER + tot * ROW]
+
+    def tail(self, n: int) -> list[dict]:
+        """The newest `n` rows as kline dicts, oldest first."""
+        return [
+            {"t": t, "o": o, "h": h, "l": l, "c": c, "v": v}
+            for t, o, h, l, c, v in _ROW.iter_unpack(self.buffer(n))
+        ]
+
+
+class _Flock:
+    """Exclusive advisory lock on the store file while writing."""
+
+    def __init__(self, f):
+        self.f = f
+
+    def __enter__(self):
+        fcntl.flock(self.f.fileno(), fcntl.LOCK_EX)
+
+    def __exit__(self, *exc):
+        fcntl.flock(self.f.fileno(), fcntl.LOCK_UN)
+
+
+def open_store(symbol: str, interval: str, secs: int, readonly: bool = False) -> CandleStore | None:
+    """The store of `symbol` / `interval` under CANDLE_STORE, or None when
+    the store is disabled (or, read-only, when it does not exist yet)."""
+    if ROOT is None:
+        return None
+    path = os.path.join(ROOT, f"{symbol}_{interval}.bin")
+    if readonly and not os.path.exists(path):
+        return None
+    os.makedirs(ROOT, exist_ok=True)
+    return CandleStore(path, secs, readonly)
@@ -0,0 +1,15 @@
+import time
+
+# Wall clock used by every time-windowed indicator. Replay swaps it for
+# the timestamp of the record being applied.
+_source = time.time
+
+
+def now() -> float:
+    return _source()
+
+
+def use(source=None):
+    """Install a clock callable; None restores the wall clock."""
+    global _source
+    _source = source or time.time
@@ -0,0 +1,11 @@
+import json
+
+# Fast JSON backend when available, stdlib otherwise. Both accept bytes,
+# so frames can be parsed straight off the socket without a UTF-8 decode.
+try:
+    import orjson
+    loads   = orjson.loads
+    BACKEND = "orjson"
+except ImportError:
+    loads   = json.loads
+    BACKEND = "json"
@@ -26,18 +26,45 @@ TF_KLINE = {"5m": "1m", "15m": "1m", "1h": "1m", "4h": "15m", "daily": "1h"}
 BINANCE_WS   = "wss://stream.binance.com/stream"
 BINANCE_REST = "https://api.binance.com/api/v3"
 OB_LEVELS    = 20          # depth levels in stream (Binance: 5 / 10 / 20)
+OB_SOURCE    = "stream"    # "stream" = local book from @depth diffs, "poll" = REST polling
+OB_SNAPSHOT  = 1000        # REST depth used to seed the local book (and per poll); the stream book is pruned to it
+OB_STREAM_MS = 100         # @depth update speed (100 or 1000 ms)
 TRADE_TTL    = 600         # keep 10 min of trades
+TRADE_CAP    = 262_144     # trade ring-buffer capacity (oldest dropped when full)
+TRADE_STREAM = "trade"     # "trade" = every print, "aggTrade" = prints merged per taker order
+TRADE_STORE  = "ticks"     # "ticks" = every trade for TRADE_TTL, "bars" = per-second buy / sell bars
 KLINE_MAX    = 150         # max candles in memory
 KLINE_BOOT   = 100         # candles fetched on startup
+KLINE_SOURCE = "trades"    # "trades" = build candles locally from @trade, "stream" = @kline pushes
+KLINE_CACHE  = ".kline_cache"   # on-disk history cache (project-relative); "" disables
+CANDLE_STORE = ".candles"  # memory-mapped closed-candle history (project-relative); "" disables
+KLINE_LOOKBACK = 1000      # stored candles that VWAP / volume profile span and the engine is seeded with
+IND_BACKEND  = "auto"      # candle indicators: "numpy", "python", or "auto" (numpy if installed)
 
 # ── Polymarket ──────────────────────────────────────────────────
-PM_GAMMA = "https://gamma-api.polymarket.com/events"
-PM_WS    = "wss://ws-subscriptions-clob.polymarket.com/ws/market"
+PM_GAMMA    = "https://gamma-api.polymarket.com/events"
+PM_WS       = "wss://ws-subscriptions-clob.polymarket.com/ws/market"
+PM_PREFETCH = 60    # seconds before a window closes to look up and subscribe the next one
+PM_RETRY    = 5     # seconds between lookups while the next market is not listed yet
+PM_DEPTH_CENTS = 2  # size shown is what rests within this many cents of the touch
+
+# ── Ingest ──────────────────────────────────────────────────────
+INGEST_QUEUE = 4096        # raw frames buffered per socket between receive and processing
+INGEST_BATCH = 256         # frames applied per processing step before yielding to the loop
+INGEST_FULL  = "block"     # queue full: "block" = stop reading the socket, "drop" = discard the frame
+
+# ── Reconnect & backfill ───────────────────────────────────────
+RECONNECT_MIN = 0.05       # first retry within 50 ms; the jittered backoff doubles per failed attempt
+RECONNECT_MAX = 5.0        # backoff cap (seconds)
+WS_ROTATE     = 23.5 * 3600    # hand over to a pre-warmed standby this long into a connection (Binance cuts at 24 h); 0 = off
+BACKFILL      = True       # fetch trades / candles missed in a stream gap over REST
+BACKFILL_MAX  = 10_000     # newest missed trades fetched per gap (older ones are counted lost)
 
 # ── Orderbook indicators ───────────────────────────────────────
 OBI_BAND_PCT = 1.0          # % band around mid for OBI calc
 OBI_THRESH   = 0.10         # ±10 % = signal
-WALL_MULT    = 5            # wall = level qty > N × avg level qty
+WALL_MULT    = 5            # wall = level qty > N × avg level qty (full book: avg over every level)
+WALL_BAND_PCT = 1.0         # on the full book, only walls within this % of mid (0 = anywhere)
 DEPTH_BANDS  = [0.1, 0.5, 1.0]   # % from mid for depth calc
 
 # ── Flow indicators ────────────────────────────────────────────
@@ -72,5 +99,46 @@ BIAS_WEIGHTS = {
 HA_COUNT   = 8          # Heikin Ashi candles shown
 VP_BINS    = 30         # volume profile price buckets
 VP_SHOW    = 9          # VP rows visible
-REFRESH    = 10         # seconds between dashboard redraws
-REFRESH_5M = 3          # faster refresh for 5m timeframe (seconds)
+VP_SOURCE  = "trades"   # "trades" = rolling profile of trade prints (volprofile), "klines" = candle ranges
+VP_TICK_BPS   = 1       # finest profile tick ≈ this many bp of price, rounded to a power of ten
+VP_MAX_BINS   = 512     # bins double in width when the range needs more
+VP_SEED_STEPS = 16      # points a seeded candle's volume is spread over
+VP_VALUE_AREA = 0.70    # share of volume in the value area
+VP_HVN     = 1.5        # high-volume node: local peak ≥ this × mean row volume
+VP_LVN     = 0.5        # low-volume node: trough ≤ this × mean, between two peaks
+REFRESH    = 10         # max seconds between redraws when no data arrives (CVD windows still slide)
+REFRESH_5M = 3          # same, for the 5m timeframe
+MAX_FPS    = 8          # redraws follow incoming data, at most this many per second
+
+# ── Headless signal server ─────────────────────────────────────
+SERVE_HOST         = "127.0.0.1"
+SERVE_PORT         = 8765
+SERVE_MIN_INTERVAL = 0.25    # seconds between published deltas (upper bound on push rate)
+
+# ── Alerts ─────────────────────────────────────────────────────
+# Rules on snapshot.as_dict() fields, evaluated on every state change.
+# op: > >= < <= == != (fires when it turns true), "sign", "rise", "change".
+# Optional per rule: "debounce" seconds, "markets": ["BTC 5m", …].
+ALERT_RULES = [
+    {"name": "bias_bull", "field": "bias",      "op": ">",    "value": 40},
+    {"name": "bias_bear", "field": "bias",      "op": "<",    "value": -40},
+    {"name": "obi_bid",   "field": "obi",       "op": ">",    "value": 0.30},
+    {"name": "obi_ask",   "field": "obi",       "op": "<",    "value": -0.30},
+    {"name": "edge_up",   "field": "edge_up",   "op": ">",    "value": 0.05},
+    {"name": "edge_dn",   "field": "edge_dn",   "op": ">",    "value": 0.05},
+    {"name": "macd_flip", "field": "macd_hist", "op": "sign"},
+    {"name": "bid_wall",  "field": "bid_walls", "op": "rise"},
+    {"name": "ask_wall",  "field": "ask_walls", "op": "rise"},
+]
+ALERT_DEBOUNCE = 30        # seconds a rule stays quiet on a market after firing
+ALERT_FILE     = ""        # append alerts as JSON lines; "" disables
+ALERT_SOCKET   = ""        # UNIX socket path streaming JSON lines; "" disables
+ALERT_WEBHOOK  = ""        # URL each alert is POSTed to; "" disables
+
+# ── Instrumentation ────────────────────────────────────────────
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 0           # Prometheus text endpoint, e.g. 9108; 0 disables
+LAT_SAMPLE   = 8           # trade latency is observed on every Nth trade (the per-trade hot path)
+SHM_PM_LEVELS = 64         # --worker: PM book levels per side copied to the render process
+SHM_WALLS    = 16          # --worker: walls per side copied to the render process
+DIAGNOSTICS  = False       # show the latency / loop-lag panel under the dashboard
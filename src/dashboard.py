@@ -1,11 +1,15 @@
+import time
+
 from rich.table   import Table
 from rich.panel   import Panel
 from rich.console import Group
+from rich.measure import Measurement
 from rich.text    import Text
 from rich         import box as bx
 
 import config
-import indicators as ind
+import metrics
+import snapshot
 
 
 class _Group:
@@ -17,6 +21,27 @@ class _Group:
             yield r
 
 
+class _Cached:
+    """A renderable plus its rendered lines per width. Re-drawing an
+    unchanged panel replays the lines instead of laying it out again."""
+
+    def __init__(self, renderable):
+        self.renderable = renderable
+        self._lines: dict = {}
+
+    def __rich_measure__(self, console, options):
+        return Measurement.get(console, options, self.renderable)
+
+    def __rich_console__(self, console, options):
+        key   = (options.max_width, options.height)
+        lines = self._lines.get(key)
+        if lines is None:
+            lines = self._lines[key] = console.render_lines(
+                self.renderable, options, new_lines=True)
+        for line in lines:
+            yield from line
+
+
 def _p(val, d=2):
     if val is None:
         return "—"
@@ -33,60 +58,6 @@ def _col(val):
     return "green" if val > 0 else "red"
 
 
-TREND_THRESH = 3
-
-
-def _score_trend(st):
-    score = 0
-
-    obi_v = ind.obi(st.bids, st.asks, st.mid) if st.mid else 0.0
-    if obi_v > config.OBI_THRESH:
-        score += 1
-    elif obi_v < -config.OBI_THRESH:
-        score -= 1
-
-    cvd5 = ind.cvd(st.trades, 300)
-    score += 1 if cvd5 > 0 else -1 if cvd5 < 0 else 0
-
-    rsi_v = ind.rsi(st.klines)
-    if rsi_v is not None:
-        if rsi_v > config.RSI_OB:
-            score -= 1
-        elif rsi_v < config.RSI_OS:
-            score += 1
-
-    _, _, hv = ind.macd(st.klines)
-    if hv is not None:
-        score += 1 if hv > 0 else -1
-
-    vwap_v = ind.vwap(st.klines)
-    if vwap_v and st.mid:
-        score += 1 if st.mid > vwap_v else -1
-
-    es, el = ind.emas(st.klines)
-    if es is not None and el is not None:
-        score += 1 if es > el else -1
-
-    bw, aw = ind.walls(st.bids, st.asks)
-    score += min(len(bw), 2)
-    score -= min(len(aw), 2)
-
-    ha = ind.heikin_ashi(st.klines)
-    if len(ha) >= 3:
-        last3 = ha[-3:]
-        if all(c["green"] for c in last3):
-            score += 1
-        elif all(not c["green"] for c in last3):
-            score -= 1
-
-    if score >= TREND_THRESH:
-        return score, "BULLISH",  "green"
-    elif score <= -TREND_THRESH:
-        return score, "BEARISH",  "red"
-    else:
-        return score, "NEUTRAL",  "yellow"
-
-
 def _bias_display(bias: float) -> tuple[str, str, str]:
     """Return (label, pct_str, color) for a bias score in [-100, +100]."""
     pct = abs(bias)
@@ -99,19 +70,18 @@ def _bias_display(bias: float) -> tuple[str, str, str]:
     return label, f"{pct:.0f}%", col
 
 
-def _header(st, coin, tf):
-    score, label, col = _score_trend(st)
-    bias = ind.bias_score(st.bids, st.asks, st.mid, st.trades, st.klines)
-    b_label, b_pct, b_col = _bias_display(bias)
+def _header(sn, coin, tf):
+    score, label, col = sn.trend, sn.trend_label, sn.trend_col
+    b_label, b_pct, b_col = _bias_display(sn.bias)
 
     parts = [
         (f"  {coin} ", "bold white on dark_blue"),
         (f" {tf} ", "bold white on dark_green"),
-        (f"  Price: {_p(st.mid)}  ", "bold white"),
+        (f"  Price: {_p(sn.mid)}  ", "bold white"),
     ]
 
-    if st.pm_up is not None and st.pm_dn is not None:
-        parts.append((f"  PM ↑ {st.pm_up:.3f}  ↓ {st.pm_dn:.3f}  ", "cyan"))
+    if sn.pm_up is not None and sn.pm_dn is not None:
+        parts.append((f"  PM ↑ {sn.pm_up:.3f}  ↓ {sn.pm_dn:.3f}  ", "cyan"))
 
     parts.append((f" {label} ", f"bold white on {col}"))
     parts.append((f"  ({score:+d})", col))
@@ -133,10 +103,10 @@ def _header(st, coin, tf):
     )
 
 
-def _ob_panel(st):
-    obi_v      = ind.obi(st.bids, st.asks, st.mid) if st.mid else 0.0
-    bw, aw     = ind.walls(st.bids, st.asks)
-    dep        = ind.depth_usd(st.bids, st.asks, st.mid) if st.mid else {}
+def _ob_panel(sn):
+    obi_v      = sn.obi
+    bw, aw     = sn.bid_walls, sn.ask_walls
+    dep        = sn.depth
 
     if obi_v > config.OBI_THRESH:
         oc, os = "green", "BULLISH"
@@ -171,9 +141,9 @@ def _ob_panel(st):
     return Panel(t, title="ORDER BOOK", box=bx.ROUNDED, expand=True)
 
 
-def _flow_panel(st):
-    cvds = {s: ind.cvd(st.trades, s) for s in config.CVD_WINDOWS}
-    poc, vp = ind.vol_profile(st.klines)
+def _flow_panel(sn):
+    cvds = sn.cvd
+    poc, vp = sn.poc, sn.vp
 
     t = Table(box=None, show_header=False, pad_edge=False, expand=True)
     t.add_column("label", style="dim", width=16)
@@ -187,15 +157,18 @@ def _flow_panel(st):
                   f"[{c}]{_p(v)}[/{c}]",
                   f"[{c}]{'↑' if v > 0 else '↓'}[/{c}]")
 
-    delta_v = ind.cvd(st.trades, config.DELTA_WINDOW)
+    delta_v = cvds[config.DELTA_WINDOW]
     dc = _col(delta_v)
     t.add_row("Delta 1m",
               f"[{dc}]{_p(delta_v)}[/{dc}]",
               f"[{dc}]{'↑' if delta_v > 0 else '↓'}[/{dc}]")
 
     t.add_row("POC", f"[bold]{_p(poc)}[/bold]", "")
+    d = 0 if sn.va_low >= 1e3 else 2
+    t.add_row("Value area", f"{_p(sn.va_low, d)} – {_p(sn.va_high, d)}", "")
 
     if vp:
+        hvn, lvn = set(sn.hvn), set(sn.lvn)
         max_v  = max(v for _, v in vp) or 1
         poc_i  = min(range(len(vp)), key=lambda i: abs(vp[i][0] - poc))
         half   = config.VP_SHOW // 2
@@ -208,20 +181,22 @@ def _flow_panel(st):
             bar_len = int(v / max_v * 14)
             bar     = "█" * bar_len + "░" * (14 - bar_len)
             is_poc  = i == poc_i
-            style   = "green bold" if is_poc else "dim"
-            marker  = " ◄ POC" if is_poc else ""
+            style   = ("green bold" if is_poc else
+                       "cyan" if sn.va_low <= p <= sn.va_high else "dim")
+            marker  = (" ◄ POC" if is_poc else " HVN" if p in hvn else
+                       " LVN" if p in lvn else "")
             t.add_row(f"[{style}]{_p(p)}[/{style}]",
                       f"[{style}]{bar}{marker}[/{style}]", "")
 
     return Panel(t, title="FLOW & VOLUME", box=bx.ROUNDED, expand=True)
 
 
-def _ta_panel(st):
-    rsi_v              = ind.rsi(st.klines)
-    macd_v, sig_v, hv  = ind.macd(st.klines)
-    vwap_v             = ind.vwap(st.klines)
-    ema_s, ema_l       = ind.emas(st.klines)
-    ha                 = ind.heikin_ashi(st.klines)
+def _ta_panel(sn):
+    rsi_v              = sn.rsi
+    macd_v, sig_v, hv  = sn.macd, sn.macd_sig, sn.macd_hist
+    vwap_v             = sn.vwap
+    ema_s, ema_l       = sn.ema_s, sn.ema_l
+    ha                 = sn.ha
 
     t = Table(box=None, show_header=False, pad_edge=False, expand=True)
     t.add_column("label",  style="dim", width=16)
@@ -248,9 +223,9 @@ def _ta_panel(st):
     else:
         t.add_row("MACD", "[dim]—[/dim]", "")
 
-    if vwap_v and st.mid:
-        vc  = "green" if st.mid > vwap_v else "red"
-        vr  = "above" if st.mid > vwap_v else "below"
+    if vwap_v and sn.mid:
+        vc  = "green" if sn.mid > vwap_v else "red"
+        vr  = "above" if sn.mid > vwap_v else "below"
         t.add_row("VWAP", _p(vwap_v), f"[{vc}]price {vr}[/{vc}]")
 
     if ema_s is not None and ema_l is not None:
@@ -270,53 +245,53 @@ def _ta_panel(st):
     return Panel(t, title="TECHNICAL", box=bx.ROUNDED, expand=True)
 
 
-def _signals_panel(st):
+def _signals_panel(sn):
     sigs = []
 
-    obi_v = ind.obi(st.bids, st.asks, st.mid) if st.mid else 0.0
+    obi_v = sn.obi
     if abs(obi_v) > config.OBI_THRESH:
         c = "green" if obi_v > 0 else "red"
         d = "BULLISH" if obi_v > 0 else "BEARISH"
         sigs.append(f"[{c}]OBI → {d} ({obi_v * 100:+.1f} %)[/{c}]")
 
-    cvd5 = ind.cvd(st.trades, 300)
+    cvd5 = sn.cvd[300]
     if cvd5 != 0:
         c = "green" if cvd5 > 0 else "red"
         d = "buy pressure" if cvd5 > 0 else "sell pressure"
         sigs.append(f"[{c}]CVD 5m → {d} ({_p(cvd5)})[/{c}]")
 
-    rsi_v = ind.rsi(st.klines)
+    rsi_v = sn.rsi
     if rsi_v is not None:
         if rsi_v > config.RSI_OB:
             sigs.append(f"[red]RSI → overbought ({rsi_v:.0f})[/red]")
         elif rsi_v < config.RSI_OS:
             sigs.append(f"[green]RSI → oversold ({rsi_v:.0f})[/green]")
 
-    _, _, hv = ind.macd(st.klines)
+    hv = sn.macd_hist
     if hv is not None:
         c = "green" if hv > 0 else "red"
         d = "bullish" if hv > 0 else "bearish"
         sigs.append(f"[{c}]MACD hist → {d}[/{c}]")
 
-    vwap_v = ind.vwap(st.klines)
-    if vwap_v and st.mid:
-        c = "green" if st.mid > vwap_v else "red"
-        d = "above" if st.mid > vwap_v else "below"
+    vwap_v = sn.vwap
+    if vwap_v and sn.mid:
+        c = "green" if sn.mid > vwap_v else "red"
+        d = "above" if sn.mid > vwap_v else "below"
         sigs.append(f"[{c}]Price {d} VWAP[/{c}]")
 
-    es, el = ind.emas(st.klines)
+    es, el = sn.ema_s, sn.ema_l
     if es is not None and el is not None:
         c = "green" if es > el else "red"
         d = "golden" if es > el else "death"
         sigs.append(f"[{c}]EMA → {d} cross[/{c}]")
 
-    bw, aw = ind.walls(st.bids, st.asks)
+    bw, aw = sn.bid_walls, sn.ask_walls
     if bw:
         sigs.append(f"[green]BUY wall × {len(bw)} levels[/green]")
     if aw:
         sigs.append(f"[red]SELL wall × {len(aw)} levels[/red]")
 
-    ha = ind.heikin_ashi(st.klines)
+    ha = sn.ha
     if len(ha) >= 3:
         last3 = ha[-3:]
         if all(c["green"] for c in last3):
@@ -327,8 +302,24 @@ def _signals_panel(st):
     if not sigs:
         sigs.append("[dim]No active signals[/dim]")
 
-    score, label, col = _score_trend(st)
-    bias = ind.bias_score(st.bids, st.asks, st.mid, st.trades, st.klines)
+    # ── Polymarket book vs model probability ────────────────────
+    pm_rows = [(n, q, e) for n, q, e in (("↑", sn.pm_up_book, sn.edge_up),
+                                         ("↓", sn.pm_dn_book, sn.edge_dn))
+               if q and q["ask"] is not None]
+    if pm_rows:
+        sigs.append("[dim]─────────────────────────────[/dim]")
+        sigs.append(f"[dim]model P(up) {sn.model_p * 100:.0f}%   "
+                    f"size within {config.PM_DEPTH_CENTS}¢ of touch[/dim]")
+    for n, q, e in pm_rows:
+        bid    = f"{q['bid']:.3f}" if q["bid"] is not None else "—"
+        spread = f"{q['spread'] * 100:.1f}¢" if q["spread"] is not None else "—"
+        ec     = "green" if e > 0 else "red"
+        sigs.append(f"[cyan]PM {n}[/cyan] {bid} / {q['ask']:.3f}  spr {spread}  "
+                    f"p {q['prob'] * 100:.0f}%  size {q['bid_size']:,.0f} / {q['ask_size']:,.0f}  "
+                    f"[{ec}]edge {e * 100:+.1f}¢[/{ec}]")
+
+    score, label, col = sn.trend, sn.trend_label, sn.trend_col
+    bias = sn.bias
     b_label, b_pct, b_col = _bias_display(bias)
 
     # ── TREND bar (qualitative) ─────────────────────────────────
@@ -350,15 +341,137 @@ def _signals_panel(st):
     return Panel("\n".join(sigs), title="SIGNALS", box=bx.ROUNDED, expand=True)
 
 
-def render(st, coin, tf) -> "_Group":
-    header = _header(st, coin, tf)
+_PANEL_TIMERS = {name: metrics.render_panel(name)
+                 for name in ("snapshot", "header", "orderbook", "technical", "flow", "signals")}
+
+
+def _timed(name, fn, *args):
+    t0  = time.perf_counter()
+    out = fn(*args)
+    _PANEL_TIMERS[name].observe(time.perf_counter() - t0)
+    return out
+
+
+# ── dirty-panel cache ───────────────────────────────────────────
+# Each panel is keyed on exactly the snapshot values it displays and is
+# rebuilt (and re-laid-out) only when that key changes.
+
+def _above_vwap(sn):
+    return bool(sn.vwap and sn.mid) and sn.mid > sn.vwap
+
+
+def _greens(ha, n):
+    return tuple(c["green"] for c in ha[-n:])
+
+
+_PANEL_KEYS = {
+    "header":    lambda sn: (sn.mid, sn.pm_up, sn.pm_dn, sn.trend, sn.trend_label, sn.bias),
+    "orderbook": lambda sn: (sn.obi, sn.bid_walls, sn.ask_walls, sn.depth),
+    "flow":      lambda sn: (sn.cvd, sn.poc, sn.vp, sn.va_low, sn.va_high, sn.hvn, sn.lvn),
+    "technical": lambda sn: (sn.rsi, sn.macd, sn.macd_sig, sn.macd_hist, sn.vwap,
+                             _above_vwap(sn), sn.ema_s, sn.ema_l,
+                             _greens(sn.ha, config.HA_COUNT)),
+    "signals":   lambda sn: (sn.obi, sn.cvd[300], sn.rsi, sn.macd_hist, _above_vwap(sn),
+                             sn.ema_s, sn.ema_l, len(sn.bid_walls), len(sn.ask_walls),
+                             _greens(sn.ha, 3), sn.trend, sn.bias, sn.model_p,
+                             sn.pm_up_book, sn.pm_dn_book, sn.edge_up, sn.edge_dn),
+}
+
+
+def _panel(st, name, fn, sn, *args):
+    cache = st.snap_cache.setdefault("panels", {})
+    key   = (_PANEL_KEYS[name](sn), args)
+    hit   = cache.get(name)
+    if hit is None or hit[0] != key:
+        hit = cache[name] = (key, _Cached(_timed(name, fn, sn, *args)))
+    return hit[1]
+
+
+def _diag_panel():
+    t = Table(box=None, show_header=True, pad_edge=False, expand=True, header_style="dim")
+    t.add_column("metric", style="dim")
+    t.add_column("p50",   justify="right")
+    t.add_column("p90",   justify="right")
+    t.add_column("p99",   justify="right")
+    t.add_column("max",   justify="right")
+    t.add_column("n",     justify="right", style="dim")
+
+    def ms(v):
+        return f"{v * 1e3:,.1f}ms"
+
+    for m in sorted(metrics.all_metrics(), key=lambda m: (m.name, str(m.labels))):
+        if m.kind != "summary" or not m.count:
+            continue
+        label = m.name.removeprefix("pm_assistant_").removesuffix("_seconds")
+        if m.labels:
+            label += " " + ",".join(str(v) for v in m.labels.values())
+        t.add_row(label, ms(m.quantile(0.5)), ms(m.quantile(0.9)),
+                  ms(m.quantile(0.99)), ms(m.max), f"{m.count:,}")
+
+    rates = "   ".join(f"{m.labels.get('feed')}: {m.rate():,.0f} msg/s"
+                       for m in metrics.all_metrics() if m.name == metrics.MSGS)
+    tot  = metrics.total
+    gaps = (f"reconnects {tot('pm_assistant_reconnects_total')}   "
+            f"handovers {tot('pm_assistant_handovers_total')}   "
+            f"trades missed {metrics.missed_tr.value:,} / backfilled {metrics.filled_tr.value:,}   "
+            f"candles missed {metrics.missed_kl.value} / backfilled {metrics.filled_kl.value}   "
+            f"dup {metrics.dup_trades.value:,}")
+    return Panel(Group(t, Text(rates, style="cyan"), Text(gaps, style="dim")), title="DIAGNOSTICS",
+                 box=bx.ROUNDED, expand=True)
+
+
+def render(st, coin, tf, diag: bool = False) -> "_Group":
+    t0     = time.perf_counter()
+    sn     = _timed("snapshot", snapshot.take, st)
+    header = _panel(st, "header", _header, sn, coin, tf)
 
     grid = Table(box=None, pad_edge=False, show_header=False, expand=True)
     grid.add_column(ratio=1)
     grid.add_column(ratio=1)
     grid.add_row(
-        Group(_ob_panel(st), _ta_panel(st)),
-        _flow_panel(st),
+        Group(_panel(st, "orderbook", _ob_panel, sn), _panel(st, "technical", _ta_panel, sn)),
+        _panel(st, "flow", _flow_panel, sn),
     )
 
-    return _Group(header, grid, _signals_panel(st))
+    parts = [header, grid, _panel(st, "signals", _signals_panel, sn)]
+    if diag:
+        parts.append(_diag_panel())
+    metrics.render_all.observe(time.perf_counter() - t0)
+    return _Group(*parts)
+
+
+def render_overview(markets) -> Panel:
+    """Compact one-row-per-market table for multi-market mode."""
+    t = Table(box=bx.SIMPLE_HEAD, expand=True, pad_edge=False)
+    t.add_column("Market", style="bold")
+    t.add_column("Price",   justify="right")
+    t.add_column("PM ↑",    justify="right", style="cyan")
+    t.add_column("PM ↓",    justify="right", style="cyan")
+    t.add_column("OBI",     justify="right")
+    t.add_column("CVD 5m",  justify="right")
+    t.add_column("RSI",     justify="right")
+    t.add_column("Trend",   justify="center")
+    t.add_column("Bias",    justify="right")
+
+    for m in markets:
+        st = m.state
+        if not (st.mid and st.klines):
+            t.add_row(m.name, "[dim]waiting …[/dim]", *[""] * 7)
+            continue
+        sn = snapshot.take(st)
+        oc = _col(sn.obi) if abs(sn.obi) > config.OBI_THRESH else "yellow"
+        cvd5 = sn.cvd[300]
+        b_label, b_pct, b_col = _bias_display(sn.bias)
+        t.add_row(
+            m.name,
+            _p(sn.mid),
+            f"{sn.pm_up:.3f}" if sn.pm_up is not None else "—",
+            f"{sn.pm_dn:.3f}" if sn.pm_dn is not None else "—",
+            f"[{oc}]{sn.obi * 100:+.1f}%[/{oc}]",
+            f"[{_col(cvd5)}]{_p(cvd5)}[/{_col(cvd5)}]",
+            f"{sn.rsi:.0f}" if sn.rsi is not None else "—",
+            f"[{sn.trend_col}]{sn.trend_label} {sn.trend:+d}[/{sn.trend_col}]",
+            f"[{b_col}]{b_label} {b_pct}[/{b_col}]",
+        )
+
+    return Panel(t, title="ALL MARKETS", box=bx.DOUBLE, expand=True)
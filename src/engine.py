@@ -0,0 +1,133 @@
+from collections import deque
+
+import config
+
+
+class _Ema:
+    """Running EMA seeded with the SMA of the first `period` values,
+    matching indicators._ema_series step for step."""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.mult   = 2.0 / (period + 1)
+        self.n      = 0
+        self.acc    = 0
+        self.value: float | None = None
+
+    def push(self, v: float) -> float | None:
+        self.n += 1
+        if self.n < self.period:
+            self.acc += v
+        elif self.n == self.period:
+            self.acc += v
+            self.value = self.acc / self.period
+        else:
+            self.value = v * self.mult + self.value * (1 - self.mult)
+        return self.value
+
+
+class _Wilder:
+    """Wilder-smoothed RSI, same seeding and update order as indicators.rsi."""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.n      = 0
+        self.prev: float | None = None
+        self.sg = self.sl = 0
+        self.ag = self.al = None
+
+    def push(self, close: float):
+        if self.prev is None:
+            self.prev = close
+            return
+        c, self.prev = close - self.prev, close
+        n = self.period
+        self.n += 1
+        if self.n < n:
+            self.sg += max(c, 0)
+            self.sl += max(-c, 0)
+        elif self.n == n:
+            self.sg += max(c, 0)
+            self.sl += max(-c, 0)
+            self.ag, self.al = self.sg / n, self.sl / n
+        else:
+            self.ag = (self.ag * (n - 1) + max(c, 0))  / n
+            self.al = (self.al * (n - 1) + max(-c, 0)) / n
+
+    @property
+    def value(self) -> float | None:
+        if self.al is None:
+            return None
+        return 100.0 if self.al == 0 else 100.0 - 100.0 / (1 + self.ag / self.al)
+
+
+class IndicatorEngine:
+    """Streaming RSI / MACD / EMA / Heikin Ashi over closed candles.
+
+    Each `push` is O(1). Results equal the pure functions in `indicators`
+    evaluated over every candle pushed since the last `reset`, so history
+    is not limited to KLINE_MAX.
+    """
+
+    def __init__(self, klines=()):
+        self.reset(klines)
+
+    def reset(self, klines=()):
+        self.count = 0
+        self._rsi   = _Wilder(config.RSI_PERIOD)
+        self._fast  = _Ema(config.MACD_FAST)
+        self._slow  = _Ema(config.MACD_SLOW)
+        self._sig   = _Ema(config.MACD_SIG)
+        self._ema_s = _Ema(config.EMA_S)
+        self._ema_l = _Ema(config.EMA_L)
+        self._macd: float | None = None
+        self._ha: deque[dict] = deque(maxlen=max(config.HA_COUNT, 3))
+        for k in klines:
+            self.push(k)
+
+    def push(self, k: dict):
+        c = k["c"]
+        self.count += 1
+
+        self._rsi.push(c)
+        self._ema_s.push(c)
+        self._ema_l.push(c)
+
+        ef = self._fast.push(c)
+        es = self._slow.push(c)
+        if ef is not None and es is not None:
+            self._macd = ef - es
+            self._sig.push(self._macd)
+
+        hc = (k["o"] + k["h"] + k["l"] + k["c"]) / 4
+        if self._ha:
+            prev = self._ha[-1]
+            ho = (prev["o"] + prev["c"]) / 2
+        else:
+            ho = (k["o"] + k["c"]) / 2
+        self._ha.append({
+            "o": ho,
+            "h": max(k["h"], ho, hc),
+            "l": min(k["l"], ho, hc),
+            "c": hc,
+            "green": hc >= ho,
+        })
+
+    # ── readouts (same shapes as indicators.*) ──────────────────
+    def rsi(self):
+        return self._rsi.value
+
+    def macd(self):
+        if self.count < config.MACD_SLOW or self._macd is None:
+            return None, None, None
+        m = self._macd
+        s = self._sig.value
+        h = (m - s) if s is not None else None
+        return m, s, h
+
+    def emas(self):
+        return self._ema_s.value, self._ema_l.value
+
+    def heikin_ashi(self):
+        """Most recent Heikin Ashi candles (oldest first), at least HA_COUNT."""
+        return list(self._ha)
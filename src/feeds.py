@@ -1,12 +1,45 @@
 import asyncio
 import json
+import math
+import random
 import time
 
 import requests
 import websockets
 from datetime import datetime, timezone, timedelta
 
+import candles
+import candlestore
+import clock
+import codec
 import config
+import ingest
+import indicators_np as npi
+import klinecache
+import metrics
+import recorder as rec
+from book   import OrderBook, PmBook
+from engine import IndicatorEngine
+from store  import TradeStore, new_store
+from volprofile import VolumeProfile
+
+
+class Changed:
+    """Wake-up signal set on every version bump. Each consumer waits on
+    its own event from `listen()`, so one of them clearing it never hides
+    an update from another."""
+
+    def __init__(self):
+        self._events: list[asyncio.Event] = []
+
+    def listen(self) -> asyncio.Event:
+        ev = asyncio.Event()
+        self._events.append(ev)
+        return ev
+
+    def set(self):
+        for ev in self._events:
+            ev.set()
 
 
 class State:
@@ -14,99 +47,601 @@ class State:
         self.bids: list[tuple[float, float]] = []
         self.asks: list[tuple[float, float]] = []
         self.mid: float = 0.0
+        self.book_ver: int = 0
+        self.book: OrderBook | None = None       # full local book behind bids / asks, if any
+        self.book_metrics: dict | None = None    # book group computed elsewhere (render worker)
 
-        self.trades: list[dict] = []
+        self.trades = new_store()
+        self.trade_ver: int = 0
+        self.profile = VolumeProfile() if config.VP_SOURCE == "trades" else None
 
         self.klines: list[dict] = []
         self.cur_kline: dict | None = None
+        self.kline_ver: int = 0
+        self.engine = IndicatorEngine()
+        self.candles = npi.Candles() if npi.ENABLED else None    # column copy of klines
+        self.store: candlestore.CandleStore | None = None       # on-disk history, see attach_store
 
         self.pm_up_id:  str | None = None
         self.pm_dn_id:  str | None = None
         self.pm_up:     float | None = None
         self.pm_dn:     float | None = None
+        self.pm_books:  dict[str, PmBook] = {}    # asset id → book, incl. the prefetched next window
+        self.pm_ver:    int = 0
+
+        self.snap_cache: dict = {}     # snapshot.take() per-group memo
+        self.changed = Changed()        # set on every version bump; the UI and alerts listen
 
 
 OB_POLL_INTERVAL = 2
 
+# One pooled session for every REST call; requests run on worker threads,
+# so allow as many concurrent connections per host as startup issues.
+_http = requests.Session()
+_http.mount("https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=32))
+
+# Set to a recorder.Recorder to capture every raw message the feeds receive.
+recorder: rec.Recorder | None = None
+
+
+def _record(channel: int, raw, ts: float | None = None):
+    if recorder is not None:
+        recorder.write(channel, raw, ts)
+
+
+def _record_json(channel: int, obj):
+    if recorder is not None:
+        recorder.write(channel, json.dumps(obj))
+
+
+def record_market(coin: str, tf: str, state: State):
+    _record_json(rec.META, {"coin": coin, "tf": tf, "up": state.pm_up_id, "dn": state.pm_dn_id})
+
+
+def record_prefetch(coin: str, tf: str, ids):
+    _record_json(rec.PM_SUB, {"coin": coin, "tf": tf, "ids": list(ids)})
+
+
+async def _get_json(url: str, params: dict, timeout: float = 5):
+    """GET on a worker thread so the event loop keeps running."""
+    def _get():
+        return _http.get(url, params=params, timeout=timeout).json()
+    return await asyncio.to_thread(_get)
+
 
 async def ob_poller(symbol: str, state: State):
     url = f"{config.BINANCE_REST}/depth"
     print(f"  [Binance OB] polling {symbol} every {OB_POLL_INTERVAL}s")
     while True:
         try:
-            resp = requests.get(url, params={"symbol": symbol, "limit": 20}, timeout=3).json()
-            state.bids = [(float(p), float(q)) for p, q in resp["bids"]]
-            state.asks = [(float(p), float(q)) for p, q in resp["asks"]]
-            if state.bids and state.asks:
-                state.mid = (state.bids[0][0] + state.asks[0][0]) / 2
+            with metrics.timed(metrics.http_poll):
+                resp = await _get_json(url, {"symbol": symbol, "limit": config.OB_SNAPSHOT}, timeout=3)
+            _record_json(rec.DEPTH_POLL, {"s": symbol, "d": resp})
+            apply_poll(resp, state)
         except Exception:
             pass
         await asyncio.sleep(OB_POLL_INTERVAL)
 
 
-async def binance_feed(symbol: str, kline_iv: str, state: State):
-    sym = symbol.lower()
-    streams = "/".join([
-        f"{sym}@trade",
-        f"{sym}@kline_{kline_iv}",
-    ])
-    url = f"{config.BINANCE_WS}?streams={streams}"
+def apply_poll(resp: dict, state: State):
+    if state.book is None:
+        state.book = OrderBook()
+    state.book.load(resp["bids"], resp["asks"])
+    state.book.publish([state], config.OB_LEVELS)
+
+
+def _backoff(tries: int) -> float:
+    """Full-jitter exponential backoff: uniform in [0, RECONNECT_MIN · 2^tries],
+    capped at RECONNECT_MAX."""
+    return random.uniform(0, min(config.RECONNECT_MAX, config.RECONNECT_MIN * 2 ** tries))
+
+
+_tasks: set = set()
+
+
+def _spawn(coro) -> asyncio.Task:
+    """Fire-and-forget task that stays referenced until it finishes."""
+    t = asyncio.ensure_future(coro)
+    _tasks.add(t)
+    t.add_done_callback(_tasks.discard)
+    return t
+
+
+async def _open(url: str, on_connect, handover: bool):
+    ws = await websockets.connect(url, ping_interval=20, ping_timeout=60, close_timeout=10)
+    try:
+        if on_connect:
+            await on_connect(ws, handover)
+    except BaseException:
+        _spawn(ws.close())
+        raise
+    return ws
 
+
+def _discard(fut: asyncio.Future):
+    """Drop a standby connection that was never handed over."""
+    if not fut.done():
+        fut.cancel()
+    elif not fut.cancelled() and fut.exception() is None:
+        _spawn(fut.result().close())
+
+
+async def _stream(url: str, label: str, put, on_connect=None, on_close=None):
+    """Run one reconnecting WebSocket, passing every frame to `await put(raw)`
+    (an Ingest queue) and nothing else, so reads never wait on processing.
+
+    A lost connection is retried after a jittered exponential backoff that
+    starts at RECONNECT_MIN and is reset by the first frame of the new
+    connection. WS_ROTATE seconds into a connection a standby is opened and
+    subscribed (on_connect(ws, handover=True)); reading moves to it at the
+    next frame once it is up, ahead of the exchange's 24 h disconnect.
+    Frames both sockets delivered are dropped downstream (trade ids, depth
+    sequence numbers, candle times)."""
+    downtime  = metrics.histogram("pm_assistant_ws_downtime_seconds", "Connection lost to reconnected", feed=label)
+    drops     = metrics.counter("pm_assistant_reconnects_total", "Connections lost", feed=label)
+    handovers = metrics.counter("pm_assistant_handovers_total", "Connections replaced by a standby", feed=label)
+    tries, lost = 0, None
     while True:
+        ws = standby = None
         try:
-            async with websockets.connect(
-                url,
-                ping_interval=20,
-                ping_timeout=60,
-                close_timeout=10
-            ) as ws:
-                print(f"  [Binance WS] connected – {symbol}")
-
-                while True:
-                    try:
-                        data   = json.loads(await ws.recv())
-                        stream = data.get("stream", "")
-                        pay    = data["data"]
-
-                        if "@trade" in stream:
-                            state.trades.append({
-                                "t":      pay["T"] / 1000.0,
-                                "price":  float(pay["p"]),
-                                "qty":    float(pay["q"]),
-                                "is_buy": not pay["m"],
-                            })
-                            if len(state.trades) > 5000:
-                                cut = time.time() - config.TRADE_TTL
-                                state.trades = [t for t in state.trades if t["t"] >= cut]
-
-                        elif "@kline" in stream:
-                            k = pay["k"]
-                            candle = {
-                                "t": k["t"] / 1000.0,
-                                "o": float(k["o"]), "h": float(k["h"]),
-                                "l": float(k["l"]), "c": float(k["c"]),
-                                "v": float(k["v"]),
-                            }
-                            state.cur_kline = candle
-                            if k["x"]:
-                                state.klines.append(candle)
-                                state.klines = state.klines[-config.KLINE_MAX:]
-
-                    except websockets.exceptions.ConnectionClosed:
-                        print(f"  [Binance WS] connection closed, reconnecting...")
-                        break
+            ws = await _open(url, on_connect, False)
+            if lost is not None:
+                downtime.observe(time.monotonic() - lost)
+                lost = None
+            print(f"  [{label}] connected")
+
+            rotate = time.monotonic() + config.WS_ROTATE
+            while True:
+                try:
+                    raw = await ws.recv(decode=False)    # bytes; codec parses them as-is
+                except websockets.exceptions.ConnectionClosed:
+                    print(f"  [{label}] connection closed, reconnecting...")
+                    break
+                tries = 0
+                await put(raw)
+
+                if standby is None:
+                    if config.WS_ROTATE and time.monotonic() >= rotate:
+                        standby = asyncio.ensure_future(_open(url, on_connect, True))
+                elif standby.done():
+                    fut, standby = standby, None
+                    err = "cancelled" if fut.cancelled() else fut.exception()
+                    if err is not None:
+                        print(f"  [{label}] standby failed: {err}")
+                        rotate = time.monotonic() + 60
+                        continue
+                    _spawn(ws.close())
+                    ws     = fut.result()
+                    rotate = time.monotonic() + config.WS_ROTATE
+                    handovers.inc()
+                    print(f"  [{label}] handed over to standby connection")
 
         except Exception as e:
-            print(f"  [Binance WS] connection error: {e}, reconnecting in 5s...")
-            await asyncio.sleep(5)
+            print(f"  [{label}] connection error: {e}")
+        finally:
+            if standby is not None:
+                _discard(standby)
+            if ws is not None:
+                _spawn(ws.close())
+                drops.inc()
+                lost = time.monotonic()
+            if on_close:
+                on_close()
+        await asyncio.sleep(_backoff(tries))
+        tries += 1
 
 
-async def bootstrap(symbol: str, interval: str, state: State):
-    resp = requests.get(
-        f"{config.BINANCE_REST}/klines",
-        params={"symbol": symbol, "interval": interval, "limit": config.KLINE_BOOT},
-    ).json()
-    state.klines = [
+# ── Binance stream routes ───────────────────────────────────────
+# Each route handles the `data` payload of one combined-stream name and
+# fans it out to every State watching that symbol / interval.
+
+def _loop_running() -> bool:
+    """Tasks need the event loop; replay and bench run without one."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _can_backfill() -> bool:
+    return config.BACKFILL and _loop_running()
+
+
+def trade_route(store: TradeStore, states: list[State],
+                builder: candles.CandleBuilder | None = None):
+    """Route for @trade / @aggTrade. Trade ids drop repeats (the overlap of
+    a standby handover) and expose gaps: on a gap the missed trades are
+    fetched over REST while later live trades are held back, then both are
+    applied in id order, so CVD and candles never skip the outage. A gap
+    that opens while a fill is running is queued behind it."""
+    add = store.add
+    bar = builder.add if builder else None
+    # profiles are re-seeded in place (load_klines), so the bound methods stay
+    # valid; states on one interval share a profile (markets.build), add it once
+    vps = [vp.add for vp in {id(st.profile): st.profile for st in states
+                             if st.profile is not None}.values()]
+
+    signals = list({id(st.changed): st.changed for st in states}.values())    # shared per view
+    lat = metrics.lat_trade.observe
+    now = clock.now         # a function that follows clock.use, safe to bind
+    every   = max(1, config.LAT_SAMPLE)
+    tick    = 0             # trades until the next latency sample
+    last    = None          # newest trade id seen
+    pending = None          # (id, payload) of live trades held back while gaps are backfilled
+    missing = []            # id ranges [lo, hi) still to fetch, oldest first
+
+    def apply(t, p, q, is_buy):
+        add(t, p, q, is_buy)
+        if bar:
+            bar(t, p, q)
+        for vp in vps:
+            vp(t, p, q)
+
+    def publish():
+        for st in states:
+            st.trade_ver += 1
+        for sig in signals:
+            sig.set()
+
+    def on_trade(pay):
+        nonlocal last, pending, tick
+        tid = pay.get("t")
+        if tid is None:
+            tid = pay.get("a")
+        if tid is not None:
+            if last is not None:
+                if tid <= last:
+                    metrics.dup_trades.inc()
+                    return
+                if tid > last + 1:
+                    gap(pay["s"], last + 1, tid)
+            last = tid
+            if pending is not None:
+                pending.append((tid, pay))
+                return
+        # apply() / publish() inlined: this runs for every trade
+        t = pay["T"] / 1000.0
+        p = float(pay["p"])
+        q = float(pay["q"])
+        add(t, p, q, not pay["m"])
+        if bar:
+            bar(t, p, q)
+        for vp in vps:
+            vp(t, p, q)
+        if tick:
+            tick -= 1
+        else:
+            tick = every - 1
+            d = now() - t
+            lat(d if d > 0.0 else 0.0)
+        for st in states:
+            st.trade_ver += 1
+        for sig in signals:
+            sig.set()
+
+    def gap(symbol: str, lo: int, hi: int):
+        nonlocal pending
+        metrics.gaps_tr.inc()
+        metrics.missed_tr.inc(hi - lo)
+        if pending is not None:
+            missing.append((lo, hi))    # the running fill takes it next
+        elif _can_backfill():
+            pending = []            # from this trade on, hold until the fill is in
+            missing.append((lo, hi))
+            _spawn(fill(symbol))
+
+    def release(held, upto):
+        """Apply held live trades with ids below `upto`; return how many."""
+        n = 0
+        for tid, pay in held:
+            if tid >= upto:
+                break
+            apply(pay["T"] / 1000.0, float(pay["p"]), float(pay["q"]), not pay["m"])
+            n += 1
+        return n
+
+    async def fill(symbol: str):
+        nonlocal pending
+        t0, filled, done = time.perf_counter(), 0, 0    # done: held trades applied
+        try:
+            while missing:
+                lo, hi = missing.pop(0)
+                try:
+                    got = await fetch_trades(symbol, max(lo, hi - config.BACKFILL_MAX), hi)
+                except Exception as e:
+                    print(f"  [Binance] trade backfill {symbol} failed: {e}")
+                    got = []
+                done += release(pending[done:], lo)     # live trades before this gap come first
+                for tr in got:
+                    apply(*tr)
+                filled += len(got)
+        finally:
+            held, pending = pending, None
+            missing.clear()
+            release(held[done:], math.inf)
+            publish()
+        metrics.filled_tr.inc(filled)
+        metrics.backfill_tr.observe(time.perf_counter() - t0)
+    return on_trade
+
+
+async def fetch_trades(symbol: str, lo: int, hi: int) -> list[tuple]:
+    """(t, price, qty, is_buy) of trades with ids in [lo, hi), in pages of
+    1000: /historicalTrades for @trade ids, /aggTrades for @aggTrade ids."""
+    agg = config.TRADE_STREAM == "aggTrade"
+    url = f"{config.BINANCE_REST}/{'aggTrades' if agg else 'historicalTrades'}"
+    out = []
+    while lo < hi:
+        with metrics.timed(metrics.http_fill):
+            rows = await _get_json(url, {"symbol": symbol, "fromId": lo, "limit": min(1000, hi - lo)})
+        if isinstance(rows, dict):
+            raise RuntimeError(rows.get("msg", rows))
+        if not rows:
+            break
+        for r in rows:
+            if agg:
+                i, t, p, q, m = r["a"], r["T"], r["p"], r["q"], r["m"]
+            else:
+                i, t, p, q, m = r["id"], r["time"], r["price"], r["qty"], r["isBuyerMaker"]
+            if i >= hi:
+                return out
+            out.append((t / 1000.0, float(p), float(q), not m))
+        lo = i + 1
+    return out
+
+
+def kline_route(states: list[State]):
+    """Route for @kline pushes. A close more than one interval after the
+    last closed candle starts a REST fetch of the candles in between; later
+    closes wait for it so the history stays in order."""
+    pending = None          # closes held back while missed candles are fetched
+
+    def on_kline(pay):
+        nonlocal pending
+        if "E" in pay:
+            metrics.lat_kline.observe(max(0.0, clock.now() - pay["E"] / 1000.0))
+        k = pay["k"]
+        candle = {
+            "t": k["t"] / 1000.0,
+            "o": float(k["o"]), "h": float(k["h"]),
+            "l": float(k["l"]), "c": float(k["c"]),
+            "v": float(k["v"]),
+        }
+        for st in states:
+            st.cur_kline = candle
+        if not k["x"]:
+            return
+        if pending is not None:
+            pending.append(candle)
+            return
+        secs = candles.INTERVAL_SECS.get(k.get("i"))
+        kl   = states[0].klines
+        if secs and kl and candle["t"] > kl[-1]["t"] + secs:
+            metrics.gaps_kl.inc()
+            metrics.missed_kl.inc(int((candle["t"] - kl[-1]["t"]) // secs) - 1)
+            if _can_backfill():
+                pending = [candle]
+                _spawn(fill(pay["s"], k["i"], kl[-1]["t"] + secs))
+                return
+        for st in states:
+            close_kline(st, candle)
+
+    async def fill(symbol: str, interval: str, start: float):
+        nonlocal pending
+        t0 = time.perf_counter()
+        try:
+            rows = await _rest_klines(symbol, interval, 1000, start)
+        except Exception as e:
+            print(f"  [Binance] kline backfill {symbol} {interval} failed: {e}")
+            rows = []
+        held, pending = pending, None
+        rows = [r for r in rows if r["t"] < held[0]["t"]]
+        for c in rows + held:
+            for st in states:
+                close_kline(st, c)
+        metrics.filled_kl.inc(len(rows))
+        metrics.backfill_kl.observe(time.perf_counter() - t0)
+    return on_kline
+
+
+def close_kline(st: State, candle: dict):
+    """Append a closed candle to the history and every derived series.
+    A candle that is not newer than the last one (a repeat) is ignored."""
+    if st.klines and candle["t"] <= st.klines[-1]["t"]:
+        return
+    st.klines.append(candle)
+    if len(st.klines) > config.KLINE_MAX:
+        del st.klines[:-config.KLINE_MAX]        # in place, no copy of the list
+    st.engine.push(candle)
+    if st.store is not None:
+        st.store.append(candle)                  # StoredCandles reads it directly
+    elif st.candles is not None:
+        st.candles.append(candle)
+    st.kline_ver += 1
+    st.changed.set()
+
+
+class DepthSync:
+    """Local order book for one symbol plus its snapshot / resync task.
+    Every applied diff is published to all `states`; the owner points
+    their `book` at `self.book` (markets.routes, depth_feed)."""
+
+    def __init__(self, symbol: str, states: list[State]):
+        self.symbol = symbol
+        self.states = states
+        self.book   = OrderBook(config.OB_SNAPSHOT)
+        self._task: asyncio.Task | None = None
+
+    @property
+    def stream(self) -> str:
+        return f"{self.symbol.lower()}@depth@{config.OB_STREAM_MS}ms"
+
+    def start(self):
+        """Call on every (re)connect: drop the book and fetch a snapshot."""
+        self.stop()
+        self.book.reset()
+        self._task = asyncio.create_task(self._resync())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _resync(self):
+        while not self.book.synced:
+            try:
+                with metrics.timed(metrics.http_time):
+                    snap = await _get_json(
+                        f"{config.BINANCE_REST}/depth",
+                        {"symbol": self.symbol, "limit": config.OB_SNAPSHOT},
+                    )
+                _record_json(rec.DEPTH_SNAP, {"s": self.symbol, "d": snap})
+                if self.on_snapshot(snap):
+                    return
+            except Exception as e:
+                print(f"  [Binance OB] snapshot failed: {e}")
+            await asyncio.sleep(0.5)
+
+    def on_snapshot(self, snap: dict) -> bool:
+        if self.book.on_snapshot(snap):
+            self.book.publish(self.states, config.OB_LEVELS)
+            return True
+        return False
+
+    def resync(self):
+        """Drop the book and fetch a new snapshot: a diff failed to apply,
+        so the book may be half-updated."""
+        self.book.reset()
+        self.book.resyncs += 1
+        if _loop_running() and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._resync())
+
+    def on_depth(self, ev: dict):
+        if "E" in ev:
+            metrics.lat_depth.observe(max(0.0, clock.now() - ev["E"] / 1000.0))
+        try:
+            changed = self.book.on_event(ev)
+        except Exception:
+            self.resync()
+            raise                       # reported by the batch handler
+        if changed:
+            self.book.publish(self.states, config.OB_LEVELS)
+        elif not self.book.synced and self._task and self._task.done():
+            print(f"  [Binance OB] sequence gap – resyncing {self.symbol}")
+            self._task = asyncio.create_task(self._resync())
+
+
+def binance_batch(routes: dict):
+    """Ingest batch handler for a combined socket: frames are dispatched
+    in order by exact stream name, except that a non-final kline push is
+    skipped when a later push of the same stream is in the batch (it would
+    only be overwritten)."""
+    klines = any("@kline_" in s for s in routes)
+    loads  = codec.loads
+    msgs_n = metrics.msgs_bn
+
+    def on_batch(frames):
+        msgs_n.inc(len(frames))
+        record = recorder is not None
+        if not klines or len(frames) == 1:
+            # nothing to coalesce: decode and dispatch in one pass
+            for ts, raw in frames:
+                if record:
+                    _record(rec.BINANCE, raw, ts)
+                try:                    # one bad frame never costs the rest of the batch
+                    m  = loads(raw)
+                    fn = routes.get(m.get("stream"))
+                    if fn is not None:
+                        fn(m["data"])
+                except Exception:
+                    ingest.report("binance")
+            return
+
+        msgs = []
+        for ts, raw in frames:
+            if record:
+                _record(rec.BINANCE, raw, ts)
+            try:
+                msgs.append(loads(raw))
+            except Exception:
+                ingest.report("binance")
+
+        last = {}
+        for i, m in enumerate(msgs):
+            s = m.get("stream")
+            if s and "@kline_" in s:
+                last[s] = i
+
+        for i, m in enumerate(msgs):
+            s  = m.get("stream")
+            fn = routes.get(s)
+            if fn is None:
+                continue
+            try:
+                if last.get(s, i) != i and not m["data"]["k"]["x"]:
+                    metrics.merged_bn.inc()
+                    continue
+                fn(m["data"])
+            except Exception:
+                ingest.report("binance")
+    return on_batch
+
+
+def binance_router(routes: dict):
+    """binance_batch for one frame at a time (replay, bench)."""
+    on_batch = binance_batch(routes)
+    return lambda raw: on_batch(((None, raw),))
+
+
+async def binance_stream(routes: dict, label: str, syncs: list[DepthSync] = ()):
+    """One combined Binance socket for every stream name in `routes`.
+    Frames are dispatched by exact stream name, so adding markets adds
+    routes, not sockets."""
+    url = f"{config.BINANCE_WS}?streams={'/'.join(routes)}"
+
+    async def on_connect(ws, handover: bool):
+        if not handover:                # a standby continues the same diff sequence
+            for s in syncs:
+                s.start()
+
+    def on_close():
+        for s in syncs:
+            s.stop()
+
+    q = ingest.Ingest("binance", binance_batch(routes))
+    await asyncio.gather(q.run(), _stream(url, label, q.put, on_connect, on_close))
+
+
+async def depth_feed(symbol: str, state: State):
+    """Keep `state.bids` / `asks` / `mid` from a local order book synced
+    with the @depth diff stream and a non-blocking REST snapshot."""
+    sync = DepthSync(symbol, [state])
+    state.book = sync.book
+    await binance_stream({sync.stream: sync.on_depth}, f"Binance OB {symbol}", [sync])
+
+
+async def binance_feed(symbol: str, kline_iv: str, state: State):
+    sym = symbol.lower()
+    if config.KLINE_SOURCE == "trades":
+        builder = candles.CandleBuilder(close_kline)
+        builder.watch(kline_iv, [state])
+        routes = {f"{sym}@{config.TRADE_STREAM}": trade_route(state.trades, [state], builder)}
+    else:
+        routes = {
+            f"{sym}@{config.TRADE_STREAM}": trade_route(state.trades, [state]),
+            f"{sym}@kline_{kline_iv}":      kline_route([state]),
+        }
+    await binance_stream(routes, f"Binance WS {symbol}")
+
+
+async def _rest_klines(symbol: str, interval: str, limit: int,
+                       start: float | None = None) -> list[dict]:
+    params = {"symbol": symbol, "interval": interval, "limit": limit}
+    if start is not None:
+        params["startTime"] = int(start * 1000)
+    resp = await _get_json(f"{config.BINANCE_REST}/klines", params)
+    return [
         {
             "t": r[0] / 1e3,
             "o": float(r[1]), "h": float(r[2]),
@@ -115,6 +650,96 @@ async def bootstrap(symbol: str, interval: str, state: State):
         }
         for r in resp
     ]
+
+
+async def fetch_klines(symbol: str, interval: str, limit: int = config.KLINE_BOOT) -> list[dict]:
+    """The last `limit` bars (the final one still forming). Bars already in
+    the on-disk cache are not refetched: only the tail from the cached
+    forming bar onwards is requested."""
+    secs   = candles.INTERVAL_SECS[interval]
+    cached = klinecache.load(symbol, interval)
+    miss   = int((clock.now() - cached[-1]["t"]) // secs) + 1 if cached else 0
+    if cached and miss <= 1000 and len(cached) - 1 + miss >= limit:
+        klines = klinecache.merge(cached, await _rest_klines(symbol, interval, miss, cached[-1]["t"]))
+    else:
+        klines = await _rest_klines(symbol, interval, limit)
+    klinecache.save(symbol, interval, klines[-max(limit, config.KLINE_MAX + 1):])
+    klines = klines[-limit:]
+    _record_json(rec.KLINES, {"s": symbol, "i": interval, "d": klines})
+    return klines
+
+
+async def fetch_history(symbol: str, intervals) -> dict[str, list[dict]]:
+    """KLINE_BOOT bars of history for each interval of `symbol`. With
+    KLINE_SOURCE = "trades" one 1m fetch is rolled up into every interval
+    it covers; the rest (and "stream" mode) fetch their own interval."""
+    out  = {}
+    need = set(intervals)
+    if config.KLINE_SOURCE == "trades":
+        per = {iv: (config.KLINE_BOOT + 1) * candles.INTERVAL_SECS[iv] // 60 for iv in need}
+        covered = [iv for iv in need if per[iv] <= 1000]
+        if covered:
+            base = await fetch_klines(symbol, "1m", max(per[iv] for iv in covered))
+            for iv in covered:
+                out[iv] = base if iv == "1m" else candles.aggregate(base, iv)
+                if iv != "1m":
+                    _record_json(rec.KLINES, {"s": symbol, "i": iv, "d": out[iv]})
+            need -= set(covered)
+    rest = sorted(need)
+    for iv, kl in zip(rest, await asyncio.gather(*(fetch_klines(symbol, iv) for iv in rest))):
+        out[iv] = kl
+    return out
+
+
+def load_history(state: State, rows: list[dict], interval: str):
+    """Load REST kline rows: every row but the last is closed, the last is
+    the forming candle (Binance returns the open bar last)."""
+    load_klines(state, rows[:-1], interval)
+    state.cur_kline = dict(rows[-1]) if rows else None
+
+
+def load_klines(state: State, klines: list[dict], interval: str):
+    """Replace the closed history. With a store attached the rows are
+    merged into it, and the engine is seeded with KLINE_LOOKBACK stored
+    candles instead of just `klines`. The trade volume profile is re-seeded
+    from the same candles, one slot per `interval` (empty if there are none)."""
+    state.klines = list(klines)
+    if state.store is not None:
+        state.store.extend(klines)
+        rows = state.store.tail(config.KLINE_LOOKBACK)
+    else:
+        rows = state.klines
+        if state.candles is not None:
+            state.candles.reset(state.klines)
+    state.engine.reset(rows)
+    if state.profile is not None:
+        state.profile.seed(rows, secs=candles.INTERVAL_SECS[interval],
+                           span=config.KLINE_LOOKBACK if state.store is not None else config.KLINE_MAX)
+    state.kline_ver += 1
+    state.changed.set()
+
+
+_stores: dict[tuple[str, str], candlestore.CandleStore] = {}
+
+
+def attach_store(state: State, symbol: str, interval: str):
+    """Back `state` with the on-disk candle history of symbol / interval
+    (one shared store per pair in this process). No-op if CANDLE_STORE is
+    off. Replay and bench never attach one, so they leave it untouched."""
+    key = (symbol, interval)
+    if key not in _stores:
+        store = candlestore.open_store(symbol, interval, candles.INTERVAL_SECS[interval])
+        if store is None:
+            return
+        _stores[key] = store
+    state.store = _stores[key]
+    if npi.ENABLED:
+        state.candles = npi.StoredCandles(state.store)
+
+
+async def bootstrap(symbol: str, interval: str, state: State):
+    attach_store(state, symbol, interval)
+    load_history(state, (await fetch_history(symbol, [interval]))[interval], interval)
     print(f"  [Binance] loaded {len(state.klines)} historical candles")
 
 
@@ -122,8 +747,7 @@ _MONTHS = ["", "january", "february", "march", "april", "may", "june",
            "july", "august", "september", "october", "november", "december"]
 
 
-def _et_now() -> datetime:
-    utc = datetime.now(timezone.utc)
+def _et(utc: datetime) -> datetime:
     year = utc.year
 
     mar1_dow  = datetime(year, 3, 1).weekday()
@@ -138,6 +762,10 @@ def _et_now() -> datetime:
     return utc + offset
 
 
+def _et_now() -> datetime:
+    return _et(datetime.now(timezone.utc))
+
+
 def _to_12h(hour24: int) -> str:
     if hour24 == 0:
         return "12am"
@@ -148,10 +776,11 @@ def _to_12h(hour24: int) -> str:
     return f"{hour24 - 12}pm"
 
 
-def _build_slug(coin: str, tf: str) -> str | None:
-    now_utc = datetime.now(timezone.utc)
+def _build_slug(coin: str, tf: str, ts: float | None = None) -> str | None:
+    """Slug of the market window containing `ts` (default: now)."""
+    now_utc = datetime.now(timezone.utc) if ts is None else datetime.fromtimestamp(ts, timezone.utc)
     now_ts  = int(now_utc.timestamp())
-    et      = _et_now()
+    et      = _et(now_utc)
 
     if tf == "5m":
         ts = (now_ts // 300) * 300
@@ -178,82 +807,257 @@ def _build_slug(coin: str, tf: str) -> str | None:
     return None
 
 
-def fetch_pm_event_data(coin: str, tf: str) -> dict | None:
+def window_end(tf: str, ts: float | None = None) -> float | None:
+    """UTC timestamp at which the window containing `ts` (default: now)
+    closes, i.e. when `_build_slug` starts returning the next slug."""
+    now_ts = int(clock.now() if ts is None else ts)
+
+    if tf in ("5m", "15m", "1h"):     # ET is a whole-hour offset, so hours align with UTC
+        n = {"5m": 300, "15m": 900, "1h": 3600}[tf]
+        return (now_ts // n + 1) * n
+
+    if tf == "4h":
+        return ((now_ts - 3600) // 14400 + 1) * 14400 + 3600
+
+    if tf == "daily":
+        et = _et(datetime.fromtimestamp(now_ts, timezone.utc))
+        resolution = et.replace(hour=12, minute=0, second=0, microsecond=0)
+        if et >= resolution:
+            resolution += timedelta(days=1)
+        return now_ts + (resolution - et).total_seconds()
+
+    return None
+
+
+def fetch_pm_event_data(coin: str, tf: str, ts: float | None = None,
+                        quiet: bool = False) -> dict | None:
     """Fetch full event data from Polymarket API."""
-    slug = _build_slug(coin, tf)
+    slug = _build_slug(coin, tf, ts)
     if slug is None:
         return None
     try:
-        data = requests.get(config.PM_GAMMA, params={"slug": slug, "limit": 1}, timeout=5).json()
+        data = _http.get(config.PM_GAMMA, params={"slug": slug, "limit": 1}, timeout=5).json()
         if not data or data[0].get("ticker") != slug:
-            print(f"  [PM] no active market for slug: {slug}")
+            if not quiet:
+                print(f"  [PM] no active market for slug: {slug}")
             return None
         return data[0]
     except Exception as e:
-        print(f"  [PM] event fetch failed ({slug}): {e}")
+        if not quiet:
+            print(f"  [PM] event fetch failed ({slug}): {e}")
         return None
 
 
-def fetch_pm_tokens(coin: str, tf: str) -> tuple:
-    """Fetch PM token IDs for up/down markets."""
-    event_data = fetch_pm_event_data(coin, tf)
+_tokens: dict[str, tuple] = {}     # slug → (up, down) token ids already looked up
+
+
+def fetch_pm_tokens(coin: str, tf: str, ts: float | None = None,
+                    quiet: bool = False) -> tuple:
+    """Fetch PM token IDs for up/down markets of the window containing `ts`."""
+    slug = _build_slug(coin, tf, ts)
+    if slug in _tokens:
+        return _tokens[slug]
+    event_data = fetch_pm_event_data(coin, tf, ts, quiet)
     if event_data is None:
         return None, None
     try:
         ids = json.loads(event_data["markets"][0]["clobTokenIds"])
+        _tokens[slug] = ids[0], ids[1]
         return ids[0], ids[1]
     except Exception as e:
-        print(f"  [PM] token extraction failed: {e}")
+        if not quiet:
+            print(f"  [PM] token extraction failed: {e}")
         return None, None
 
 
-async def pm_feed(state: State):
-    if not state.pm_up_id:
-        print("  [PM] no tokens for this coin/timeframe – skipped")
-        return
+# ── Polymarket socket ───────────────────────────────────────────
+class PmSocket:
+    """One Polymarket market socket routing book and price_change events
+    to the owning State. Assets can be added and removed while it stays
+    connected, so a window rollover never drops the connection."""
+
+    def __init__(self, assets: dict[str, State] | None = None):
+        self.assets = {} if assets is None else assets
+        self.ws = None
+
+    async def _on_connect(self, ws, handover: bool = False):
+        self.ws = ws                   # a standby takes over subscribe / unsubscribe at once
+        await ws.send(json.dumps({"assets_ids": list(self.assets), "type": "market"}))
+
+    def _on_close(self):
+        self.ws = None
+
+    async def _send(self, op: str, ids: list[str]):
+        # when closed, the next on_connect subscribes to the whole asset map
+        if self.ws is not None:
+            try:
+                await self.ws.send(json.dumps({"assets_ids": ids, "operation": op}))
+            except websockets.exceptions.ConnectionClosed:
+                pass
+
+    async def subscribe(self, ids, state: State):
+        ids = [a for a in ids if a not in self.assets]
+        for a in ids:
+            self.assets[a] = state
+        if ids:
+            await self._send("subscribe", ids)
+
+    async def unsubscribe(self, ids):
+        gone = []
+        for a in ids:
+            st = self.assets.pop(a, None)
+            if st is not None:
+                st.pm_books.pop(a, None)
+                gone.append(a)
+        if gone:
+            await self._send("unsubscribe", gone)
 
-    assets = [state.pm_up_id, state.pm_dn_id]
+    async def run(self):
+        while not self.assets:         # nothing to subscribe to until a rollover finds a market
+            await asyncio.sleep(1)
+        q = ingest.Ingest("pm", pm_batch(self.assets))
+        await asyncio.gather(q.run(), _stream(config.PM_WS, "PM", q.put,
+                                              self._on_connect, self._on_close))
 
+
+async def _lookup(coin: str, tf: str, ts: float, deadline: float) -> tuple:
+    """Token ids of the window containing `ts`, retried until `deadline`."""
     while True:
-        try:
-            async with websockets.connect(
-                config.PM_WS,
-                ping_interval=20,
-                ping_timeout=60,
-                close_timeout=10
-            ) as ws:
-                await ws.send(json.dumps({"assets_ids": assets, "type": "market"}))
-                print("  [PM] connected")
-
-                while True:
+        up, dn = await asyncio.to_thread(fetch_pm_tokens, coin, tf, ts, True)
+        if up or clock.now() >= deadline:
+            return up, dn
+        await asyncio.sleep(config.PM_RETRY)
+
+
+async def pm_rollover(coin: str, tf: str, state: State, sock: PmSocket):
+    """Keep `state` on the live market window.
+
+    PM_PREFETCH seconds before each boundary the next window's token ids
+    are looked up and subscribed on the open socket, so their books are
+    already filled when the boundary passes and the switch is a pointer
+    swap. If the next market is not listed yet, lookups continue into the
+    new window and PM prices stay blank until it appears."""
+    while True:
+        end = window_end(tf)
+        if end is None:
+            return
+        await asyncio.sleep(max(0.0, end - config.PM_PREFETCH - clock.now()))
+
+        up, dn = await _lookup(coin, tf, end, end)
+        if up:
+            await sock.subscribe((up, dn), state)
+            record_prefetch(coin, tf, (up, dn))    # replay routes their books from here on
+        await asyncio.sleep(max(0.0, end - clock.now()))
+
+        old = [a for a in (state.pm_up_id, state.pm_dn_id) if a]
+        _pm_switch(state, up, dn)
+        await sock.unsubscribe([a for a in old if a not in (up, dn)])
+        _tokens.pop(_build_slug(coin, tf, end - 1), None)
+
+        if not up:
+            up, dn = await _lookup(coin, tf, end, window_end(tf, end) - config.PM_PREFETCH)
+            if up:
+                await sock.subscribe((up, dn), state)
+                _pm_switch(state, up, dn)
+        record_market(coin, tf, state)
+
+
+def _pm_switch(state: State, up, dn):
+    state.pm_up_id, state.pm_dn_id = up, dn
+    _pm_touch(state, up)
+    _pm_touch(state, dn)
+    state.pm_ver += 1
+    state.changed.set()
+
+
+async def pm_feed(coin: str, tf: str, state: State):
+    assets = {state.pm_up_id: state, state.pm_dn_id: state} if state.pm_up_id else {}
+    sock = PmSocket(assets)
+    await asyncio.gather(sock.run(), pm_rollover(coin, tf, state, sock))
+
+
+def pm_batch(assets: dict[str, State]):
+    """Ingest batch handler for the PM socket. Level changes are merged
+    across the batch, so repeated changes of one (asset, side, price) are
+    applied once with the latest size and each asset is published once;
+    pending changes are applied before any book snapshot that follows."""
+    def on_batch(frames):
+        pending = {}       # (asset, side, price) → size
+
+        def flush():
+            touched = {}
+            for (a, side, price), size in pending.items():
+                st = assets.get(a)
+                if st:
                     try:
-                        raw = json.loads(await ws.recv())
+                        _pm_book(st, a).on_change(price, size, side)
+                    except Exception:
+                        ingest.report("pm")
+                    touched[a] = st
+            pending.clear()
+            for a, st in touched.items():
+                _pm_touch(st, a)
 
-                        if isinstance(raw, list):
-                            for entry in raw:
-                                _pm_apply(entry.get("asset_id"), entry.get("asks", []), state)
+        def on_frame(raw):
+            msg = codec.loads(raw)
+            if isinstance(msg, dict) and msg.get("event_type") == "price_change":
+                if msg.get("timestamp"):
+                    metrics.lat_pm.observe(max(0.0, clock.now() - int(msg["timestamp"]) / 1000.0))
+                changes = []
+                for ch in msg.get("price_changes", []):
+                    a = ch.get("asset_id")
+                    if a in assets and "size" in ch:
+                        changes.append(((a, ch["side"], float(ch["price"])), float(ch["size"])))
+                for key, size in changes:       # parsed first: a bad frame adds nothing
+                    if key in pending:
+                        metrics.merged_pm.inc()
+                    pending[key] = size
+                return
 
-                        elif isinstance(raw, dict) and raw.get("event_type") == "price_change":
-                            for ch in raw.get("price_changes", []):
-                                if ch.get("best_ask"):
-                                    _pm_set(ch["asset_id"], float(ch["best_ask"]), state)
+            flush()
+            # book snapshots arrive as a list on subscribe and singly afterwards
+            for entry in (msg if isinstance(msg, list) else [msg]):
+                if not isinstance(entry, dict) or entry.get("event_type", "book") != "book":
+                    continue
+                a  = entry.get("asset_id")
+                st = assets.get(a)
+                if st:
+                    _pm_book(st, a).on_book(entry.get("bids", []), entry.get("asks", []))
+                    _pm_touch(st, a)
 
-                    except websockets.exceptions.ConnectionClosed:
-                        print("  [PM] connection closed, reconnecting...")
-                        break
+        for ts, raw in frames:
+            metrics.msgs_pm.inc()
+            _record(rec.PM, raw, ts)
+            try:                        # one bad frame never costs the rest of the batch
+                on_frame(raw)
+            except Exception:
+                ingest.report("pm")
+        flush()
+    return on_batch
 
-        except Exception as e:
-            print(f"  [PM] connection error: {e}, reconnecting in 5s...")
-            await asyncio.sleep(5)
 
+def pm_router(assets: dict[str, State]):
+    """pm_batch for one frame at a time (replay, bench)."""
+    on_batch = pm_batch(assets)
+    return lambda raw: on_batch(((None, raw),))
 
-def _pm_apply(asset, asks, state):
-    if asks:
-        _pm_set(asset, min(float(a["price"]) for a in asks), state)
 
+def _pm_book(state: State, asset) -> PmBook:
+    book = state.pm_books.get(asset)
+    if book is None:
+        book = state.pm_books[asset] = PmBook()
+    return book
 
-def _pm_set(asset, price, state):
+
+def _pm_touch(state: State, asset):
+    """Publish the best ask of `asset` if it is one of the live tokens."""
+    book = state.pm_books.get(asset)
+    ask  = book.best_ask if book else None
     if asset == state.pm_up_id:
-        state.pm_up = price
+        state.pm_up = ask
     elif asset == state.pm_dn_id:
-        state.pm_dn = price
+        state.pm_dn = ask
+    else:
+        return
+    state.pm_ver += 1
+    state.changed.set()
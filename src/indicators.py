@@ -1,16 +1,41 @@
-import time
+import clock
 import config
 
 
+# Book metrics take either (price, qty) lists or the sides of a
+# book.OrderBook. A side answers band sums from its cumulative arrays with
+# one bisect, so a deep book costs O(log n) per metric instead of a scan.
+
 def obi(bids, asks, mid):
     band = mid * config.OBI_BAND_PCT / 100
-    bv = sum(q for p, q in bids if p >= mid - band)
-    av = sum(q for p, q in asks if p <= mid + band)
+    if hasattr(bids, "depth_to"):        # book._Side
+        bv = bids.depth_to(mid - band)[0]
+        av = asks.depth_to(mid + band)[0]
+    else:
+        bv = sum(q for p, q in bids if p >= mid - band)
+        av = sum(q for p, q in asks if p <= mid + band)
     tot = bv + av
     return (bv - av) / tot if tot else 0.0
 
 
-def walls(bids, asks):
+def walls(bids, asks, mid=None):
+    """Levels holding WALL_MULT × the mean level qty of what is passed in.
+
+    On (price, qty) lists (the top OB_LEVELS) that is the mean of those
+    levels, anywhere in them, as before the full book. On book sides it is
+    the mean over every level of the book, and with `mid` only walls within
+    WALL_BAND_PCT of it count (deep levels are not actionable). The two are
+    different definitions: a deep book's mean is lower, so more levels
+    qualify. The render worker has only the top levels, so it is sent the
+    feed process's book numbers (shmstate)."""
+    if hasattr(bids, "above"):
+        n = len(bids) + len(asks)
+        if not n:
+            return [], []
+        thr  = (bids.total + asks.total) / n * config.WALL_MULT
+        band = mid * config.WALL_BAND_PCT / 100 if mid and config.WALL_BAND_PCT else None
+        return (bids.above(thr, None if band is None else mid - band),
+                asks.above(thr, None if band is None else mid + band))
     vols = [q for _, q in bids] + [q for _, q in asks]
     if not vols:
         return [], []
@@ -26,6 +51,9 @@ def depth_usd(bids, asks, mid):
     out = {}
     for pct in config.DEPTH_BANDS:
         band = mid * pct / 100
+        if hasattr(bids, "depth_to"):
+            out[pct] = bids.depth_to(mid - band)[1] + asks.depth_to(mid + band)[1]
+            continue
         out[pct] = (
             sum(p * q for p, q in bids if p >= mid - band)
             + sum(p * q for p, q in asks if p <= mid + band)
@@ -34,7 +62,9 @@ def depth_usd(bids, asks, mid):
 
 
 def cvd(trades, secs):
-    cut = time.time() - secs
+    if hasattr(trades, "cvd"):            # store.TradeStore / FlowBars
+        return trades.cvd(secs)
+    cut = clock.now() - secs
     return sum(
         t["qty"] * t["price"] * (1 if t["is_buy"] else -1)
         for t in trades
@@ -129,36 +159,52 @@ def emas(klines):
     )
 
 
-def bias_score(bids, asks, mid, trades, klines) -> float:
+def bias_score(bids, asks, mid, trades, klines, engine=None) -> float:
     """Return a bias score in [-100, +100].
     Positive = bullish signal, negative = bearish signal.
     Uses weighted sum of all key indicators, normalised to max possible weight.
+    If a streaming `engine.IndicatorEngine` is given, EMA / MACD / RSI / HA
+    are read from it instead of being recomputed from `klines`.
     """
+    poc, _ = vol_profile(klines)
+    return bias_from(
+        mid,
+        ema_sl=engine.emas() if engine else emas(klines),
+        obi_v=obi(bids, asks, mid) if mid else None,
+        macd_hist=(engine.macd() if engine else macd(klines))[2],
+        cvd5=cvd(trades, 300),
+        ha=engine.heikin_ashi() if engine else heikin_ashi(klines),
+        vwap_v=vwap(klines),
+        rsi_v=engine.rsi() if engine else rsi(klines),
+        poc=poc,
+        wall_lists=walls(bids, asks, mid),
+    )
+
+
+def bias_from(mid, ema_sl, obi_v, macd_hist, cvd5, ha, vwap_v, rsi_v, poc, wall_lists) -> float:
+    """Weighted bias score from already computed indicator values."""
     W  = config.BIAS_WEIGHTS
     total = 0.0
 
     # ── EMA cross ───────────────────────────────────────────────
-    es, el = emas(klines)
+    es, el = ema_sl
     if es is not None and el is not None:
         total += W["ema"] if es > el else -W["ema"]
 
     # ── OBI (linear –1..+1 → –W..+W) ───────────────────────────
-    if mid:
-        obi_v = obi(bids, asks, mid)       # –1..+1
+    if mid and obi_v is not None:
         total += obi_v * W["obi"]
 
     # ── MACD histogram sign ──────────────────────────────────────
-    _, _, hv = macd(klines)
+    hv = macd_hist
     if hv is not None:
         total += W["macd"] if hv > 0 else -W["macd"]
 
     # ── CVD 5m sign ─────────────────────────────────────────────
-    cvd5 = cvd(trades, 300)
     if cvd5 != 0:
         total += W["cvd"] if cvd5 > 0 else -W["cvd"]
 
     # ── Heikin-Ashi streak (last 3 candles, 2 pts each) ─────────
-    ha = heikin_ashi(klines)
     if ha:
         streak = 0
         for c in reversed(ha[-3:]):
@@ -176,12 +222,10 @@ def bias_score(bids, asks, mid, trades, klines) -> float:
         total += max(-W["ha"], min(W["ha"], streak * (W["ha"] / 3)))
 
     # ── Price vs VWAP ────────────────────────────────────────────
-    vwap_v = vwap(klines)
     if vwap_v and mid:
         total += W["vwap"] if mid > vwap_v else -W["vwap"]
 
     # ── RSI overbought / oversold (linear mapping) ───────────────
-    rsi_v = rsi(klines)
     if rsi_v is not None:
         if rsi_v <= 30:
             total += W["rsi"]
@@ -193,12 +237,11 @@ def bias_score(bids, asks, mid, trades, klines) -> float:
             total -= W["rsi"] * (rsi_v - 50) / 20     # 50→0, 70→–W
 
     # ── Price vs POC ─────────────────────────────────────────────
-    poc, _ = vol_profile(klines)
     if poc and mid:
         total += W["poc"] if mid > poc else -W["poc"]
 
     # ── Walls (bid walls bullish, ask walls bearish) ─────────────
-    bw, aw = walls(bids, asks)
+    bw, aw = wall_lists
     wall_pts = (min(len(bw), 2) - min(len(aw), 2)) * 2   # ±0/2/4
     total += max(-W["walls"], min(W["walls"], wall_pts))
 
@@ -207,6 +250,17 @@ def bias_score(bids, asks, mid, trades, klines) -> float:
     return max(-100.0, min(100.0, raw))
 
 
+# ── Polymarket edge ─────────────────────────────────────────────
+def bias_prob(bias: float) -> float:
+    """Probability of Up implied by a bias score (linear: −100 → 0, +100 → 1)."""
+    return min(1.0, max(0.0, 0.5 + bias / 200))
+
+
+def pm_edge(p: float, ask: float | None) -> float | None:
+    """Expected value per share of buying at `ask` an outcome with probability p."""
+    return None if ask is None else p - ask
+
+
 def heikin_ashi(klines):
     ha = []
     for i, k in enumerate(klines):
@@ -0,0 +1,225 @@
+import math
+
+import config
+
+# Vectorized versions of the candle indicators in `indicators`, over
+# klines stored as contiguous float64 columns. Optional: everything falls
+# back to the pure-Python functions when numpy is missing or
+# IND_BACKEND = "python". Results match the reference within float
+# rounding (see bench.py / README).
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+ENABLED = np is not None and config.IND_BACKEND != "python"
+BACKEND = "numpy" if ENABLED else "python"
+if config.IND_BACKEND == "numpy" and np is None:
+    raise ImportError("IND_BACKEND = 'numpy' but numpy is not installed")
+
+_FIELDS = ("t", "o", "h", "l", "c", "v")
+
+
+def _column(i: int):
+    """Read-only view of column `i` over the live rows."""
+    return property(lambda self: self.buf[i, self.start:self.end])
+
+
+class Candles:
+    """Closed klines as six float64 columns (t, o, h, l, c, v).
+
+    Rows live in one (6, cap) buffer; appends are O(1) amortised and keep
+    the newest `maxlen` rows by sliding the window start, mirroring the
+    trim of State.klines. The buffer is compacted only when the end is
+    reached, so column views stay contiguous.
+    """
+
+    def __init__(self, klines=(), maxlen: int = config.KLINE_MAX):
+        self.maxlen = maxlen
+        self.buf    = np.empty((6, max(2 * maxlen, 16)))
+        self.start  = 0
+        self.end    = 0
+        self.reset(klines)
+
+    def reset(self, klines=()):
+        """Load `klines` as they are (like State.klines, only appends trim)."""
+        klines = list(klines)
+        if len(klines) + self.maxlen > self.buf.shape[1]:
+            self.buf = np.empty((6, len(klines) + self.maxlen))
+        self.start, self.end = 0, len(klines)
+        for i, f in enumerate(_FIELDS):
+            self.buf[i, :self.end] = [k[f] for k in klines]
+
+    def append(self, k: dict):
+        if self.end == self.buf.shape[1]:
+            n = min(self.end - self.start, self.maxlen - 1)
+            self.buf[:, :n] = self.buf[:, self.end - n:self.end]
+            self.start, self.end = 0, n
+        self.buf[:, self.end] = [k["t"], k["o"], k["h"], k["l"], k["c"], k["v"]]
+        self.end += 1
+        self.start = max(self.start, self.end - self.maxlen)
+
+    def __len__(self):
+        return self.end - self.start
+
+    t, o, h, l, c, v = (_column(i) for i in range(6))
+
+
+def _stored(i: int):
+    return property(lambda self: self.rows()[:, i])
+
+
+class StoredCandles:
+    """Candles-compatible columns over the newest `maxlen` rows of a
+    candlestore.CandleStore: strided views straight into the mapping, no
+    copy. Read-only; the store is written by its owner (feeds.close_kline).
+    """
+
+    def __init__(self, store, maxlen: int = config.KLINE_LOOKBACK):
+        self.store  = store
+        self.maxlen = maxlen
+
+    def rows(self):
+        return np.frombuffer(self.store.buffer(self.maxlen), dtype="<f8").reshape(-1, 6)
+
+    def __len__(self):
+        return min(len(self.store), self.maxlen)
+
+    t, o, h, l, c, v = (_stored(i) for i in range(6))
+
+
+# ── linear recurrences ──────────────────────────────────────────
+def _recur(x, a: float, b: float, y0: float):
+    """y[i] = a·x[i] + b·y[i−1] with y[−1] = y0, without a Python loop per
+    element. Within a block y[s+k] = b^k · (b·y0 + a·Σ_{j≤k} x[s+j]·b^−j);
+    blocks are short enough that b^−k stays below ~1e100."""
+    n   = len(x)
+    out = np.empty(n)
+    blk = max(1, int(230 / -math.log(b)))
+    pw  = b ** np.arange(min(blk, n))
+    for s in range(0, n, blk):
+        xs = x[s:s + blk]
+        p  = pw[:len(xs)]
+        out[s:s + len(xs)] = p * (b * y0 + a * np.cumsum(xs / p))
+        y0 = out[s + len(xs) - 1]
+    return out
+
+
+def ema_series(vals, period: int):
+    """Same as indicators._ema_series, with NaN where that returns None."""
+    vals = np.asarray(vals, dtype=float)
+    out  = np.full(len(vals), np.nan)
+    if len(vals) < period:
+        return out
+    mult = 2.0 / (period + 1)
+    seed = vals[:period].mean()
+    out[period - 1] = seed
+    out[period:] = _recur(vals[period:], mult, 1 - mult, seed)
+    return out
+
+
+def _last(a):
+    return None if not len(a) or np.isnan(a[-1]) else float(a[-1])
+
+
+# ── indicators ──────────────────────────────────────────────────
+def vol_profile(cs: Candles):
+    """indicators.vol_profile with overlap binning done as a difference
+    array: each candle adds v/width at its first bin and removes it after
+    its last, and one cumulative sum yields every bin."""
+    if not len(cs):
+        return 0.0, []
+    l, h, v = cs.l, cs.h, cs.v
+    lo, hi  = float(l.min()), float(h.max())
+    if hi == lo:
+        return lo, [(lo, float(v.sum()))]
+
+    n   = config.VP_BINS
+    bsz = (hi - lo) / n
+    b_lo = np.maximum(0, ((l - lo) / bsz).astype(np.int64))
+    b_hi = np.clip(((h - lo) / bsz).astype(np.int64), 0, n - 1)
+    share = v / np.maximum(1, b_hi - b_lo + 1)
+
+    diff = np.bincount(b_lo, share, n + 1) - np.bincount(b_hi + 1, share, n + 1)
+    bins = np.cumsum(diff[:n])
+
+    poci = int(bins.argmax())
+    poc  = lo + (poci + 0.5) * bsz
+    data = [(lo + (i + 0.5) * bsz, float(bins[i])) for i in range(n)]
+    return poc, data
+
+
+def vwap(cs: Candles):
+    v   = cs.v
+    tot = float(v.sum())
+    return float(((cs.h + cs.l + cs.c) / 3) @ v) / tot if tot else 0.0
+
+
+def rsi_series(closes, n: int | None = None):
+    """Wilder RSI after every close (NaN until `n` changes exist, RSI_PERIOD
+    by default)."""
+    closes = np.asarray(closes, dtype=float)
+    n   = n or config.RSI_PERIOD
+    out = np.full(len(closes), np.nan)
+    if len(closes) < n + 1:
+        return out
+    ch = np.diff(closes)
+    g, ls = np.maximum(ch, 0), np.maximum(-ch, 0)
+    ag0, al0 = g[:n].mean(), ls[:n].mean()
+    ag = np.concatenate(([ag0], _recur(g[n:], 1 / n, (n - 1) / n, ag0)))
+    al = np.concatenate(([al0], _recur(ls[n:], 1 / n, (n - 1) / n, al0)))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r = np.where(al == 0, 100.0, 100.0 - 100.0 / (1 + ag / al))
+    out[n:] = r
+    return out
+
+
+def rsi(cs: Candles):
+    return _last(rsi_series(cs.c)) if len(cs) >= config.RSI_PERIOD + 1 else None
+
+
+def macd_series(closes, fast: int | None = None, slow: int | None = None, signal: int | None = None):
+    """(macd, signal, histogram) series, NaN where undefined. Periods
+    default to MACD_FAST / MACD_SLOW / MACD_SIG."""
+    closes = np.asarray(closes, dtype=float)
+    fast, slow = fast or config.MACD_FAST, slow or config.MACD_SLOW
+    ml  = ema_series(closes, fast) - ema_series(closes, slow)
+    sig = np.full(len(closes), np.nan)
+    k   = slow - 1
+    if len(closes) > k:
+        sig[k:] = ema_series(ml[k:], signal or config.MACD_SIG)
+    return ml, sig, ml - sig
+
+
+def macd(cs: Candles):
+    if len(cs) < config.MACD_SLOW:
+        return None, None, None
+    m, s, h = macd_series(cs.c)
+    return _last(m), _last(s), _last(h)
+
+
+def emas(cs: Candles):
+    c = cs.c
+    return _last(ema_series(c, config.EMA_S)), _last(ema_series(c, config.EMA_L))
+
+
+def heikin_ashi_arrays(cs: Candles):
+    """Heikin Ashi (o, h, l, c) columns; HA open is a halving recurrence."""
+    o, h, l, c = cs.o, cs.h, cs.l, cs.c
+    hc = (o + h + l + c) / 4
+    ho = np.empty(len(c))
+    if len(c):
+        ho[0]  = (o[0] + c[0]) / 2
+        ho[1:] = _recur(hc[:-1], 0.5, 0.5, ho[0])
+    return ho, np.maximum(np.maximum(h, ho), hc), np.minimum(np.minimum(l, ho), hc), hc
+
+
+def heikin_ashi(cs: Candles, last: int | None = None):
+    """indicators.heikin_ashi as dicts; `last` limits it to the newest rows."""
+    ho, hh, hl, hc = heikin_ashi_arrays(cs)
+    s = 0 if last is None else max(0, len(hc) - last)
+    return [
+        {"o": float(ho[i]), "h": float(hh[i]), "l": float(hl[i]), "c": float(hc[i]),
+         "green": bool(hc[i] >= ho[i])}
+        for i in range(s, len(hc))
+    ]
@@ -0,0 +1,73 @@
+import asyncio
+import traceback
+
+import clock
+import config
+import metrics
+
+
+class Ingest:
+    """Bounded queue between one socket's receive loop and its handler.
+
+    The receive loop only calls `put`, which stamps and enqueues the raw
+    frame. `run` drains it in batches of up to INGEST_BATCH, hands each
+    batch to `on_batch([(recv_ts, raw), …])` and yields to the event loop
+    in between, so a processing spike delays the queue, not the socket.
+    A full queue either stalls the receiver (backpressure) or drops the
+    frame, per INGEST_FULL; both are counted.
+    """
+
+    def __init__(self, feed: str, on_batch, size: int = config.INGEST_QUEUE,
+                 batch: int = config.INGEST_BATCH):
+        self.feed     = feed
+        self.on_batch = on_batch
+        self.batch    = batch
+        self.q: asyncio.Queue = asyncio.Queue(size)
+        self.wait    = metrics.histogram("pm_assistant_ingest_wait_seconds",
+                                         "Receive to processing delay of a batch's oldest frame", feed=feed)
+        self.stalls  = metrics.counter("pm_assistant_ingest_stalls_total",
+                                       "Receives that waited for queue space", feed=feed)
+        self.dropped = metrics.counter("pm_assistant_ingest_dropped_total",
+                                       "Frames discarded on a full queue", feed=feed)
+        self.errors  = _errors(feed)
+
+    async def put(self, raw):
+        item = (clock.now(), raw)
+        try:
+            self.q.put_nowait(item)
+        except asyncio.QueueFull:
+            if config.INGEST_FULL == "drop":
+                self.dropped.inc()
+                return
+            self.stalls.inc()
+            await self.q.put(item)
+
+    async def run(self):
+        q = self.q
+        while True:
+            frames = [await q.get()]
+            while len(frames) < self.batch and not q.empty():
+                frames.append(q.get_nowait())
+            self.wait.observe(max(0.0, clock.now() - frames[0][0]))
+            try:
+                self.on_batch(frames)        # handlers catch per frame; this is the backstop
+            except Exception:
+                report(self.feed)
+            await asyncio.sleep(0)
+
+
+def _errors(feed: str) -> metrics.Counter:
+    return metrics.counter("pm_assistant_ingest_errors_total", "Frames whose handler raised", feed=feed)
+
+
+_reported: set[str] = set()
+
+
+def report(feed: str):
+    """Count a frame whose handling raised; call it from the except block.
+    The first error of each feed is printed with its traceback."""
+    _errors(feed).inc()
+    if feed not in _reported:
+        _reported.add(feed)
+        print(f"  [{feed}] frame handler error (later ones are only counted):")
+        traceback.print_exc()
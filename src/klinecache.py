@@ -0,0 +1,50 @@
+import json
+import os
+
+import codec
+import config
+
+# On-disk copy of recent REST kline history, one JSON file per symbol /
+# interval, so a restart only fetches the bars it missed.
+
+ROOT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                    config.KLINE_CACHE) if config.KLINE_CACHE else None
+
+
+def _path(symbol: str, interval: str) -> str:
+    return os.path.join(ROOT, f"{symbol}_{interval}.json")
+
+
+def load(symbol: str, interval: str) -> list[dict]:
+    if ROOT is None:
+        return []
+    try:
+        with open(_path(symbol, interval), "rb") as f:
+            return codec.loads(f.read())
+    except (OSError, ValueError):
+        return []
+
+
+def save(symbol: str, interval: str, rows: list[dict]):
+    """Write atomically, so a crash mid-write never leaves a torn file."""
+    if ROOT is None:
+        return
+    try:
+        os.makedirs(ROOT, exist_ok=True)
+        path = _path(symbol, interval)
+        tmp  = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(rows, f, separators=(",", ":"))
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"  [cache] could not write {symbol} {interval}: {e}")
+
+
+def merge(old: list[dict], new: list[dict]) -> list[dict]:
+    """`old` followed by `new`, where rows of `new` replace rows of `old`
+    with the same open time (the cached forming bar gets its final values)."""
+    if not new:
+        return list(old)
+    cut = new[0]["t"]
+    keep = [r for r in old if r["t"] < cut]
+    return keep + new
@@ -0,0 +1,121 @@
+import asyncio
+
+import candles
+import config
+import feeds
+
+
+class Market:
+    def __init__(self, coin: str, tf: str, state: feeds.State):
+        self.coin     = coin
+        self.tf       = tf
+        self.symbol   = config.COIN_BINANCE[coin]
+        self.interval = config.TF_KLINE[tf]
+        self.state    = state
+
+    @property
+    def name(self) -> str:
+        return f"{self.coin} {self.tf}"
+
+
+def build(pairs, stores: dict | None = None) -> list[Market]:
+    """One Market per (coin, timeframe). Timeframes of the same coin share
+    a single TradeStore, so each trade is stored once per symbol, and those
+    on the same kline interval share one trade volume profile. Pass the
+    same `stores` dict (symbol → store, (symbol, interval) → profile) to
+    later calls to keep sharing across them. All markets of one call share
+    a `changed` signal, so a view of all of them wakes on any update."""
+    stores  = {} if stores is None else stores
+    changed = feeds.Changed()
+    out = []
+    for coin, tf in pairs:
+        st  = feeds.State()
+        st.changed = changed
+        m   = Market(coin, tf, st)
+        st.trades = stores.setdefault(m.symbol, st.trades)
+        if st.profile is not None:
+            st.profile = stores.setdefault((m.symbol, m.interval), st.profile)
+        out.append(m)
+    return out
+
+
+def all_markets() -> list[Market]:
+    return build((c, tf) for c in config.COINS for tf in config.COIN_TIMEFRAMES[c])
+
+
+def _group(markets, key) -> dict:
+    out = {}
+    for m in markets:
+        out.setdefault(key(m), []).append(m.state)
+    return out
+
+
+async def setup(markets: list[Market]):
+    """Fetch PM tokens for every market and candle history for every
+    symbol, all concurrently."""
+    async def tokens(m):
+        m.state.pm_up_id, m.state.pm_dn_id = await asyncio.to_thread(
+            feeds.fetch_pm_tokens, m.coin, m.tf)
+        feeds.record_market(m.coin, m.tf, m.state)
+
+    async def history(sym, mkts):
+        hist = await feeds.fetch_history(sym, {m.interval for m in mkts})
+        for m in mkts:
+            feeds.attach_store(m.state, sym, m.interval)
+            feeds.load_history(m.state, hist[m.interval], m.interval)
+        for iv, kl in hist.items():
+            print(f"  [Binance] {sym} {iv}: loaded {len(kl)} historical candles")
+
+    by_sym = {}
+    for m in markets:
+        by_sym.setdefault(m.symbol, []).append(m)
+    await asyncio.gather(
+        *(tokens(m) for m in markets),
+        *(history(sym, mkts) for sym, mkts in by_sym.items()),
+    )
+    live = sum(1 for m in markets if m.state.pm_up_id)
+    print(f"  [PM] {live}/{len(markets)} markets have live tokens")
+
+
+def routes(markets: list[Market]):
+    """Binance stream routes, depth syncs and PM asset map for `markets`."""
+    out   = {}
+    syncs = []
+    local = config.KLINE_SOURCE == "trades"
+    builders = {}
+    for (sym, iv), states in _group(markets, lambda m: (m.symbol, m.interval)).items():
+        if local:
+            builders.setdefault(sym, candles.CandleBuilder(feeds.close_kline)).watch(iv, states)
+        else:
+            out[f"{sym.lower()}@kline_{iv}"] = feeds.kline_route(states)
+    for sym, states in _group(markets, lambda m: m.symbol).items():
+        s = sym.lower()
+        out[f"{s}@{config.TRADE_STREAM}"] = feeds.trade_route(states[0].trades, states, builders.get(sym))
+        sync = feeds.DepthSync(sym, states)
+        for st in states:
+            st.book = sync.book
+        out[sync.stream] = sync.on_depth
+        syncs.append(sync)
+    return out, syncs, assets(markets)
+
+
+def assets(markets: list[Market]) -> dict[str, feeds.State]:
+    """PM asset id → State of every market's live tokens."""
+    out = {}
+    for m in markets:
+        if m.state.pm_up_id:
+            out[m.state.pm_up_id] = m.state
+            out[m.state.pm_dn_id] = m.state
+    return out
+
+
+async def run(markets: list[Market]):
+    """Feed every market over one combined Binance socket and one PM socket
+    that follows each market across window rollovers."""
+    bn_routes, syncs, assets = routes(markets)
+    pm = feeds.PmSocket(assets)
+    await asyncio.gather(
+        feeds.binance_stream(bn_routes, "Binance WS multi", syncs),
+        pm.run(),
+        *(feeds.pm_rollover(m.coin, m.tf, m.state, pm) for m in markets),
+    )
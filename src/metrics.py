@@ -0,0 +1,211 @@
+import asyncio
+import math
+import time
+from contextlib import contextmanager
+
+# ── streaming histograms & counters ─────────────────────────────
+# Histograms use log-spaced buckets (8 per doubling, ≈9 % relative error)
+# from 1 µs to ~12 days, so memory is constant and an observation is one
+# log() and one list increment. Exported to Prometheus as summaries.
+
+_MIN     = 1e-6
+_PER_OCT = 8
+_NBUCKET = _PER_OCT * 40
+_LOG_G   = math.log(2) / _PER_OCT
+_SCALE   = 1 / _LOG_G
+_log     = math.log
+
+
+class Histogram:
+    kind = "summary"
+
+    def __init__(self, name: str, help: str, labels: dict):
+        self.name   = name
+        self.help   = help
+        self.labels = labels
+        self.counts = [0] * _NBUCKET
+        self.count  = 0
+        self.sum    = 0.0
+        self.max    = 0.0
+
+    def observe(self, v: float):
+        self.count += 1
+        self.sum   += v
+        if v > self.max:
+            self.max = v
+        if v <= _MIN:
+            self.counts[0] += 1
+            return
+        i = int(_log(v / _MIN) * _SCALE) + 1
+        self.counts[i if i < _NBUCKET else _NBUCKET - 1] += 1
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= target and c:
+                if i == 0:
+                    return _MIN
+                # geometric middle of the bucket
+                return min(self.max, _MIN * math.exp((i - 0.5) * _LOG_G))
+        return self.max
+
+    def reset(self):
+        self.counts = [0] * _NBUCKET
+        self.count, self.sum, self.max = 0, 0.0, 0.0
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: dict):
+        self.name   = name
+        self.help   = help
+        self.labels = labels
+        self.value  = 0
+        self._mark  = (time.monotonic(), 0)
+
+    def inc(self, n: int = 1):
+        self.value += n
+
+    def rate(self) -> float:
+        """Per-second rate since the previous call."""
+        now = time.monotonic()
+        t0, v0 = self._mark
+        self._mark = (now, self.value)
+        return (self.value - v0) / (now - t0) if now > t0 else 0.0
+
+
+_registry: dict[tuple, Histogram | Counter] = {}
+
+
+def _get(cls, name, help, labels):
+    key = (name, tuple(sorted(labels.items())))
+    m = _registry.get(key)
+    if m is None:
+        m = _registry[key] = cls(name, help, labels)
+    return m
+
+
+def histogram(name: str, help: str = "", **labels) -> Histogram:
+    return _get(Histogram, name, help, labels)
+
+
+def counter(name: str, help: str = "", **labels) -> Counter:
+    return _get(Counter, name, help, labels)
+
+
+def all_metrics():
+    return list(_registry.values())
+
+
+@contextmanager
+def timed(h: Histogram):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        h.observe(time.perf_counter() - t0)
+
+
+# ── instruments used by the feeds / UI ──────────────────────────
+LATENCY = "pm_assistant_exchange_latency_seconds"
+MSGS    = "pm_assistant_messages_total"
+
+lat_trade  = histogram(LATENCY, "Exchange event time to local receive time", feed="trade")
+lat_kline  = histogram(LATENCY, "Exchange event time to local receive time", feed="kline")
+lat_depth  = histogram(LATENCY, "Exchange event time to local receive time", feed="depth")
+lat_pm     = histogram(LATENCY, "Exchange event time to local receive time", feed="pm")
+loop_lag   = histogram("pm_assistant_loop_lag_seconds", "asyncio event-loop scheduling delay")
+http_time  = histogram("pm_assistant_http_seconds", "REST round-trip time", call="depth")
+http_poll  = histogram("pm_assistant_http_seconds", "REST round-trip time", call="depth_poll")
+render_all = histogram("pm_assistant_render_seconds", "dashboard render time", panel="total")
+draw_time  = histogram("pm_assistant_render_seconds", "dashboard render time", panel="draw")
+msgs_bn    = counter(MSGS, "Messages received per feed", feed="binance")
+msgs_pm    = counter(MSGS, "Messages received per feed", feed="pm")
+merged_bn  = counter("pm_assistant_ingest_coalesced_total", "Updates superseded within a batch", feed="binance")
+merged_pm  = counter("pm_assistant_ingest_coalesced_total", "Updates superseded within a batch", feed="pm")
+
+# stream gaps: what went missing, what REST recovered (missed − backfilled is lost)
+http_fill   = histogram("pm_assistant_http_seconds", "REST round-trip time", call="backfill")
+backfill_tr = histogram("pm_assistant_backfill_seconds", "Gap detected to missed items applied", kind="trade")
+backfill_kl = histogram("pm_assistant_backfill_seconds", "Gap detected to missed items applied", kind="kline")
+gaps_tr     = counter("pm_assistant_stream_gaps_total", "Gaps detected in a stream", kind="trade")
+gaps_kl     = counter("pm_assistant_stream_gaps_total", "Gaps detected in a stream", kind="kline")
+missed_tr   = counter("pm_assistant_missed_total", "Items missing from a stream", kind="trade")
+missed_kl   = counter("pm_assistant_missed_total", "Items missing from a stream", kind="kline")
+filled_tr   = counter("pm_assistant_backfilled_total", "Missed items recovered over REST", kind="trade")
+filled_kl   = counter("pm_assistant_backfilled_total", "Missed items recovered over REST", kind="kline")
+dup_trades  = counter("pm_assistant_duplicate_trades_total", "Trades received twice (handover overlap)")
+
+
+def total(name: str) -> int:
+    """Sum of a counter over all its label sets."""
+    return sum(m.value for m in _registry.values() if m.name == name)
+
+
+def render_panel(panel: str) -> Histogram:
+    return histogram("pm_assistant_render_seconds", "dashboard render time", panel=panel)
+
+
+async def loop_lag_probe(interval: float = 0.25):
+    """Sleep `interval` forever and record how late each wake-up is."""
+    loop = asyncio.get_running_loop()
+    while True:
+        t0 = loop.time()
+        await asyncio.sleep(interval)
+        loop_lag.observe(max(0.0, loop.time() - t0 - interval))
+
+
+# ── Prometheus text exposition ──────────────────────────────────
+def _lbl(labels: dict, extra: dict | None = None) -> str:
+    d = {**labels, **(extra or {})}
+    if not d:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in d.items()) + "}"
+
+
+def exposition() -> str:
+    out, seen = [], set()
+    for m in sorted(all_metrics(), key=lambda m: m.name):
+        if m.name not in seen:
+            seen.add(m.name)
+            out.append(f"# HELP {m.name} {m.help}")
+            out.append(f"# TYPE {m.name} {m.kind}")
+        if m.kind == "counter":
+            out.append(f"{m.name}{_lbl(m.labels)} {m.value}")
+        else:
+            for q in (0.5, 0.9, 0.99):
+                out.append(f"{m.name}{_lbl(m.labels, {'quantile': q})} {m.quantile(q):.6g}")
+            out.append(f"{m.name}_sum{_lbl(m.labels)} {m.sum:.6g}")
+            out.append(f"{m.name}_count{_lbl(m.labels)} {m.count}")
+    return "\n".join(out) + "\n"
+
+
+async def serve(host: str, port: int):
+    """Minimal HTTP endpoint answering every request with the exposition."""
+    async def handle(reader, writer):
+        try:
+            await reader.readuntil(b"\r\n\r\n")
+            body = exposition().encode()
+            writer.write(b"HTTP/1.1 200 OK\r\n"
+                         b"Content-Type: text/plain; version=0.0.4\r\n"
+                         b"Content-Length: " + str(len(body)).encode() + b"\r\n"
+                         b"Connection: close\r\n\r\n" + body)
+            await writer.drain()
+        except Exception:
+            pass
+        finally:
+            writer.close()
+
+    try:
+        server = await asyncio.start_server(handle, host, port)
+    except OSError as e:             # e.g. another instance holds the port
+        print(f"  [metrics] cannot listen on {host}:{port} ({e}); running without /metrics")
+        return
+    print(f"  [metrics] http://{host}:{port}/metrics")
+    async with server:
+        await server.serve_forever()
@@ -0,0 +1,100 @@
+import struct
+import time
+import zlib
+
+# Log layout
+#   MAGIC
+#   block*   := header payload
+#   header   := first_ts f64, last_ts f64, count u32, payload_len u32
+#   payload  := zlib(record*)
+#   record   := recv_ts f64, channel u8, len u32, raw bytes
+#
+# Blocks compress independently, so a reader can skip to any timestamp by
+# walking headers without inflating what it skips.
+
+MAGIC   = b"PMREC1\n"
+_HEAD   = struct.Struct("<ddII")
+_REC    = struct.Struct("<dBI")
+
+# ── channels ────────────────────────────────────────────────────
+BINANCE    = 1    # combined-stream frame, verbatim
+PM         = 2    # Polymarket market-socket frame, verbatim
+DEPTH_SNAP = 3    # {"s": symbol, "d": REST depth snapshot}
+DEPTH_POLL = 4    # {"s": symbol, "d": REST depth poll}
+KLINES     = 5    # {"s": symbol, "i": interval, "d": [kline dicts]}
+META       = 6    # {"coin", "tf", "up", "dn"} – one per market at startup and after each rollover
+PM_SUB     = 7    # {"coin", "tf", "ids"} – next window's tokens subscribed ahead of a rollover
+
+
+class Recorder:
+    """Append-only writer of raw feed messages with receive timestamps."""
+
+    def __init__(self, path: str, block_records: int = 4096, block_secs: float = 2.0):
+        self.f = open(path, "ab")
+        if self.f.tell() == 0:
+            self.f.write(MAGIC)
+        self.block_records = block_records
+        self.block_secs    = block_secs
+        self._buf   = bytearray()
+        self._count = 0
+        self._first = 0.0
+        self._last  = 0.0
+        self.records = 0
+
+    def write(self, channel: int, raw, ts: float | None = None):
+        ts = time.time() if ts is None else ts
+        if isinstance(raw, str):
+            raw = raw.encode()
+        if not self._count:
+            self._first = ts
+        self._last = ts
+        self._buf += _REC.pack(ts, channel, len(raw))
+        self._buf += raw
+        self._count += 1
+        self.records += 1
+        if self._count >= self.block_records or ts - self._first >= self.block_secs:
+            self.flush()
+
+    def flush(self):
+        if not self._count:
+            return
+        payload = zlib.compress(bytes(self._buf), 6)
+        self.f.write(_HEAD.pack(self._first, self._last, self._count, len(payload)))
+        self.f.write(payload)
+        self.f.flush()
+        self._buf.clear()
+        self._count = 0
+
+    def close(self):
+        self.flush()
+        self.f.close()
+
+
+def read(path: str, start: float | None = None, end: float | None = None):
+    """Yield (recv_ts, channel, raw bytes) in file order.
+    Blocks entirely before `start` are skipped without decompressing."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path}: not a feed recording")
+        while True:
+            head = f.read(_HEAD.size)
+            if len(head) < _HEAD.size:
+                return
+            first, last, count, n = _HEAD.unpack(head)
+            if start is not None and last < start:
+                f.seek(n, 1)
+                continue
+            if end is not None and first > end:
+                return
+            data = zlib.decompress(f.read(n))
+            off = 0
+            for _ in range(count):
+                ts, ch, ln = _REC.unpack_from(data, off)
+                off += _REC.size
+                raw = data[off:off + ln]
+                off += ln
+                if start is not None and ts < start:
+                    continue
+                if end is not None and ts > end:
+                    return
+                yield ts, ch, raw
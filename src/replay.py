@@ -0,0 +1,148 @@
+import time
+
+import clock
+import codec
+import feeds
+import markets
+import snapshot
+import recorder as rec
+
+
+class ReplayStats:
+    def __init__(self):
+        self.events = 0
+        self.evals  = 0
+        self.first_ts = 0.0
+        self.last_ts  = 0.0
+        self.wall     = 0.0
+
+    @property
+    def span(self) -> float:
+        return self.last_ts - self.first_ts
+
+    @property
+    def eps(self) -> float:
+        return self.events / self.wall if self.wall else 0.0
+
+    @property
+    def speedup(self) -> float:
+        return self.span / self.wall if self.wall else 0.0
+
+
+class Replay:
+    """Drive the live feed handlers from a recording as fast as possible.
+
+    Markets are rebuilt from META records, messages go through the same
+    routes as `markets.run`, and `clock` follows the receive timestamp of
+    each record, so every time-windowed indicator sees recording time.
+    """
+
+    def __init__(self, path: str):
+        self.path    = path
+        self.markets: list[markets.Market] = []
+        self._stores  = {}
+        self._klines  = {}          # (symbol, interval) → last KLINES payload
+        self._routes  = {}
+        self._syncs   = {}
+        self._assets: dict[str, feeds.State] = {}   # PM asset → State, like PmSocket.assets
+        self._bn = None
+        self._pm = feeds.pm_router(self._assets)
+        self._now = 0.0
+
+    def _market(self, coin: str, tf: str) -> markets.Market | None:
+        return next((m for m in self.markets if (m.coin, m.tf) == (coin, tf)), None)
+
+    def _prefetch(self, sub: dict):
+        """Route the next window's tokens, as pm_rollover subscribes them."""
+        m = self._market(sub["coin"], sub["tf"])
+        if m is not None:
+            for a in sub["ids"]:
+                self._assets[a] = m.state
+
+    def _add_market(self, meta: dict):
+        m = self._market(meta["coin"], meta["tf"])
+        if m is not None:                                       # window rollover
+            st  = m.state
+            new = (meta["up"], meta["dn"])
+            old = [a for a in (st.pm_up_id, st.pm_dn_id) if a and a not in new]
+            feeds._pm_switch(st, *new)
+            for a in old:                                       # as PmSocket.unsubscribe
+                self._assets.pop(a, None)
+                st.pm_books.pop(a, None)
+            for a in new:
+                if a:
+                    self._assets[a] = st
+            return
+        m = markets.build([(meta["coin"], meta["tf"])], self._stores)[0]
+        m.state.pm_up_id, m.state.pm_dn_id = meta["up"], meta["dn"]
+        kl = self._klines.get((m.symbol, m.interval))
+        if kl is not None:
+            feeds.load_history(m.state, kl, m.interval)
+        self.markets.append(m)
+
+        self._routes, syncs, assets = markets.routes(self.markets)
+        for name, fn in list(self._routes.items()):     # recorded under either trade stream
+            for a, b in (("@trade", "@aggTrade"), ("@aggTrade", "@trade")):
+                if name.endswith(a):
+                    self._routes[name[:-len(a)] + b] = fn
+        self._syncs = {s.symbol: s for s in syncs}
+        self._bn = feeds.binance_router(self._routes)
+        self._assets.update(assets)
+
+    def _apply(self, ch: int, raw: bytes):
+        if ch == rec.BINANCE:
+            if self._bn:
+                self._bn(raw)
+        elif ch == rec.PM:
+            self._pm(raw)
+        elif ch == rec.DEPTH_SNAP:
+            d = codec.loads(raw)
+            sync = self._syncs.get(d["s"])
+            if sync:
+                sync.on_snapshot(d["d"])
+        elif ch == rec.DEPTH_POLL:
+            d = codec.loads(raw)
+            for m in self.markets:
+                if m.symbol == d["s"]:
+                    feeds.apply_poll(d["d"], m.state)
+        elif ch == rec.KLINES:
+            d = codec.loads(raw)
+            self._klines[(d["s"], d["i"])] = d["d"]
+            for m in self.markets:
+                if (m.symbol, m.interval) == (d["s"], d["i"]):
+                    feeds.load_history(m.state, d["d"], m.interval)
+        elif ch == rec.META:
+            self._add_market(codec.loads(raw))
+        elif ch == rec.PM_SUB:
+            self._prefetch(codec.loads(raw))
+
+    def run(self, start=None, end=None, every: float = 1.0, on_eval=None) -> ReplayStats:
+        """Replay [start, end]; every `every` seconds of recording time take
+        a snapshot of each ready market and pass it to on_eval(ts, market, snap)."""
+        stats = ReplayStats()
+        next_eval = None
+        clock.use(lambda: self._now)
+        t0 = time.perf_counter()
+        try:
+            for ts, ch, raw in rec.read(self.path, start, end):
+                self._now = ts
+                if not stats.events:
+                    stats.first_ts = ts
+                    next_eval = ts + every
+                stats.events += 1
+                self._apply(ch, raw)
+
+                if ts >= next_eval:
+                    next_eval = ts + every
+                    for m in self.markets:
+                        st = m.state
+                        if st.mid and st.klines:
+                            sn = snapshot.take(st)
+                            stats.evals += 1
+                            if on_eval:
+                                on_eval(ts, m, sn)
+            stats.last_ts = self._now
+        finally:
+            clock.use(None)
+            stats.wall = time.perf_counter() - t0
+        return stats
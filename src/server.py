@@ -0,0 +1,89 @@
+import asyncio
+import json
+
+import websockets
+
+import config
+import snapshot
+
+
+class SignalServer:
+    """Headless publisher of per-market indicator snapshots.
+
+    WebSocket clients get one `full` message on connect and then `delta`
+    messages carrying only the fields that changed, pushed when a market's
+    state changes and at most once per SERVE_MIN_INTERVAL. Each delta is
+    encoded once and broadcast as the same frame to every subscriber.
+    `GET /snapshot` returns the full view as plain JSON for one-shot
+    polling.
+    """
+
+    def __init__(self, markets):
+        self.markets = markets
+        self.clients: set = set()
+        self.last: dict[str, dict] = {}
+        self.seq = 0
+
+    def _full(self) -> str:
+        return json.dumps({"type": "full", "seq": self.seq, "markets": self.last})
+
+    def _diff(self) -> dict:
+        changes = {}
+        for m in self.markets:
+            st = m.state
+            if not (st.mid and st.klines):
+                continue
+            cur  = snapshot.as_dict(snapshot.take(st))
+            prev = self.last.get(m.name, {})
+            d = {k: v for k, v in cur.items() if prev.get(k) != v}
+            if d:
+                changes[m.name] = d
+                self.last[m.name] = cur
+        return changes
+
+    async def _handler(self, ws):
+        # register before the first await: the full frame is queued ahead of
+        # any delta broadcast meanwhile, and that delta continues from its seq
+        full = self._full()
+        self.clients.add(ws)
+        await ws.send(full)
+        try:
+            await ws.wait_closed()
+        finally:
+            self.clients.discard(ws)
+
+    def _process_request(self, connection, request):
+        if request.path == "/snapshot":
+            resp = connection.respond(200, self._full() + "\n")
+            resp.headers["Content-Type"] = "application/json"
+            return resp
+        return None
+
+    async def publish_loop(self):
+        """Diff and publish when a market's state changes, then hold off
+        for SERVE_MIN_INTERVAL so bursts are merged into one delta."""
+        # every market in one view shares a signal; listen once per signal
+        signals = {id(m.state.changed): m.state.changed for m in self.markets}
+        events  = [sig.listen() for sig in signals.values()]
+        while True:
+            for ev in events:
+                ev.clear()
+            changes = self._diff()
+            if changes:
+                self.seq += 1
+                if self.clients:
+                    websockets.broadcast(self.clients, json.dumps(
+                        {"type": "delta", "seq": self.seq, "markets": changes}))
+            await asyncio.sleep(config.SERVE_MIN_INTERVAL)
+
+            waits = [asyncio.ensure_future(ev.wait()) for ev in events]
+            # CVD windows slide with the clock, so re-check at least once a second
+            await asyncio.wait(waits, timeout=1.0, return_when=asyncio.FIRST_COMPLETED)
+            for w in waits:
+                w.cancel()
+
+    async def run(self, host: str = config.SERVE_HOST, port: int = config.SERVE_PORT):
+        async with websockets.serve(self._handler, host, port,
+                                    process_request=self._process_request):
+            print(f"  [serve] ws://{host}:{port}  (GET /snapshot for a one-shot view)")
+            await self.publish_loop()
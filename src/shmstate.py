@@ -0,0 +1,284 @@
+import math
+import multiprocessing as mp
+import struct
+import time
+from multiprocessing import shared_memory
+
+import candles
+import candlestore
+import config
+import feeds
+import indicators_np as npi
+import snapshot
+from book  import PmBook
+from store import TradeStore, new_store, store_nbytes
+
+# Segment layout
+#   seq     u64                 seqlock: odd while the publisher writes
+#   header  _HEAD               scalars, versions, trade-ring cursors, counts
+#   book    2 × OB_LEVELS × (price, qty)              f64
+#   bookm   obi, DEPTH_BANDS, 2 × SHM_WALLS × (price, qty)   f64  (the feed side's book group)
+#   klines  KLINE_MAX × (t, o, h, l, c, v)            f64
+#   pm      4 × SHM_PM_LEVELS × (price, size)         f64  (up bids/asks, dn bids/asks)
+#   trades  TradeStore / FlowBars columns             (outside the seqlock)
+#
+# The feed process owns the segment and its TradeStore lives in it, so
+# trades are never copied: a reader maps the same ring and only takes the
+# cursors from the header. Everything else is small and copied out under
+# the seqlock; klines and PM levels only when their version moved. Book
+# metrics come from the full local book, which only the feed process has,
+# so it publishes the computed numbers rather than the levels behind them.
+
+_SEQ  = struct.Struct("<Q")
+_HEAD = struct.Struct("<3d6Q2d10I")
+_OFF  = _SEQ.size
+_L    = config.OB_LEVELS
+_K    = config.KLINE_MAX
+_P    = config.SHM_PM_LEVELS
+_D    = len(config.DEPTH_BANDS)
+_W    = config.SHM_WALLS
+
+_BOOK   = _OFF + _HEAD.size
+_BOOKM  = _BOOK + 2 * _L * 16
+_KLINES = _BOOKM + (1 + _D + 4 * _W) * 8
+_PM     = _KLINES + _K * 48
+_TRADES = (_PM + 4 * _P * 16 + 63) // 64 * 64
+_SIZE   = _TRADES + store_nbytes()
+
+
+def _nan(v):
+    return math.nan if v is None else v
+
+
+def _none(v):
+    return None if math.isnan(v) else v
+
+
+class Publisher:
+    """Feed-process side: owns the segment and publishes a State into it.
+
+    Must be created before the feeds start, since it moves `state.trades`
+    into shared memory (trade routes bind the store when they are built).
+    """
+
+    def __init__(self, state):
+        self.shm  = shared_memory.SharedMemory(create=True, size=_SIZE)
+        self.name = self.shm.name
+        buf = self.shm.buf
+        self.f64  = buf[:_TRADES].cast("d")     # offsets below are in doubles
+        state.trades = self.trades = new_store(buf[_TRADES:])
+        self._seq  = 0
+        self._kver = self._pver = self._bver = None
+        self._pm   = [0, 0, 0, 0]
+        self._walls = (0, 0)
+        self._write_seq()
+
+    def _write_seq(self):
+        _SEQ.pack_into(self.shm.buf, 0, self._seq)
+
+    def _levels(self, at: int, levels, n: int) -> int:
+        f = self.f64
+        levels = levels[:n]
+        for j, (p, q) in enumerate(levels):
+            f[at + 2 * j]     = p
+            f[at + 2 * j + 1] = q
+        return len(levels)
+
+    def publish(self, st):
+        self._seq += 1                 # odd: write in progress
+        self._write_seq()
+
+        nb = self._levels(_BOOK // 8, st.bids, _L)
+        na = self._levels(_BOOK // 8 + 2 * _L, st.asks, _L)
+        if st.book is not None and st.book_ver != self._bver:
+            g, f, at = snapshot.book_metrics(st), self.f64, _BOOKM // 8
+            f[at] = g["obi"]
+            for j, b in enumerate(config.DEPTH_BANDS):
+                f[at + 1 + j] = g["depth"].get(b, 0.0)
+            at += 1 + _D
+            self._walls = (self._levels(at, g["bid_walls"], _W),
+                           self._levels(at + 2 * _W, g["ask_walls"], _W))
+            self._bver = st.book_ver
+
+        kl = st.klines
+        nk = min(len(kl), _K)
+        if st.kline_ver != self._kver:
+            f, at = self.f64, _KLINES // 8
+            for k in kl[len(kl) - nk:]:
+                f[at], f[at + 1], f[at + 2] = k["t"], k["o"], k["h"]
+                f[at + 3], f[at + 4], f[at + 5] = k["l"], k["c"], k["v"]
+                at += 6
+            self._kver = st.kline_ver
+
+        up = st.pm_books.get(st.pm_up_id)
+        dn = st.pm_books.get(st.pm_dn_id)
+        if st.pm_ver != self._pver:
+            self._pm = [
+                self._levels(_PM // 8 + 2 * _P * i, side.top(_P) if side else [], _P)
+                for i, side in enumerate((up and up.bids, up and up.asks,
+                                          dn and dn.bids, dn and dn.asks))
+            ]
+            self._pver = st.pm_ver
+
+        tr = st.trades
+        _HEAD.pack_into(
+            self.shm.buf, _OFF,
+            st.mid, _nan(st.pm_up), _nan(st.pm_dn),
+            st.book_ver, st.trade_ver, st.kline_ver, st.pm_ver, tr.head, tr.tail,
+            tr.total, tr._base,
+            nb, na, nk, *self._pm, *self._walls,
+            (up is not None) | (dn is not None) << 1 | (self._bver is not None) << 2,
+        )
+
+        self._seq += 1                 # even: consistent again
+        self._write_seq()
+
+    def close(self):
+        _release(self.f64, self.trades)
+        self.shm.close()
+        self.shm.unlink()
+
+
+class Reader:
+    """Worker side: maps the segment and refreshes a feeds.State-shaped
+    object from it, so snapshot.take() and dashboard.render() run on it
+    unchanged."""
+
+    def __init__(self, name: str, symbol: str, interval: str):
+        # a spawned worker shares the parent's resource tracker, so attaching
+        # here does not make the segment go away when the worker exits
+        self.shm = shared_memory.SharedMemory(name=name)
+        buf = self.shm.buf
+        self.f64  = buf[:_TRADES].cast("d")
+        self._seq = None
+
+        st = self.state = feeds.State()
+        st.trades   = new_store(buf[_TRADES:])
+        st.pm_up_id, st.pm_dn_id = "up", "dn"
+        st.profile = None               # trades beyond TRADE_TTL are not shared: profile from candles
+        # the feed process writes the candle store; read the same file
+        st.store = candlestore.open_store(symbol, interval, candles.INTERVAL_SECS[interval], readonly=True)
+        if st.store is not None and npi.ENABLED:
+            st.candles = npi.StoredCandles(st.store)
+
+    def _pairs(self, at: int, n: int):
+        f = self.f64[at:at + 2 * n]
+        return list(zip(f[0::2], f[1::2]))
+
+    def read(self) -> bool:
+        """Copy a consistent publish into `state`. False if nothing new."""
+        st = self.state
+        while True:
+            s1 = _SEQ.unpack_from(self.shm.buf)[0]
+            if s1 == self._seq:
+                return False
+            if s1 & 1:
+                time.sleep(0)
+                continue
+            h = _HEAD.unpack_from(self.shm.buf, _OFF)
+            (mid, pm_up, pm_dn, bver, tver, kver, pver, head, tail, total, base,
+             nb, na, nk, nub, nua, ndb, nda, nbw, naw, flags) = h
+            bids = self._pairs(_BOOK // 8, nb)
+            asks = self._pairs(_BOOK // 8 + 2 * _L, na)
+            bm = None
+            if flags & 4:
+                at = _BOOKM // 8
+                f  = self.f64[at:at + 1 + _D].tolist()
+                at += 1 + _D
+                bm = {
+                    "obi":       f[0],
+                    "bid_walls": self._pairs(at, nbw),
+                    "ask_walls": self._pairs(at + 2 * _W, naw),
+                    "depth":     dict(zip(config.DEPTH_BANDS, f[1:])) if mid else {},
+                }
+            kl = None
+            if kver != st.kline_ver:
+                f  = self.f64[_KLINES // 8:_KLINES // 8 + 6 * nk].tolist()
+                kl = [dict(zip("tohlcv", f[i:i + 6])) for i in range(0, 6 * nk, 6)]
+            pm = None
+            if pver != st.pm_ver:
+                pm = [self._pairs(_PM // 8 + 2 * _P * i, n)
+                      for i, n in enumerate((nub, nua, ndb, nda))]
+            if _SEQ.unpack_from(self.shm.buf)[0] == s1:
+                break
+
+        self._seq = s1
+        st.mid, st.pm_up, st.pm_dn = mid, _none(pm_up), _none(pm_dn)
+        st.bids, st.asks, st.book_ver = bids, asks, bver
+        st.book_metrics = bm
+        tr = st.trades
+        tr.head, tr.tail, tr.total, tr._base = head, tail, total, base
+        st.trade_ver = tver
+        if kl is not None:
+            self._load_klines(kl, kver)
+        if pm is not None:
+            st.pm_books = {}
+            for i, key in enumerate(("up", "dn")):
+                if flags >> i & 1:
+                    b = st.pm_books[key] = PmBook()
+                    for p, q in pm[2 * i]:
+                        b.bids.set(p, q)
+                    for p, q in pm[2 * i + 1]:
+                        b.asks.set(p, q)
+            st.pm_ver = pver
+        return True
+
+    def close(self):
+        _release(self.f64, self.state.trades)
+        self.shm.close()
+
+    def _load_klines(self, kl, ver):
+        st = self.state
+        st.klines = kl
+        if st.store is not None:
+            st.engine.reset(st.store.tail(config.KLINE_LOOKBACK))
+        else:
+            st.engine.reset(kl)
+            if st.candles is not None:
+                st.candles.reset(kl)
+        st.kline_ver = ver
+
+
+def _release(f64, trades: TradeStore):
+    """Drop every view into the segment so it can be closed; `trades`
+    is unusable afterwards."""
+    for v in (f64, *vars(trades).values()):
+        if isinstance(v, memoryview):
+            v.release()
+
+
+# ── render worker ───────────────────────────────────────────────
+def render_worker(name: str, coin: str, tf: str, symbol: str, interval: str):
+    """Worker process: compute indicators and draw the dashboard from the
+    segment, at most MAX_FPS times a second and whenever it changes."""
+    from rich.console import Console
+    from rich.live    import Live
+    import dashboard
+
+    reader  = Reader(name, symbol, interval)
+    st      = reader.state
+    parent  = mp.parent_process()
+    idle    = config.REFRESH_5M if tf == "5m" else config.REFRESH
+    drawn   = 0.0
+    console = Console(force_terminal=True)
+    try:
+        with Live(console=console, auto_refresh=False, transient=False) as live:
+            while parent is None or parent.is_alive():
+                time.sleep(1 / config.MAX_FPS)
+                fresh = reader.read()
+                if (fresh or time.monotonic() - drawn >= idle) and st.mid > 0 and st.klines:
+                    live.update(dashboard.render(st, coin, tf), refresh=True)
+                    drawn = time.monotonic()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reader.close()
+
+
+def start_worker(pub: Publisher, coin: str, tf: str) -> mp.Process:
+    proc = mp.get_context("spawn").Process(
+        target=render_worker, daemon=True,
+        args=(pub.name, coin, tf, config.COIN_BINANCE[coin], config.TF_KLINE[tf]),
+    )
+    proc.start()
+    return proc
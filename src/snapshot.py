@@ -0,0 +1,295 @@
+from dataclasses import dataclass
+
+import clock
+import config
+import indicators as ind
+import indicators_np as npi
+import volprofile
+
+
+TREND_THRESH = 3
+
+
+@dataclass(frozen=True, slots=True)
+class Snapshot:
+    """Every indicator the UI needs, computed once per state version."""
+
+    mid:       float
+    pm_up:     float | None
+    pm_dn:     float | None
+
+    # ── order book ──
+    obi:       float
+    bid_walls: list
+    ask_walls: list
+    depth:     dict
+
+    # ── flow ──
+    cvd:       dict          # secs → signed notional, CVD_WINDOWS + DELTA_WINDOW
+    poc:       float
+    vp:        list          # (price, volume) rows, lowest first
+    va_low:    float         # value area around the POC (VP_VALUE_AREA of volume)
+    va_high:   float
+    hvn:       list          # high / low volume node prices
+    lvn:       list
+
+    # ── technical ──
+    rsi:       float | None
+    macd:      float | None
+    macd_sig:  float | None
+    macd_hist: float | None
+    vwap:      float
+    ema_s:     float | None
+    ema_l:     float | None
+    ha:        list
+
+    # ── polymarket ──
+    pm_up_book: dict | None    # PmBook.quote() of the live Up / Down token
+    pm_dn_book: dict | None
+
+    # ── scores ──
+    trend:       int
+    trend_label: str
+    trend_col:   str
+    bias:        float
+    model_p:     float       # P(Up) implied by bias
+    edge_up:     float | None
+    edge_dn:     float | None
+
+    versions:  tuple
+
+
+def _score_trend(mid, obi_v, cvd5, rsi_v, hv, vwap_v, es, el, bw, aw, ha):
+    score = 0
+
+    if obi_v > config.OBI_THRESH:
+        score += 1
+    elif obi_v < -config.OBI_THRESH:
+        score -= 1
+
+    score += 1 if cvd5 > 0 else -1 if cvd5 < 0 else 0
+
+    if rsi_v is not None:
+        if rsi_v > config.RSI_OB:
+            score -= 1
+        elif rsi_v < config.RSI_OS:
+            score += 1
+
+    if hv is not None:
+        score += 1 if hv > 0 else -1
+
+    if vwap_v and mid:
+        score += 1 if mid > vwap_v else -1
+
+    if es is not None and el is not None:
+        score += 1 if es > el else -1
+
+    score += min(len(bw), 2)
+    score -= min(len(aw), 2)
+
+    if len(ha) >= 3:
+        last3 = ha[-3:]
+        if all(c["green"] for c in last3):
+            score += 1
+        elif all(not c["green"] for c in last3):
+            score -= 1
+
+    if score >= TREND_THRESH:
+        return score, "BULLISH",  "green"
+    elif score <= -TREND_THRESH:
+        return score, "BEARISH",  "red"
+    else:
+        return score, "NEUTRAL",  "yellow"
+
+
+def _book_group(st):
+    # a render worker has no book: it gets the feed process's numbers (shmstate)
+    return st.book_metrics if st.book_metrics is not None else book_metrics(st)
+
+
+def book_metrics(st) -> dict:
+    """OBI, walls and depth from the full local book when there is one,
+    else from the published top levels."""
+    bids, asks = (st.book.bids, st.book.asks) if st.book is not None else (st.bids, st.asks)
+    bw, aw = ind.walls(bids, asks, st.mid)
+    return {
+        "obi":       ind.obi(bids, asks, st.mid) if st.mid else 0.0,
+        "bid_walls": bw,
+        "ask_walls": aw,
+        "depth":     ind.depth_usd(bids, asks, st.mid) if st.mid else {},
+    }
+
+
+def _trade_group(st):
+    secs = sorted(set(config.CVD_WINDOWS) | {config.DELTA_WINDOW, 300})
+    return {"cvd": {s: ind.cvd(st.trades, s) for s in secs}}
+
+
+def _kline_group(st):
+    eng = st.engine
+    m, s, h = eng.macd()
+    es, el  = eng.emas()
+    cs = st.candles
+    if cs is not None:
+        vw = npi.vwap(cs)
+    else:
+        vw = ind.vwap(st.store.tail(config.KLINE_LOOKBACK) if st.store is not None else st.klines)
+    return {
+        "rsi": eng.rsi(),
+        "macd": m, "macd_sig": s, "macd_hist": h,
+        "vwap": vw,
+        "ema_s": es, "ema_l": el,
+        "ha": eng.heikin_ashi(),
+    }
+
+
+def _profile_group(st):
+    vp = st.profile
+    if vp is not None and vp.bins:
+        poc, rows = vp.poc(), vp.rows(config.VP_BINS)
+        lo, hi = vp.value_area()
+    else:                                   # candle ranges (VP_SOURCE = "klines", render worker)
+        cs = st.candles
+        if cs is not None:
+            poc, rows = npi.vol_profile(cs)
+        else:
+            poc, rows = ind.vol_profile(st.store.tail(config.KLINE_LOOKBACK)
+                                        if st.store is not None else st.klines)
+        lo, hi = volprofile.value_area(rows)
+    hvn, lvn = volprofile.nodes(rows)
+    return {"poc": poc, "vp": rows, "va_low": lo, "va_high": hi, "hvn": hvn, "lvn": lvn}
+
+
+def _pm_group(st):
+    up = st.pm_books.get(st.pm_up_id)
+    dn = st.pm_books.get(st.pm_dn_id)
+    c  = config.PM_DEPTH_CENTS
+    return {
+        "pm_up_book": up.quote(c) if up else None,
+        "pm_dn_book": dn.quote(c) if dn else None,
+    }
+
+
+_GROUPS = (
+    ("book",   _book_group),
+    ("trades", _trade_group),
+    ("klines", _kline_group),
+    ("profile", _profile_group),
+    ("pm",     _pm_group),
+)
+
+
+def _keys(st):
+    return {
+        "book":   st.book_ver,
+        # CVD windows slide with the clock, so trades also age per second
+        "trades": (st.trade_ver, int(clock.now())),
+        "klines": st.kline_ver,
+        "profile": (st.trade_ver, st.kline_ver),
+        "pm":     st.pm_ver,
+    }
+
+
+def take(st) -> Snapshot:
+    """Return the current Snapshot of `st`, recomputing only the indicator
+    groups whose input version changed since the previous call."""
+    cache = st.snap_cache
+    keys  = _keys(st)
+    versions = (keys["book"], keys["trades"], keys["klines"], keys["pm"], st.pm_up, st.pm_dn)
+
+    prev = cache.get("snap")
+    if prev is not None and prev.versions == versions:
+        return prev
+
+    vals = {}
+    for name, fn in _GROUPS:
+        hit = cache.get(name)
+        if hit is None or hit[0] != keys[name]:
+            hit = (keys[name], fn(st))
+            cache[name] = hit
+        vals.update(hit[1])
+
+    mid  = st.mid
+    cvd5 = vals["cvd"][300]
+    bw, aw = vals["bid_walls"], vals["ask_walls"]
+    score, label, col = _score_trend(
+        mid, vals["obi"], cvd5, vals["rsi"], vals["macd_hist"], vals["vwap"],
+        vals["ema_s"], vals["ema_l"], bw, aw, vals["ha"],
+    )
+    bias = ind.bias_from(
+        mid,
+        ema_sl=(vals["ema_s"], vals["ema_l"]),
+        obi_v=vals["obi"] if mid else None,
+        macd_hist=vals["macd_hist"],
+        cvd5=cvd5,
+        ha=vals["ha"],
+        vwap_v=vals["vwap"],
+        rsi_v=vals["rsi"],
+        poc=vals["poc"],
+        wall_lists=(bw, aw),
+    )
+
+    p = ind.bias_prob(bias)
+
+    snap = Snapshot(
+        mid=mid, pm_up=st.pm_up, pm_dn=st.pm_dn,
+        trend=score, trend_label=label, trend_col=col, bias=bias,
+        model_p=p, edge_up=ind.pm_edge(p, st.pm_up), edge_dn=ind.pm_edge(1 - p, st.pm_dn),
+        versions=versions,
+        **vals,
+    )
+    cache["snap"] = snap
+    return snap
+
+
+def ha_streak(ha) -> int:
+    """Signed run length of same-colour Heikin Ashi candles at the end."""
+    streak = 0
+    for c in reversed(ha):
+        if c["green"] and streak >= 0:
+            streak += 1
+        elif not c["green"] and streak <= 0:
+            streak -= 1
+        else:
+            break
+    return streak
+
+
+_PM_KEYS = ("bid", "ask", "mid", "spread", "prob", "bid_size", "ask_size")
+
+
+def as_dict(sn: Snapshot) -> dict:
+    """Flat JSON-friendly view of a Snapshot (no Rich, no nested lists)."""
+    out = {
+        "mid":       sn.mid,
+        "pm_up":     sn.pm_up,
+        "pm_dn":     sn.pm_dn,
+        "obi":       sn.obi,
+        "bid_walls": len(sn.bid_walls),
+        "ask_walls": len(sn.ask_walls),
+        "rsi":       sn.rsi,
+        "macd":      sn.macd,
+        "macd_sig":  sn.macd_sig,
+        "macd_hist": sn.macd_hist,
+        "vwap":      sn.vwap,
+        "ema_s":     sn.ema_s,
+        "ema_l":     sn.ema_l,
+        "ha_streak": ha_streak(sn.ha),
+        "poc":       sn.poc,
+        "va_low":    sn.va_low,
+        "va_high":   sn.va_high,
+        "trend":     sn.trend,
+        "trend_label": sn.trend_label,
+        "bias":      sn.bias,
+        "model_p":   sn.model_p,
+        "edge_up":   sn.edge_up,
+        "edge_dn":   sn.edge_dn,
+    }
+    for pct, usd in sn.depth.items():
+        out[f"depth_{pct}"] = usd
+    for secs, v in sn.cvd.items():
+        out[f"cvd_{secs}"] = v
+    for side, q in (("up", sn.pm_up_book), ("dn", sn.pm_dn_book)):
+        for k in _PM_KEYS:
+            out[f"pm_{side}_{k}"] = q[k] if q else None
+    return out
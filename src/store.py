@@ -0,0 +1,187 @@
+from array import array
+
+import clock
+import config
+
+
+class TradeStore:
+    """Fixed-capacity columnar ring buffer of trades.
+
+    Parallel timestamp / price / qty / side arrays plus a running prefix sum
+    of signed notional (price × qty, + for buys, − for sells). Appends are
+    O(1) amortised, TTL eviction just advances the head, and any CVD window
+    is one binary search and one subtraction.
+
+    Positions are absolute sequence numbers in [head, tail); the slot of
+    sequence `s` is `s % cap`.
+
+    With `buf` (nbytes(cap) writable bytes, e.g. shared memory) the
+    columns live in that buffer instead of private arrays, so another
+    process can map the same trades. Slots in [head, tail) are only
+    rewritten once the ring wraps.
+    """
+
+    def __init__(self, cap: int = config.TRADE_CAP, ttl: float = config.TRADE_TTL, buf=None):
+        self.cap   = cap
+        self.ttl   = ttl
+        if buf is None:
+            self.ts    = array("d", bytes(8 * cap))
+            self.price = array("d", bytes(8 * cap))
+            self.qty   = array("d", bytes(8 * cap))
+            self.cum   = array("d", bytes(8 * cap))    # signed notional up to and incl. slot
+            self.side  = array("b", bytes(cap))        # +1 buy / −1 sell
+        else:
+            mv = memoryview(buf)
+            self.ts, self.price, self.qty, self.cum = (
+                mv[8 * cap * i:8 * cap * (i + 1)].cast("d") for i in range(4))
+            self.side = mv[32 * cap:33 * cap].cast("b")
+        self.head  = 0
+        self.tail  = 0
+        self.total = 0.0      # signed notional of every trade ever added
+        self._base = 0.0      # value of `total` just before `head`
+
+    @staticmethod
+    def nbytes(cap: int) -> int:
+        """Size of the `buf` a store of `cap` trades needs."""
+        return 33 * cap
+
+    def __len__(self):
+        return self.tail - self.head
+
+    def __bool__(self):
+        return self.tail > self.head
+
+    def add(self, t: float, price: float, qty: float, is_buy: bool):
+        cap, tail = self.cap, self.tail
+        if tail - self.head == cap:
+            self._pop()
+        i  = tail % cap
+        ts = self.ts
+        if is_buy:
+            total = self.total = self.total + price * qty
+            self.side[i] = 1
+        else:
+            total = self.total = self.total - price * qty
+            self.side[i] = -1
+        ts[i]         = t
+        self.price[i] = price
+        self.qty[i]   = qty
+        self.cum[i]   = total
+        self.tail = tail + 1
+        cut = t - self.ttl
+        if ts[self.head % cap] < cut:
+            self.evict(cut)
+
+    def _pop(self):
+        self._base = self.cum[self.head % self.cap]
+        self.head += 1
+
+    def evict(self, cut: float):
+        """Drop every trade older than `cut`."""
+        ts, cap = self.ts, self.cap
+        while self.head < self.tail and ts[self.head % cap] < cut:
+            self._pop()
+
+    def first_at(self, cut: float) -> int:
+        """Sequence number of the first trade with timestamp >= cut."""
+        ts, cap = self.ts, self.cap
+        lo, hi = self.head, self.tail
+        while lo < hi:
+            m = (lo + hi) // 2
+            if ts[m % cap] < cut:
+                lo = m + 1
+            else:
+                hi = m
+        return lo
+
+    def _prefix(self, seq: int) -> float:
+        return self._base if seq == self.head else self.cum[(seq - 1) % self.cap]
+
+    def cvd(self, secs: float, now: float | None = None) -> float:
+        now = clock.now() if now is None else now
+        return self.total - self._prefix(self.first_at(now - secs))
+
+    def __iter__(self):
+        """Yield (t, price, qty, is_buy) oldest first."""
+        cap = self.cap
+        for s in range(self.head, self.tail):
+            i = s % cap
+            yield self.ts[i], self.price[i], self.qty[i], self.side[i] > 0
+
+
+_BAR_CAP = config.TRADE_TTL + 2       # bars alive within TRADE_TTL, plus the forming one
+
+
+class FlowBars(TradeStore):
+    """Trades compacted into one-second bars of buy / sell qty and notional.
+
+    Same ring, prefix sum and `cvd(secs, now)` as TradeStore, but a slot
+    is a second rather than a print, so memory and CVD cost follow elapsed
+    time, not trade count. Windows are resolved to whole seconds: a bar
+    counts when its second starts at or after the cut. A late trade from
+    an earlier second is added to the newest bar.
+    """
+
+    _COLS = ("ts", "buy_qty", "sell_qty", "buy", "sell", "cum")
+
+    def __init__(self, cap: int = _BAR_CAP, ttl: float = config.TRADE_TTL, buf=None):
+        self.cap = cap
+        self.ttl = ttl
+        mv = None if buf is None else memoryview(buf)
+        for k, name in enumerate(self._COLS):         # ts = bar second, buy / sell = notional
+            setattr(self, name, array("d", bytes(8 * cap)) if mv is None
+                    else mv[8 * cap * k:8 * cap * (k + 1)].cast("d"))
+        self.head  = 0
+        self.tail  = 0
+        self.total = 0.0
+        self._base = 0.0
+
+    @staticmethod
+    def nbytes(cap: int) -> int:
+        return 48 * cap
+
+    def add(self, t: float, price: float, qty: float, is_buy: bool):
+        cap = self.cap
+        sec = float(int(t))
+        i   = (self.tail - 1) % cap
+        if self.tail == self.head or sec > self.ts[i]:
+            if self.tail - self.head == cap:
+                self._pop()
+            i = self.tail % cap
+            self.ts[i] = sec
+            self.buy_qty[i] = self.sell_qty[i] = self.buy[i] = self.sell[i] = 0.0
+            self.cum[i] = self.total
+            self.tail += 1
+        n = price * qty
+        if is_buy:
+            self.buy_qty[i] += qty
+            self.buy[i]     += n
+        else:
+            self.sell_qty[i] += qty
+            self.sell[i]     += n
+            n = -n
+        self.total   += n
+        self.cum[i]   = self.total
+        cut = sec - self.ttl
+        if self.ts[self.head % cap] < cut:
+            self.evict(cut)
+
+    def __iter__(self):
+        """Yield (second, buy qty, sell qty, buy notional, sell notional) oldest first."""
+        cap = self.cap
+        for s in range(self.head, self.tail):
+            i = s % cap
+            yield self.ts[i], self.buy_qty[i], self.sell_qty[i], self.buy[i], self.sell[i]
+
+
+def new_store(buf=None) -> TradeStore:
+    """The trade store TRADE_STORE selects, optionally inside `buf`."""
+    cls = FlowBars if config.TRADE_STORE == "bars" else TradeStore
+    return cls(buf=buf)
+
+
+def store_nbytes() -> int:
+    """Size of the `buf` new_store() needs."""
+    if config.TRADE_STORE == "bars":
+        return FlowBars.nbytes(_BAR_CAP)
+    return TradeStore.nbytes(config.TRADE_CAP)
@@ -0,0 +1,253 @@
+import math
+from collections import deque
+
+import config
+
+
+class VolumeProfile:
+    """Rolling volume-at-price histogram built from trade prints.
+
+    Volume is kept per time slot (one slot per candle interval, `span`
+    slots, the same window as the kline profile) keyed by a fixed fine
+    price tick, and summed into `bins` of `tick << shift` width. A trade
+    is O(1): one dict update and one bin update. Only when a print lands
+    outside the binned range does the histogram grow, with headroom; once
+    it would exceed VP_MAX_BINS the bins are coarsened (shift + 1) and
+    rebuilt from the slots. Expired slots are subtracted, and the bins are
+    refined again when the remaining range is small enough. Queries are
+    O(bins) and independent of how many trades or candles the window holds.
+    """
+
+    def __init__(self, secs: int = 60, span: int = config.KLINE_MAX,
+                 max_bins: int = config.VP_MAX_BINS):
+        self.secs     = secs
+        self.span     = span
+        self.max_bins = max_bins
+        self.reset()
+
+    def reset(self):
+        self.tick  = 0.0            # fine tick, chosen from the first price
+        self.shift = 0              # bin width = tick << shift
+        self.base  = 0              # coarse index of bins[0]
+        self.bins: list[float] = []
+        self.total = 0.0
+        self.slots: deque[tuple[int, dict[int, float]]] = deque()   # (slot, fine tick → qty)
+        self._cur: dict[int, float] = {}                             # newest slot's dict …
+        self._end = 0.0                                              # … and the time it ends
+
+    def seed(self, klines, secs: int | None = None, span: int | None = None):
+        """Start over from closed klines, spreading each candle's volume
+        over its range (at most VP_SEED_STEPS points); live trades then
+        take over as the seeded slots expire."""
+        self.reset()
+        if secs:
+            self.secs = secs
+        if span:
+            self.span = span
+        klines = list(klines)
+        if not klines:
+            return
+        first  = klines[-1]["t"] - (self.span - 1) * self.secs
+        klines = [k for k in klines if k["t"] >= first]
+        self._set_tick(klines[-1]["c"])
+        for k in klines:
+            lo, hi = int(k["l"] / self.tick), int(k["h"] / self.tick)
+            step   = max(1, (hi - lo) // config.VP_SEED_STEPS)
+            ticks  = range(lo, hi + 1, step)
+            q      = k["v"] / len(ticks)
+            d = self._slot(int(k["t"] // self.secs))
+            for f in ticks:
+                d[f] = d.get(f, 0.0) + q
+            self.total += k["v"]
+        self._refit(force=True)
+
+    def _set_tick(self, price: float):
+        # a round tick of about VP_TICK_BPS of the price: 1 for BTC, 0.1 for ETH …
+        self.tick = 10.0 ** math.floor(math.log10(price * config.VP_TICK_BPS / 1e4))
+
+    # ── updates ──
+    def _slot(self, slot: int) -> dict[int, float]:
+        slots = self.slots
+        if not slots or slot > slots[-1][0]:
+            slots.append((slot, {}))
+            if slots[0][0] <= slot - self.span:
+                self._expire(slot - self.span)
+        self._cur = slots[-1][1]
+        self._end = (slots[-1][0] + 1) * self.secs
+        return self._cur             # a late print joins the newest slot
+
+    def add(self, t: float, price: float, qty: float):
+        if not self.tick:
+            self._set_tick(price)
+        if t < self._end:                   # 0 until the first slot exists
+            d = self._cur
+        else:
+            d = self._slot(int(t // self.secs))
+        f = int(price / self.tick)
+        i = (f >> self.shift) - self.base
+        if not 0 <= i < len(self.bins):
+            self._grow(f)                   # may re-bin the slots: before this print joins them
+            i = (f >> self.shift) - self.base
+        d[f] = d.get(f, 0.0) + qty
+        self.total += qty
+        self.bins[i] += qty
+
+    def _expire(self, cut: int):
+        bins, s, base = self.bins, self.shift, self.base
+        while self.slots and self.slots[0][0] <= cut:
+            _, d = self.slots.popleft()
+            for f, q in d.items():
+                i = (f >> s) - base
+                b = bins[i] - q
+                bins[i] = b if b > 1e-9 * q else 0.0      # no float dust left behind
+                self.total -= q
+        self._refit()
+
+    # ── binning ──
+    def _grow(self, f: int):
+        """Extend the binned range to cover fine tick `f`, with headroom."""
+        s = self.shift
+        lo, hi = f >> s, f >> s
+        if self.bins:
+            lo, hi = min(lo, self.base), max(hi, self.base + len(self.bins) - 1)
+        pad = (hi - lo) // 4 + 8
+        lo, hi = lo - pad, hi + pad
+        if hi - lo + 1 <= self.max_bins:
+            n = len(self.bins)
+            self.bins = [0.0] * (self.base - lo if n else 0) + self.bins
+            self.bins += [0.0] * (hi - lo + 1 - len(self.bins))
+            self.base = lo
+            return
+        flo, fhi = lo << s, ((hi + 1) << s) - 1
+        while (fhi >> s) - (flo >> s) + 1 > self.max_bins:
+            s += 1
+        self._rebuild(s, flo, fhi)
+
+    def _rebuild(self, s: int, flo: int, fhi: int):
+        """Re-bin every slot at width tick << s over fine ticks [flo, fhi]."""
+        self.shift, self.base = s, flo >> s
+        bins = self.bins = [0.0] * ((fhi >> s) - self.base + 1)
+        base = self.base
+        for _, d in self.slots:
+            for f, q in d.items():
+                bins[(f >> s) - base] += q
+
+    def _refit(self, force: bool = False):
+        """After expiry: drop an empty histogram, and go back to finer
+        bins when the remaining range fits in half of VP_MAX_BINS."""
+        keys = [f for _, d in self.slots for f in d] if force else None
+        if not (keys if force else any(self.bins)):
+            self.bins, self.shift, self.base, self.total = [], 0, 0, 0.0
+            return
+        if self.shift == 0 and not force:
+            return
+        if force:
+            flo, fhi = min(keys), max(keys)
+        else:
+            i0, i1 = self._occupied()
+            flo, fhi = (self.base + i0) << self.shift, ((self.base + i1 + 1) << self.shift) - 1
+        s = 0
+        while (fhi >> s) - (flo >> s) + 1 > self.max_bins // 2:
+            s += 1
+        if s < self.shift or force:
+            pad = ((fhi - flo) // 4 >> s << s) + (8 << s)
+            self._rebuild(s, flo - pad, fhi + pad)
+
+    def _occupied(self) -> tuple[int, int]:
+        bins = self.bins
+        i0 = next((i for i, b in enumerate(bins) if b), 0)
+        i1 = next((i for i in range(len(bins) - 1, -1, -1) if bins[i]), 0)
+        return i0, i1
+
+    # ── queries, O(bins) ──
+    @property
+    def width(self) -> float:
+        return self.tick * (1 << self.shift)
+
+    def _price(self, i: int) -> float:
+        return (self.base + i + 0.5) * self.width
+
+    def levels(self) -> list[tuple[float, float]]:
+        """(bin centre, volume) over the occupied range, lowest first."""
+        if not self.bins:
+            return []
+        i0, i1 = self._occupied()
+        w, base = self.width, self.base
+        return [((base + i + 0.5) * w, self.bins[i]) for i in range(i0, i1 + 1)]
+
+    def poc(self) -> float:
+        bins = self.bins
+        if not bins:
+            return 0.0
+        return self._price(bins.index(max(bins)))
+
+    def value_area(self, pct: float = config.VP_VALUE_AREA) -> tuple[float, float]:
+        if not self.bins:
+            return 0.0, 0.0
+        i0, i1 = self._occupied()
+        lo, hi = _span(self.bins[i0:i1 + 1], pct)
+        return self._price(i0 + lo), self._price(i0 + hi)
+
+    def rows(self, n: int = config.VP_BINS) -> list[tuple[float, float]]:
+        """The occupied range summed into `n` equal rows, in the shape of
+        indicators.vol_profile's data."""
+        if not self.bins:
+            return []
+        i0, i1 = self._occupied()
+        m = i1 - i0 + 1
+        if m <= n:
+            return self.levels()
+        out = [0.0] * n
+        for k, v in enumerate(self.bins[i0:i1 + 1]):
+            out[k * n // m] += v
+        rw = m * self.width / n
+        lo = self._price(i0) - self.width / 2
+        return [(lo + (j + 0.5) * rw, out[j]) for j in range(n)]
+
+
+# ── profile shape ───────────────────────────────────────────────
+def value_area(rows, pct: float = config.VP_VALUE_AREA) -> tuple[float, float]:
+    """(low, high) of the range around the POC holding `pct` of the volume,
+    grown one row at a time towards the heavier neighbour."""
+    if not rows:
+        return 0.0, 0.0
+    lo, hi = _span([v for _, v in rows], pct)
+    return rows[lo][0], rows[hi][0]
+
+
+def _span(vols: list[float], pct: float) -> tuple[int, int]:
+    goal = sum(vols) * pct
+    lo = hi = vols.index(max(vols))
+    acc  = vols[lo]
+    last = len(vols) - 1
+    while acc < goal and (lo > 0 or hi < last):
+        down = vols[lo - 1] if lo > 0 else -1.0
+        up   = vols[hi + 1] if hi < last else -1.0
+        if up >= down:
+            hi += 1
+            acc += up
+        else:
+            lo -= 1
+            acc += down
+    return lo, hi
+
+
+def nodes(rows) -> tuple[list[float], list[float]]:
+    """High / low volume nodes: local peaks at least VP_HVN × the mean row
+    volume, and troughs at most VP_LVN × the mean between two peaks."""
+    if len(rows) < 3:
+        return [], []
+    vols = [v for _, v in rows]
+    mean = sum(vols) / len(vols)
+    hvn, lvn = [], []
+    for i in range(1, len(vols) - 1):
+        a, v, b = vols[i - 1], vols[i], vols[i + 1]
+        if v >= a and v >= b and v > min(a, b) and v >= config.VP_HVN * mean:
+            hvn.append(i)
+        elif v <= a and v <= b and v < max(a, b) and v <= config.VP_LVN * mean:
+            lvn.append(i)
+    if hvn:
+        lvn = [i for i in lvn if hvn[0] < i < hvn[-1]]
+    else:
+        lvn = []
+    return [rows[i][0] for i in hvn], [rows[i][0] for i in lvn]
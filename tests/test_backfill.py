@@ -0,0 +1,71 @@
+import asyncio
+
+import websockets.exceptions      # loaded by connect(), which the fake _open skips
+
+import config
+import feeds
+from store import TradeStore
+
+
+def _pay(i):
+    return {"e": "trade", "s": "BTCUSDT", "t": i, "T": 1_700_000_000_000 + i, "p": str(i), "q": "1", "m": False}
+
+
+def test_gap_during_a_fill_is_queued(monkeypatch):
+    """Two gaps, the second while the first is still being fetched: every
+    trade ends up in the store once, in id order."""
+    go, asked = asyncio.Event(), []
+
+    async def fetch_trades(symbol, lo, hi):
+        asked.append((lo, hi))
+        await go.wait()
+        return [((1_700_000_000_000 + i) / 1000, float(i), 1.0, True) for i in range(lo, hi)]
+
+    monkeypatch.setattr(feeds, "fetch_trades", fetch_trades)
+    monkeypatch.setattr(config, "BACKFILL", True)
+    store = TradeStore(cap=100, ttl=1e9)
+    route = feeds.trade_route(store, [feeds.State()])
+
+    async def run():
+        for i in [1, 2, 3, 10, 11, 12, 20, 21, 21]:      # gaps [4, 10) and [13, 20), one repeat
+            route(_pay(i))
+            await asyncio.sleep(0)
+        go.set()
+        for _ in range(10):
+            await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert asked == [(4, 10), (13, 20)]
+    assert [p for _, p, _, _ in store] == [float(i) for i in range(1, 22)]
+
+
+def test_cancelled_standby_is_not_fatal(monkeypatch):
+    class Ws:
+        async def recv(self, decode=False):
+            await asyncio.sleep(0.001)
+            return b"{}"
+
+        async def close(self):
+            pass
+
+    async def _open(url, on_connect, handover):
+        if handover:
+            raise asyncio.CancelledError    # the standby task ends cancelled
+        return Ws()
+
+    monkeypatch.setattr(feeds, "_open", _open)
+    monkeypatch.setattr(config, "WS_ROTATE", 1e-9)
+    got = []
+
+    async def put(raw):
+        got.append(raw)
+
+    async def run():
+        task = asyncio.create_task(feeds._stream("ws://x", "test", put))
+        await asyncio.sleep(0.1)
+        alive = not task.done()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return alive
+
+    assert asyncio.run(run()) and len(got) > 10
@@ -0,0 +1,154 @@
+import asyncio
+import json
+import random
+
+import websockets
+
+import config
+import feeds
+from book import OrderBook
+
+
+def _snap(lid, bids, asks):
+    return {"lastUpdateId": lid,
+            "bids": [[str(p), str(q)] for p, q in bids],
+            "asks": [[str(p), str(q)] for p, q in asks]}
+
+
+def _diff(U, u, b=(), a=()):
+    return {"e": "depthUpdate", "U": U, "u": u,
+            "b": [[str(p), str(q)] for p, q in b], "a": [[str(p), str(q)] for p, q in a]}
+
+
+def test_snapshot_replays_buffered_diffs():
+    ob = OrderBook()
+    ob.on_event(_diff(95, 99, b=[(99.0, 9)]))           # u <= lastUpdateId: dropped
+    ob.on_event(_diff(100, 102, b=[(99.9, 5)]))         # straddles lastUpdateId + 1
+    ob.on_event(_diff(103, 104, a=[(100.1, 0), (100.3, 4)]))
+    assert not ob.synced and len(ob.buffer) == 3
+
+    assert ob.on_snapshot(_snap(100, [(99.9, 1), (99.8, 2)], [(100.1, 1), (100.2, 2)]))
+    assert ob.synced and not ob.buffer and ob.last_id == 104
+    assert ob.bids.top(5) == [(99.9, 5.0), (99.8, 2.0)]
+    assert ob.asks.top(5) == [(100.2, 2.0), (100.3, 4.0)]
+
+    assert ob.on_event(_diff(105, 105, b=[(99.8, 0)]))
+    assert ob.bids.top(5) == [(99.9, 5.0)]
+
+
+def test_stale_snapshot_is_refetched(monkeypatch):
+    st   = feeds.State()
+    sync = feeds.DepthSync("BTCUSDT", [st])
+    sync.book.on_event(_diff(201, 203, b=[(99.9, 5)]))
+    snaps = [_snap(150, [(99.9, 1)], [(100.1, 1)]),    # older than the first buffered diff
+             _snap(202, [(99.9, 1)], [(100.1, 1)])]
+    calls = []
+
+    async def get_json(url, params, timeout=5):
+        calls.append(params)
+        return snaps[len(calls) - 1]
+
+    monkeypatch.setattr(feeds, "_get_json", get_json)
+    monkeypatch.setattr(feeds, "recorder", None)
+    asyncio.run(sync._resync())
+
+    assert len(calls) == 2 and calls[0]["limit"] == config.OB_SNAPSHOT
+    assert sync.book.synced and sync.book.last_id == 203
+    assert st.bids == [(99.9, 5.0)] and st.mid == 100.0
+
+
+def test_sequence_gap_flags_resync():
+    ob = OrderBook()
+    ob.on_snapshot(_snap(10, [(99.9, 1)], [(100.1, 1)]))
+    assert ob.on_event(_diff(11, 12, b=[(99.8, 1)]))
+    assert not ob.on_event(_diff(14, 15, b=[(99.7, 1)]))     # 13 missing
+    assert not ob.synced and ob.resyncs == 1
+    assert ob.buffer and ob.buffer[0]["U"] == 14
+
+    # the next snapshot picks up from the buffered diff
+    assert ob.on_snapshot(_snap(14, [(99.9, 1)], [(100.1, 1)]))
+    assert ob.bids.top(5) == [(99.9, 1.0), (99.7, 1.0)]
+
+
+def test_prune_at_snapshot_depth():
+    rnd = random.Random(4)
+    ob  = OrderBook(50)
+    ob.on_snapshot(_snap(1, [(round(100 - i * 0.1, 1), 1) for i in range(50)],
+                            [(round(100.1 + i * 0.1, 1), 1) for i in range(50)]))
+    uid = 1
+    for _ in range(400):
+        b = [(round(100 - rnd.randint(-5, 70) * 0.1, 1), rnd.choice([0, 0.5, 2.0])) for _ in range(3)]
+        a = [(round(100.1 + rnd.randint(-5, 70) * 0.1, 1), rnd.choice([0, 0.5, 2.0])) for _ in range(3)]
+        ob.on_event(_diff(uid + 1, uid + 1, b, a))
+        uid += 1
+        for side in (ob.bids, ob.asks):
+            assert len(side) <= 50
+            levels = side.top(len(side))
+            assert abs(side.total - sum(q for _, q in levels)) < 1e-9
+            for i in {0, len(levels) // 2, len(levels) - 1}:
+                q, n = side.depth_to(levels[i][0])
+                assert abs(q - sum(q for _, q in levels[:i + 1])) < 1e-9
+                assert abs(n - sum(p * q for p, q in levels[:i + 1])) < 1e-6
+
+
+def test_depth_feed_against_local_socket(monkeypatch):
+    """A local stand-in replays recorded diffs; the book must match a
+    reference built from the same diffs, one of which is dropped once."""
+    rnd  = random.Random(2)
+    ref  = ({round(100 - i * 0.1, 1): 1.0 for i in range(30)},
+            {round(100.1 + i * 0.1, 1): 1.0 for i in range(30)})
+    diffs, books, uid = [], {}, 1000
+    for _ in range(200):
+        b = [(round(100 - rnd.randint(0, 40) * 0.1, 1), rnd.choice([0, 0.5, 2.0])) for _ in range(2)]
+        a = [(round(100.1 + rnd.randint(0, 40) * 0.1, 1), rnd.choice([0, 0.5, 2.0])) for _ in range(2)]
+        for side, rows in zip(ref, (b, a)):
+            for p, q in rows:
+                if q:
+                    side[p] = q
+                else:
+                    side.pop(p, None)
+        diffs.append(_diff(uid + 1, uid + 2, b, a))
+        uid += 2
+        books[uid] = (sorted(ref[0].items(), reverse=True), sorted(ref[1].items()))
+
+    sent = asyncio.Event()
+
+    async def handler(ws):
+        for i, d in enumerate(diffs):
+            if i != 120:                                # a lost diff: gap, then resync
+                await ws.send(json.dumps({"stream": "btcusdt@depth@100ms", "data": d}))
+            await asyncio.sleep(0.001)
+        sent.set()
+        await ws.wait_closed()
+
+    calls = []
+
+    async def get_json(url, params, timeout=5):
+        lid = diffs[20 if not calls else -1]["u"]
+        calls.append(lid)
+        return _snap(lid, *books[lid])
+
+    monkeypatch.setattr(feeds, "_get_json", get_json)
+    monkeypatch.setattr(feeds, "recorder", None)
+    monkeypatch.setattr(config, "WS_ROTATE", 0)
+
+    async def go():
+        async with websockets.serve(handler, "127.0.0.1", 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            monkeypatch.setattr(config, "BINANCE_WS", f"ws://127.0.0.1:{port}/stream")
+            st   = feeds.State()
+            task = asyncio.create_task(feeds.depth_feed("BTCUSDT", st))
+            await asyncio.wait_for(sent.wait(), 10)
+            for _ in range(100):                        # the resync snapshot sleeps 0.5 s between tries
+                if st.book.synced and st.book.last_id == uid:
+                    break
+                await asyncio.sleep(0.05)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await asyncio.sleep(0.1)                    # let the client close go out
+            return st
+
+    st = asyncio.run(go())
+    assert len(calls) == 2 and st.book.resyncs == 1
+    bids, asks = books[uid]
+    assert st.bids == bids[:config.OB_LEVELS] and st.asks == asks[:config.OB_LEVELS]
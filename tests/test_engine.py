@@ -0,0 +1,48 @@
+import random
+
+import indicators
+from engine import IndicatorEngine
+
+
+def _klines(n, seed=1):
+    rnd, c, out = random.Random(seed), 100.0, []
+    for i in range(n):
+        o = c
+        c = o + rnd.uniform(-1, 1)
+        out.append({"t": i * 60.0, "o": o, "h": max(o, c) + rnd.random(), "l": min(o, c) - rnd.random(),
+                    "c": c, "v": rnd.uniform(1, 10)})
+    return out
+
+
+def test_engine_matches_pure_functions():
+    """Exact equality after every push, through the RSI / MACD seeding
+    edges (n = 14, 15, 26, 34, 35) and well past them."""
+    kl  = _klines(120)
+    eng = IndicatorEngine()
+    for n, k in enumerate(kl, 1):
+        eng.push(k)
+        seen = kl[:n]
+        assert eng.rsi()   == indicators.rsi(seen), n
+        assert eng.macd()  == indicators.macd(seen), n
+        assert eng.emas()  == indicators.emas(seen), n
+        ha = eng.heikin_ashi()
+        assert ha == indicators.heikin_ashi(seen)[-len(ha):], n
+
+
+def test_engine_edges_and_reset():
+    kl  = _klines(60, seed=7)
+    eng = IndicatorEngine(kl[:13])
+    assert eng.rsi() is None and eng.macd() == (None, None, None)
+    for n in (14, 15, 26, 34, 35):
+        eng.reset(kl[:n])
+        assert eng.rsi()  == indicators.rsi(kl[:n])
+        assert eng.macd() == indicators.macd(kl[:n])
+        assert eng.emas() == indicators.emas(kl[:n])
+    assert eng.rsi() is not None and None not in eng.macd()
+
+
+def test_engine_flat_closes():
+    kl  = [{"t": i * 60.0, "o": 100.0, "h": 100.0, "l": 100.0, "c": 100.0, "v": 1.0} for i in range(40)]
+    eng = IndicatorEngine(kl)
+    assert eng.rsi() == indicators.rsi(kl) == 100.0
+    assert eng.macd() == indicators.macd(kl)
@@ -0,0 +1,41 @@
+import config
+import indicators
+from book import OrderBook
+
+
+def _levels(mid, sign, qtys, tick=0.1):
+    return [(round(mid + sign * tick * (i + 1), 2), q) for i, q in enumerate(qtys)]
+
+
+def test_walls_on_lists_keep_the_top_level_mean():
+    """Lists are the top OB_LEVELS: the threshold is WALL_MULT × their
+    mean, with no band, whether or not a mid is passed."""
+    bids = _levels(100.0, -1, [1] * 18 + [30, 1])
+    asks = _levels(100.0, +1, [1] * 20)
+    thr  = sum(q for _, q in bids + asks) / 40 * config.WALL_MULT
+    want = ([(p, q) for p, q in bids if q >= thr], [])
+    assert want[0] == [(98.1, 30)]
+    assert indicators.walls(bids, asks) == want
+    assert indicators.walls(bids, asks, 100.0) == want
+
+
+def test_walls_on_the_book_use_every_level_and_the_band(monkeypatch):
+    monkeypatch.setattr(config, "WALL_MULT", 5)
+    monkeypatch.setattr(config, "WALL_BAND_PCT", 1.0)
+    ob = OrderBook()
+    # 4 on top of thin deep levels: below 5 × the top-20 mean, above 5 × the book mean
+    bids = _levels(100.0, -1, [1] * 5 + [4] + [1] * 14) + _levels(98.0, -1, [0.5] * 100, tick=0.01)
+    asks = _levels(100.0, +1, [1] * 20) + _levels(102.0, +1, [0.5] * 99, tick=0.01) + [(106.5, 8)]
+    ob.load(bids, asks)
+    thr = (ob.bids.total + ob.asks.total) / (len(ob.bids) + len(ob.asks)) * 5
+
+    assert indicators.walls(ob.bids.top(20), ob.asks.top(20)) == ([], [])
+    bw, aw = indicators.walls(ob.bids, ob.asks)
+    assert bw == [(99.4, 4.0)] and aw == [(106.5, 8.0)] and 4 > thr
+
+    # within 1 % of mid only: the deep ask wall drops out, the band edge is inclusive
+    assert indicators.walls(ob.bids, ob.asks, 100.0) == ([(99.4, 4.0)], [])
+    ob.asks.set(101.0, 9.0)
+    assert indicators.walls(ob.bids, ob.asks, 100.0)[1] == [(101.0, 9.0)]
+    ob.asks.set(101.01, 9.0)
+    assert indicators.walls(ob.bids, ob.asks, 100.0)[1] == [(101.0, 9.0)]
@@ -0,0 +1,59 @@
+import math
+import random
+
+import pytest
+
+import indicators
+
+pytest.importorskip("numpy")
+npi = pytest.importorskip("indicators_np")
+
+TOL = dict(rel_tol=1e-7, abs_tol=1e-7)
+
+
+def _klines(n, seed=11):
+    rnd, c, out = random.Random(seed), 30_000.0, []
+    for i in range(n):
+        o = c
+        c = o * (1 + rnd.gauss(0, 0.002))
+        out.append({"t": i * 60.0, "o": o, "h": max(o, c) * (1 + rnd.random() * 1e-3),
+                    "l": min(o, c) * (1 - rnd.random() * 1e-3), "c": c, "v": rnd.uniform(1, 50)})
+    return out
+
+
+def _close(a, b):
+    if a is None or b is None:
+        return a is b
+    return math.isclose(a, b, **TOL)
+
+
+@pytest.mark.parametrize("n", [1, 14, 15, 26, 34, 35, 150, 2000])
+def test_numpy_backend_matches_reference(n):
+    kl = _klines(n)
+    cs = npi.Candles(kl, maxlen=n)
+
+    assert _close(npi.rsi(cs), indicators.rsi(kl))
+    assert all(_close(a, b) for a, b in zip(npi.macd(cs), indicators.macd(kl)))
+    assert all(_close(a, b) for a, b in zip(npi.emas(cs), indicators.emas(kl)))
+    assert _close(npi.vwap(cs), indicators.vwap(kl))
+
+    poc, rows = npi.vol_profile(cs)
+    ref_poc, ref_rows = indicators.vol_profile(kl)
+    assert _close(poc, ref_poc) and len(rows) == len(ref_rows)
+    assert all(_close(p, q) and _close(v, w) for (p, v), (q, w) in zip(rows, ref_rows))
+
+    for a, b in zip(npi.heikin_ashi(cs), indicators.heikin_ashi(kl)):
+        assert all(_close(a[f], b[f]) for f in "ohlc")
+        if abs(b["c"] - b["o"]) > 1e-6:
+            assert a["green"] == b["green"]
+
+
+def test_candles_window_matches_trimmed_list():
+    kl = _klines(500, seed=3)
+    cs = npi.Candles(kl[:10], maxlen=150)
+    for k in kl[10:]:
+        cs.append(k)
+    tail = kl[-150:]
+    assert len(cs) == 150 and list(cs.c) == [k["c"] for k in tail]
+    assert _close(npi.rsi(cs), indicators.rsi(tail))
+    assert all(_close(a, b) for a, b in zip(npi.macd(cs), indicators.macd(tail)))
@@ -0,0 +1,44 @@
+import asyncio
+import json
+
+import feeds
+
+
+class FakeWs:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, msg):
+        self.sent.append(json.loads(msg))
+
+
+def test_subscribe_unsubscribe():
+    st   = feeds.State()
+    sock = feeds.PmSocket({"U1": st, "D1": st})
+    ws   = FakeWs()
+
+    async def go():
+        await sock._on_connect(ws)
+        st.pm_books["U1"] = st.pm_books["D1"] = None
+        await sock.subscribe(("U2", "D2", "U1"), st)
+        await sock.unsubscribe(a for a in ("U1", "D1", "X"))
+    asyncio.run(go())
+
+    assert ws.sent == [{"assets_ids": ["U1", "D1"], "type": "market"},
+                       {"assets_ids": ["U2", "D2"], "operation": "subscribe"},
+                       {"assets_ids": ["U1", "D1"], "operation": "unsubscribe"}]
+    assert set(sock.assets) == {"U2", "D2"}
+    assert not st.pm_books
+
+
+def test_unsubscribe_nothing_sends_nothing():
+    sock = feeds.PmSocket({})
+    ws   = FakeWs()
+
+    async def go():
+        await sock._on_connect(ws)
+        await sock.unsubscribe([])
+        await sock.unsubscribe(["X"])
+    asyncio.run(go())
+
+    assert ws.sent == [{"assets_ids": [], "type": "market"}]
@@ -0,0 +1,49 @@
+import json
+
+import recorder as rec
+import snapshot
+from replay import Replay
+
+T0 = 1_700_000_100.0        # 5m window boundary at T0 + 200
+
+
+def _record(path):
+    r = rec.Recorder(str(path))
+    r.write(rec.META, json.dumps({"coin": "BTC", "tf": "5m", "up": "U1", "dn": "D1"}), T0)
+    r.write(rec.KLINES, json.dumps({"s": "BTCUSDT", "i": "1m", "d": [
+        {"t": T0 - 6000 + i * 60, "o": 100, "h": 101, "l": 99, "c": 100, "v": 5} for i in range(100)]}), T0)
+    r.write(rec.DEPTH_SNAP, json.dumps({"s": "BTCUSDT", "d": {
+        "lastUpdateId": 10, "bids": [["99.9", "2"], ["99.8", "3"]], "asks": [["100.1", "1"], ["100.2", "2"]]}}), T0)
+    uid = 10
+    for i in range(400):
+        ts = T0 + i
+        r.write(rec.BINANCE, json.dumps({"stream": "btcusdt@trade", "data": {
+            "e": "trade", "s": "BTCUSDT", "t": i + 1, "T": int(ts * 1000), "p": "100.0", "q": "0.1", "m": i % 2 == 0}}), ts)
+        r.write(rec.BINANCE, json.dumps({"stream": "btcusdt@depth@100ms", "data": {
+            "e": "depthUpdate", "U": uid + 1, "u": uid + 1, "b": [["99.7", str(1 + i % 3)]], "a": [["100.3", "10"]]}}), ts)
+        uid += 1
+        if i == 180:            # PM_PREFETCH ahead: the next window's books arrive early
+            r.write(rec.PM_SUB, json.dumps({"coin": "BTC", "tf": "5m", "ids": ["U2", "D2"]}), ts)
+            r.write(rec.PM, json.dumps([
+                {"event_type": "book", "asset_id": a, "bids": [{"price": "0.4", "size": "10"}],
+                 "asks": [{"price": p, "size": "10"}]} for a, p in (("U2", "0.55"), ("D2", "0.47"))]), ts)
+        if i == 200:
+            r.write(rec.META, json.dumps({"coin": "BTC", "tf": "5m", "up": "U2", "dn": "D2"}), ts)
+    r.close()
+
+
+def test_book_survives_rollover(tmp_path):
+    path = tmp_path / "x.rec"
+    _record(path)
+    rp    = Replay(str(path))
+    after = []
+    rp.run(every=10, on_eval=lambda ts, m, sn: after.append(sn) if ts > T0 + 200 else None)
+
+    st = rp.markets[0].state
+    assert st.pm_up_id == "U2"
+    assert (st.pm_up, st.pm_dn) == (0.55, 0.47)
+    assert st.book.synced and st.book is rp._syncs["BTCUSDT"].book
+    assert after
+    for sn in after:
+        assert sn.obi != 0.0
+        assert all(v > 0 for v in sn.depth.values())
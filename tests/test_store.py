@@ -0,0 +1,46 @@
+import random
+
+from store import FlowBars, TradeStore
+
+
+def _trades(n, seed=3):
+    rnd, t, out = random.Random(seed), 1_700_000_000.0, []
+    for _ in range(n):
+        t += rnd.expovariate(20)                 # bursts within a second and quiet gaps
+        out.append((t, 100 + rnd.uniform(-1, 1), rnd.uniform(0.001, 2), rnd.random() < 0.5))
+    return out
+
+
+def _scan(rows, cut):
+    return sum(p * q * (1 if b else -1) for t, p, q, b in rows if t >= cut)
+
+
+def test_trade_store_cvd_matches_scan():
+    rows  = _trades(3000)
+    store = TradeStore(cap=500, ttl=30)
+    for k, (t, p, q, b) in enumerate(rows, 1):
+        store.add(t, p, q, b)
+        if k % 37:
+            continue
+        live = [r for r in rows[max(0, k - 500):k] if r[0] >= t - 30]    # cap, then TTL
+        assert list(store) == live
+        for secs in (0.5, 5, 29, 30, 300):
+            assert abs(store.cvd(secs, t) - _scan(live, t - secs)) < 1e-6
+
+
+def test_flow_bars_cvd_matches_scan():
+    """Bars resolve windows to whole seconds: a trade counts when its
+    second starts at or after the cut."""
+    rows = _trades(3000, seed=5)
+    bars = FlowBars(cap=32, ttl=30)
+    for k, (t, p, q, b) in enumerate(rows, 1):
+        bars.add(t, p, q, b)
+        if k % 37:
+            continue
+        sec  = int(t)
+        live = [(int(r[0]), *r[1:]) for r in rows[:k] if int(r[0]) >= sec - 30]
+        assert len(bars) == len({r[0] for r in live})
+        for secs in (1, 5, 29, 30, 300):
+            assert abs(bars.cvd(secs, t) - _scan(live, t - secs)) < 1e-6
+        buy = sum(q for _, _, q, b in live if b)
+        assert abs(sum(r[1] for r in bars) - buy) < 1e-9
@@ -0,0 +1,77 @@
+import random
+
+import pytest
+
+import feeds
+import volprofile
+from volprofile import VolumeProfile
+
+
+def _brute(vp, trades, now):
+    """Histogram of the live trades at the profile's current binning."""
+    newest = int(now // vp.secs)
+    bins = [0.0] * len(vp.bins)
+    for t, p, q in trades:
+        if int(t // vp.secs) > newest - vp.span:
+            bins[(int(p / vp.tick) >> vp.shift) - vp.base] += q
+    return bins
+
+
+def test_profile_matches_brute_force_histogram():
+    """Narrow, then wide (grow and coarsen), then narrow again once the
+    wide slots expire (refit to finer bins)."""
+    rnd = random.Random(9)
+    vp  = VolumeProfile(secs=1, span=20, max_bins=64)
+    trades, shifts, t = [], {}, 1_700_000_000.0
+    for phase, spread in ((0, 0.05), (1, 4.0), (2, 0.05)):
+        for _ in range(1500):
+            t += rnd.expovariate(40)
+            p = 100 + rnd.uniform(-spread, spread)
+            q = rnd.uniform(0.01, 1)
+            vp.add(t, p, q)
+            trades.append((t, p, q))
+            shifts.setdefault(phase, set()).add(vp.shift)
+            assert len(vp.bins) <= vp.max_bins
+            if len(trades) % 25:
+                continue
+            ref = _brute(vp, trades, t)
+            assert all(abs(a - b) < 1e-6 for a, b in zip(vp.bins, ref))
+            assert abs(vp.total - sum(ref)) < 1e-6
+    narrow = max(shifts[0])
+    assert max(shifts[1]) > narrow                          # coarsened while wide
+    assert vp.shift == narrow                               # refit once the wide slots expired
+
+    ref = _brute(vp, trades, t)
+    assert vp.poc() == vp._price(ref.index(max(ref)))
+    lv = vp.levels()
+    assert abs(sum(v for _, v in lv) - vp.total) < 1e-6
+    assert lv[0][0] <= vp.poc() <= lv[-1][0]
+    lo, hi = vp.value_area()
+    assert lo <= vp.poc() <= hi
+
+
+def test_rows_and_value_area_shape():
+    vp = VolumeProfile(secs=60, span=10)
+    for i, (p, q) in enumerate([(100.0, 1), (100.5, 5), (101.0, 10), (101.5, 4), (102.0, 1)]):
+        vp.add(1_700_000_000 + i, p, q)
+    rows = vp.rows(3)
+    assert len(rows) == 3 and abs(sum(v for _, v in rows) - 21) < 1e-9
+    assert abs(vp.poc() - 101.0) <= vp.width
+    lo, hi = volprofile.value_area(vp.levels(), 0.7)
+    assert lo <= vp.poc() <= hi and hi - lo >= 0.5
+
+
+def test_load_klines_reseeds_profile_per_interval():
+    st = feeds.State()
+    if st.profile is None:
+        pytest.skip("VP_SOURCE is not 'trades'")
+    kl = [{"t": i * 300.0, "o": 100, "h": 101, "l": 99, "c": 100, "v": 5} for i in range(50)]
+    del kl[-2]                                              # a missing candle at the tail
+    feeds.load_klines(st, kl, "5m")
+    assert st.profile.secs == 300 and st.profile.total > 0
+
+    st.profile.add(kl[-1]["t"] + 1, 100.0, 1.0)
+    feeds.load_klines(st, kl[:1], "5m")                     # one row: seeded from it alone
+    assert abs(st.profile.total - 5) < 1e-9
+    feeds.load_klines(st, [], "5m")                         # none: empty, not the old profile
+    assert st.profile.total == 0 and not st.profile.bins